@@ -14,6 +14,10 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 # Import our models
 from app.models.order import Order
 from app.models.inventory import CopilotAccount
+from app.models.outbox import EmailOutbox
+from app.models.stripe_event import StripeEvent
+from app.models.ai_cache import AIAnswerCache
+from app.models.rate_limit import RateLimitBucket
 from app.core.config import settings
 
 # this is the Alembic Config object, which provides
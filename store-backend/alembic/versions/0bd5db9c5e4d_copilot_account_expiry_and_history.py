@@ -0,0 +1,69 @@
+"""copilot_account expiry and history
+
+Adds copilot_account_history, which receives expired accounts once they are
+past the archive grace period, and a partial index on
+(status, expires_at, id) over assigned/expired rows. The expiry sweeper walks
+that index in keyset order. The index is built CONCURRENTLY.
+
+Revision ID: 0bd5db9c5e4d
+Revises: bfa737011b58
+Create Date: 2026-10-18 21:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0bd5db9c5e4d'
+down_revision: Union[str, None] = 'bfa737011b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'copilot_account_history',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password', sa.String(), nullable=False),
+        sa.Column('account_type', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('assigned_to_email', sa.String(), nullable=True),
+        sa.Column('assigned_at', sa.DateTime(), nullable=True),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('notes', sa.String(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_copilot_account_history_assigned_to_email',
+        'copilot_account_history',
+        ['assigned_to_email']
+    )
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_copilot_account_status_expires_at',
+            'copilot_account',
+            ['status', 'expires_at', 'id'],
+            postgresql_where=sa.text("status IN ('assigned', 'expired')"),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_copilot_account_status_expires_at',
+            table_name='copilot_account',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+    op.drop_index('ix_copilot_account_history_assigned_to_email', table_name='copilot_account_history')
+    op.drop_table('copilot_account_history')
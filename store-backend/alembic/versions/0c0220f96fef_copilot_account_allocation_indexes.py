@@ -0,0 +1,58 @@
+"""copilot_account allocation indexes
+
+Adds a partial index on available rows per account_type (used by account
+claims and the inventory counts) and an index on expires_at. Both are built
+CONCURRENTLY so a large, live copilot_account table keeps taking writes.
+
+Revision ID: 0c0220f96fef
+Revises: abfada5eb4f7
+Create Date: 2026-10-18 20:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c0220f96fef'
+down_revision: Union[str, None] = 'abfada5eb4f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_copilot_account_available_type',
+            'copilot_account',
+            ['account_type', 'id'],
+            postgresql_where=sa.text("status = 'available'"),
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            'ix_copilot_account_expires_at',
+            'copilot_account',
+            ['expires_at'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_copilot_account_expires_at',
+            table_name='copilot_account',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+        op.drop_index(
+            'ix_copilot_account_available_type',
+            table_name='copilot_account',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
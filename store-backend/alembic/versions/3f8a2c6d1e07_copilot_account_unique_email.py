@@ -0,0 +1,70 @@
+"""copilot_account unique email
+
+Makes ix_copilot_account_email unique, so concurrent imports of the same
+accounts cannot both insert them (bulk imports use ON CONFLICT DO NOTHING on
+it). Duplicate rows that are still available are removed first, keeping the
+row that was sold or, among unsold ones, the oldest. The new index is built
+CONCURRENTLY and swapped in for the old one.
+
+Revision ID: 3f8a2c6d1e07
+Revises: 7e3c1d9a4b62
+Create Date: 2026-10-19 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8a2c6d1e07'
+down_revision: Union[str, None] = '7e3c1d9a4b62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Duplicates that were both sold cannot be resolved here; building the
+    # index then fails and they need to be cleaned up by hand.
+    op.execute("""
+        DELETE FROM copilot_account a
+        USING copilot_account b
+        WHERE a.email = b.email
+          AND a.id <> b.id
+          AND a.status = 'available'
+          AND (b.status <> 'available' OR b.id < a.id)
+    """)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_copilot_account_email_unique',
+            'copilot_account',
+            ['email'],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.drop_index(
+            'ix_copilot_account_email',
+            table_name='copilot_account',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+        op.execute('ALTER INDEX ix_copilot_account_email_unique RENAME TO ix_copilot_account_email')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_copilot_account_email_plain',
+            'copilot_account',
+            ['email'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.drop_index(
+            'ix_copilot_account_email',
+            table_name='copilot_account',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+        op.execute('ALTER INDEX ix_copilot_account_email_plain RENAME TO ix_copilot_account_email')
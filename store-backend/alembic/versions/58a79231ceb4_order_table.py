@@ -0,0 +1,76 @@
+"""order table
+
+Adds the order table and links copilot_account.order_id to it. Until now,
+accounts were assigned with order_id 0, which references nothing, so those
+values are cleared first. The foreign key is added NOT VALID and then
+validated after the migration transaction has committed. The long check of
+existing rows therefore holds only a SHARE UPDATE EXCLUSIVE lock, and claims
+keep running during it. The index on order_id is built CONCURRENTLY.
+
+Revision ID: 58a79231ceb4
+Revises: 0bd5db9c5e4d
+Create Date: 2026-10-18 22:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '58a79231ceb4'
+down_revision: Union[str, None] = '0bd5db9c5e4d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'order',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('stripe_session_id', sa.String(), nullable=False),
+        sa.Column('customer_email', sa.String(), nullable=False),
+        sa.Column('quantities', sa.JSON(), nullable=False),
+        sa.Column('amount_total', sa.Integer(), nullable=True),
+        sa.Column('currency', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('fulfilled_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('stripe_session_id')
+    )
+    op.create_index('ix_order_customer_email', 'order', ['customer_email'])
+    op.create_index('ix_order_created_at_id', 'order', ['created_at', 'id'])
+
+    op.execute("UPDATE copilot_account SET order_id = NULL WHERE order_id IS NOT NULL")
+    op.execute(
+        'ALTER TABLE copilot_account ADD CONSTRAINT copilot_account_order_id_fkey '
+        'FOREIGN KEY (order_id) REFERENCES "order" (id) NOT VALID'
+    )
+
+    # Outside the migration transaction, so the ADD CONSTRAINT lock is already
+    # released while existing rows are checked; CREATE INDEX CONCURRENTLY
+    # cannot run inside a transaction block either
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE copilot_account VALIDATE CONSTRAINT copilot_account_order_id_fkey")
+        op.create_index(
+            'ix_copilot_account_order_id',
+            'copilot_account',
+            ['order_id'],
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_copilot_account_order_id',
+            table_name='copilot_account',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+    op.drop_constraint('copilot_account_order_id_fkey', 'copilot_account', type_='foreignkey')
+    op.drop_index('ix_order_created_at_id', table_name='order')
+    op.drop_index('ix_order_customer_email', table_name='order')
+    op.drop_table('order')
@@ -0,0 +1,37 @@
+"""rate_limit_bucket
+
+Adds rate_limit_bucket, which holds the shared token buckets used when the
+AI chat rate limiter runs with AI_RATE_LIMIT_BACKEND=postgres.
+
+Revision ID: 7e3c1d9a4b62
+Revises: 58a79231ceb4
+Create Date: 2026-10-18 23:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e3c1d9a4b62'
+down_revision: Union[str, None] = '58a79231ceb4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'rate_limit_bucket',
+        sa.Column('key', sa.String(length=200), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_rate_limit_bucket_updated_at', 'rate_limit_bucket', ['updated_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_rate_limit_bucket_updated_at', table_name='rate_limit_bucket')
+    op.drop_table('rate_limit_bucket')
@@ -0,0 +1,96 @@
+"""initial schema
+
+Creates the tables that init_db's create_all used to build. Databases that
+were already created that way only need to be stamped before upgrading:
+
+    alembic stamp abfada5eb4f7 && alembic upgrade head
+
+Revision ID: abfada5eb4f7
+Revises: 
+Create Date: 2026-10-18 20:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'abfada5eb4f7'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'copilot_account',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password', sa.String(), nullable=False),
+        sa.Column('account_type', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('assigned_to_email', sa.String(), nullable=True),
+        sa.Column('assigned_at', sa.DateTime(), nullable=True),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('notes', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_copilot_account_email', 'copilot_account', ['email'])
+
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('to_email', sa.String(), nullable=False),
+        sa.Column('account_ids', sa.JSON(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_email_outbox_next_attempt_at', 'email_outbox', ['next_attempt_at'])
+
+    op.create_table(
+        'stripe_event',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('type', sa.String(), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stripe_event_next_attempt_at', 'stripe_event', ['next_attempt_at'])
+
+    op.create_table(
+        'ai_answer_cache',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('prompt', sa.Text(), nullable=False),
+        sa.Column('answer', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_ai_answer_cache_expires_at', 'ai_answer_cache', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ai_answer_cache_expires_at', table_name='ai_answer_cache')
+    op.drop_table('ai_answer_cache')
+    op.drop_index('ix_stripe_event_next_attempt_at', table_name='stripe_event')
+    op.drop_table('stripe_event')
+    op.drop_index('ix_email_outbox_next_attempt_at', table_name='email_outbox')
+    op.drop_table('email_outbox')
+    op.drop_index('ix_copilot_account_email', table_name='copilot_account')
+    op.drop_table('copilot_account')
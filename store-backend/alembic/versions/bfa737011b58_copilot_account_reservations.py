@@ -0,0 +1,80 @@
+"""copilot_account reservations
+
+Adds the reserved_by/reserved_until lease columns used by reservation mode.
+The partial allocation index is rebuilt to also cover reserved rows, since
+they still count as stock. A small partial index on reserved_until makes
+releasing expired leases cheap.
+
+Revision ID: bfa737011b58
+Revises: 0c0220f96fef
+Create Date: 2026-10-18 20:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bfa737011b58'
+down_revision: Union[str, None] = '0c0220f96fef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('copilot_account', sa.Column('reserved_by', sa.String(), nullable=True))
+    op.add_column('copilot_account', sa.Column('reserved_until', sa.DateTime(), nullable=True))
+
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_copilot_account_available_type',
+            table_name='copilot_account',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+        op.create_index(
+            'ix_copilot_account_available_type',
+            'copilot_account',
+            ['account_type', 'id'],
+            postgresql_where=sa.text("status IN ('available', 'reserved')"),
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_copilot_account_reserved_until',
+            'copilot_account',
+            ['reserved_until'],
+            postgresql_where=sa.text("status = 'reserved'"),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    # Hand reserved accounts back before the lease columns go away
+    op.execute(
+        "UPDATE copilot_account SET status = 'available' WHERE status = 'reserved'"
+    )
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_copilot_account_reserved_until',
+            table_name='copilot_account',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+        op.drop_index(
+            'ix_copilot_account_available_type',
+            table_name='copilot_account',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+        op.create_index(
+            'ix_copilot_account_available_type',
+            'copilot_account',
+            ['account_type', 'id'],
+            postgresql_where=sa.text("status = 'available'"),
+            postgresql_concurrently=True
+        )
+    op.drop_column('copilot_account', 'reserved_until')
+    op.drop_column('copilot_account', 'reserved_by')
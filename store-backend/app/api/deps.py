@@ -0,0 +1,11 @@
+import secrets
+from typing import Optional
+from fastapi import Header, HTTPException
+from app.core.config import settings
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(default=None)):
+    """Admin endpoints need the X-Admin-Token header; they are disabled while ADMIN_API_TOKEN is unset."""
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin API is disabled.")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
@@ -0,0 +1,90 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.api.deps import require_admin_token
+from app.db.session import get_read_session
+from app.models.inventory import CopilotAccount
+from app.models.order import Order
+from app.schemas.admin import AccountPage, OrderPage
+from app.services import admin_service
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+def _csv_response(rows, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        rows,
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/orders", response_model=OrderPage)
+async def list_orders(
+    status: Optional[str] = None,
+    customer_email: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = Query(default=50, ge=1, le=admin_service.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session)
+):
+    """
+    Lists orders, newest first. Pass the returned next_cursor to get the next
+    page; it is null on the last page.
+    """
+    conditions = admin_service.order_filters(status, customer_email, created_from, created_to)
+    try:
+        return await admin_service.list_orders(db, conditions, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/orders/export.csv")
+async def export_orders(
+    status: Optional[str] = None,
+    customer_email: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+):
+    """Streams every matching order as CSV."""
+    conditions = admin_service.order_filters(status, customer_email, created_from, created_to)
+    return _csv_response(
+        admin_service.export_csv(admin_service.ORDER_COLUMNS, conditions, Order.id),
+        "orders.csv"
+    )
+
+@router.get("/accounts", response_model=AccountPage)
+async def list_accounts(
+    status: Optional[str] = None,
+    account_type: Optional[str] = None,
+    order_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = Query(default=50, ge=1, le=admin_service.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session)
+):
+    """
+    Lists inventory accounts (without passwords), newest first. Pass the
+    returned next_cursor to get the next page; it is null on the last page.
+    """
+    conditions = admin_service.account_filters(status, account_type, order_id, created_from, created_to)
+    try:
+        return await admin_service.list_accounts(db, conditions, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/accounts/export.csv")
+async def export_accounts(
+    status: Optional[str] = None,
+    account_type: Optional[str] = None,
+    order_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+):
+    """Streams every matching account (without passwords) as CSV."""
+    conditions = admin_service.account_filters(status, account_type, order_id, created_from, created_to)
+    return _csv_response(
+        admin_service.export_csv(admin_service.ACCOUNT_COLUMNS, conditions, CopilotAccount.id),
+        "accounts.csv"
+    )
@@ -1,20 +1,68 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-import google.generativeai as genai
-from app.core.config import settings
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.core.resilience import DependencyUnavailable
+from app.schemas.ai import AICacheStats, AIChatRequest, AIChatResponse
+from app.services import ai_service
+from app.services.rate_limit import client_ip
 
 router = APIRouter()
 
-class AIChatRequest(BaseModel):
-    prompt: str
+async def admit_chat(http_request: Request, request: AIChatRequest):
+    """
+    Admission control for the chat endpoints, checked before any work is done:
+    503 when this worker already has AI_MAX_PENDING_REQUESTS chats in
+    progress, 429 when the client IP or the chat session is over its rate.
+    The request holds its slot until the response (or stream) has been sent.
+    """
+    if ai_service.chat_load_shedder.overloaded():
+        raise HTTPException(status_code=503, detail="The AI assistant is busy, please try again shortly.", headers={"Retry-After": "1"})
 
-genai.configure(api_key=settings.GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash')
+    retry_after = await ai_service.chat_ip_limiter.acquire(client_ip(http_request))
+    if request.session_id:
+        retry_after = max(retry_after, await ai_service.chat_session_limiter.acquire(request.session_id))
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Too many requests, please slow down.", headers={"Retry-After": str(max(1, round(retry_after)))})
 
-@router.post("/chat")
+    with ai_service.chat_load_shedder.hold():
+        yield
+
+@router.post("/chat", response_model=AIChatResponse, dependencies=[Depends(admit_chat)])
 async def chat_with_ai(request: AIChatRequest):
     try:
-        response = model.generate_content(request.prompt)
-        return {"message": response.text}
+        message, session_id = await ai_service.chat(request.prompt, request.session_id)
+        return {"message": message, "session_id": session_id}
+    except DependencyUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail="The AI assistant is busy, please try again shortly.",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail="The AI assistant took too long to answer.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/stream", dependencies=[Depends(admit_chat)])
+async def stream_chat_with_ai(request: AIChatRequest):
+    """
+    Streams the answer as Server-Sent Events while the model is still generating.
+    The session id is returned in the X-Session-Id header and the final done event.
+    """
+    session_id, _ = ai_service.chat_sessions.get_or_create(request.session_id)
+    return StreamingResponse(
+        ai_service.stream_sse(request.prompt, session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Session-Id": session_id}
+    )
+
+@router.get("/cache/stats", response_model=AICacheStats)
+async def get_cache_stats():
+    """
+    Returns answer cache hit ratio and how many upstream Gemini calls it saved.
+    """
+    return {
+        **ai_service.answer_cache.stats.to_dict(),
+        "memory_entries": len(ai_service.answer_cache.memory),
+        "chat_sessions": len(ai_service.chat_sessions),
+        "chat_session_chars": ai_service.chat_sessions.total_chars,
+    }
@@ -1,59 +1,110 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.services import payment_service
-from app.db.session import get_session
+from app.api.deps import require_admin_token
+from app.services import payment_service, inventory_import
+from app.services.inventory_service import inventory_feed
+from app.db.session import get_read_session, get_session
+from app.schemas.payments import AddInventoryRequest, ImportReport, InventoryCount, StatusResponse, WebhookResponse
 
 router = APIRouter()
 
-@router.post("/webhook")
+@router.post("/webhook", response_model=WebhookResponse)
 async def stripe_webhook(
     request: Request,
     db: AsyncSession = Depends(get_session)
 ):
     """
     Handles incoming webhooks from Stripe.
+
+    The event is verified and stored, then acknowledged right away; fulfillment
+    runs in the background. Redelivered events are acknowledged as duplicates.
     """
     payload = await request.body()
     sig_header = request.headers.get('stripe-signature')
 
     try:
-        await payment_service.handle_stripe_webhook(
+        inserted = await payment_service.handle_stripe_webhook(
             payload=payload,
             sig_header=sig_header,
             db=db
         )
-        return {"status": "success"}
+        return {"status": "success" if inserted else "duplicate"}
     except ValueError as e: # Invalid payload
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e: # Handle other exceptions
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/inventory")
-async def get_inventory_count(db: AsyncSession = Depends(get_session)):
+@router.get("/inventory", response_model=InventoryCount)
+async def get_inventory_count(db: AsyncSession = Depends(get_read_session)):
+    """
+    Returns the number of items in the inventory, in total and per account type.
+
+    Served from a per-process cache that is refreshed from the database every
+    few seconds, so polling this endpoint does not hit the database each time.
+    Refreshes read from a read replica when one is configured and healthy.
+    """
+    counts = await payment_service.get_inventory_counts(db)
+    return {"inventory_count": sum(counts.values()), "by_type": counts}
+
+@router.get("/inventory/stream")
+async def stream_inventory_count():
     """
+    Server-sent events with the same body as /inventory, sent on connect and
+    whenever stock changes.
 
-    Returns the number of items in the inventory.
+    Allocations and imports notify every worker through Postgres LISTEN/NOTIFY,
+    so clients get updates as they happen instead of polling, and each worker
+    uses a single database connection for all of its clients.
     """
-    count = await payment_service.get_inventory_count(db)
-    return {"inventory_count": count}
+    if not inventory_feed.enabled:
+        raise HTTPException(status_code=503, detail="Inventory stream is disabled.")
+    return StreamingResponse(
+        inventory_feed.stream(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: no stops nginx from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@router.post("/add-inventory")
+@router.post("/add-inventory", response_model=StatusResponse, dependencies=[Depends(require_admin_token)])
 async def add_inventory_item(
-    request: Request,
+    item: AddInventoryRequest,
     db: AsyncSession = Depends(get_session)
 ):
     """
-    Adds a new item to the inventory.
+    Adds a new item to the inventory. Requires the X-Admin-Token header.
+    """
+    try:
+        await payment_service.add_inventory_item(username=item.username, password=item.password, db=db)
+        return {"status": "success"}
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="An account with this email is already in the inventory.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/import-inventory", response_model=ImportReport, dependencies=[Depends(require_admin_token)])
+async def import_inventory(
+    request: Request,
+    format: Optional[str] = None,
+    db: AsyncSession = Depends(get_session)
+):
     """
-    data = await request.json()
-    username = data.get("username")
-    password = data.get("password")
+    Bulk-imports inventory from a streamed CSV or JSONL request body. Requires
+    the X-Admin-Token header.
 
-    if not username or not password:
-        raise HTTPException(status_code=400, detail="Username and password are required.")
+    The format comes from ?format=csv|jsonl or the Content-Type header. CSV needs a
+    header row with email (or username) and password, plus an optional account_type.
+    """
+    try:
+        fmt = inventory_import.detect_format(request.headers.get("content-type"), format)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
 
     try:
-        await payment_service.add_inventory_item(username=username, password=password, db=db)
-        return {"status": "success"}
+        return await inventory_import.import_inventory(request.stream(), fmt, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
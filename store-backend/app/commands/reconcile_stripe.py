@@ -0,0 +1,210 @@
+"""
+Backfills paid Checkout Sessions that were never, or only partly, fulfilled.
+
+A session is missed when its webhook failed after Stripe stopped retrying,
+and it is left short when inventory ran out while it was being fulfilled
+(the order is then ``partially_fulfilled``). This command pages through the
+completed sessions of the last ``--days`` days, newest first:
+
+* Pages are 100 sessions, Stripe's maximum. Line items are expanded, so no
+  per-session API calls are needed. The next page is fetched while the
+  current one is being checked.
+* Each page is diffed against the order table with one query on
+  ``stripe_session_id``.
+* Sessions without an order go through ``fulfill_checkout_session``.
+  Partially fulfilled orders get their shortfall claimed through
+  ``allocate_order``. Both use the batched allocation path and queue one
+  credentials email per order.
+
+Each gap is fixed in its own transaction. A webhook that fulfils the same
+session at the same time loses on the unique ``stripe_session_id`` (or the
+order's row lock), so running this next to live traffic is safe. Sessions
+created in the last ``--settle-minutes`` are left to the webhook path.
+
+    python -m app.commands.reconcile_stripe --days 30
+    python -m app.commands.reconcile_stripe --days 30 --dry-run
+
+Set STRIPE_API_BASE to run it against a local fake Stripe API
+(see benchmarks/bench_reconcile.py).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import func, select
+from app.core.logging_config import setup_logging
+from app.core.resilience import stripe_dependency
+from app.db.session import async_session_factory, engine
+from app.models.inventory import CopilotAccount
+from app.models.order import Order
+from app.services.payment_service import allocate_order, fulfill_checkout_session, get_stripe
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100  # Stripe's maximum
+PAID_STATUSES = ("paid", "no_payment_required")
+
+
+class ReconcileReport:
+    def __init__(self):
+        self.pages = 0
+        self.sessions = 0
+        self.unpaid = 0
+        self.in_order = 0
+        self.missing = 0
+        self.short = 0
+        self.fulfilled = 0
+        self.topped_up = 0
+        self.still_short = 0
+        self.failed = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(vars(self))
+
+
+def _list_sessions(created: Dict[str, int], starting_after: Optional[str]):
+    params = {
+        "limit": PAGE_SIZE,
+        "status": "complete",
+        "created": created,
+        "expand": ["data.line_items"],
+    }
+    if starting_after:
+        params["starting_after"] = starting_after
+    return get_stripe().checkout.Session.list(**params)
+
+
+async def fetch_page(created: Dict[str, int], starting_after: Optional[str]):
+    return await stripe_dependency.call(
+        "list_checkout_sessions", asyncio.to_thread, _list_sessions, created, starting_after
+    )
+
+
+async def iter_pages(created: Dict[str, int]) -> AsyncIterator[List[dict]]:
+    """Yields pages of sessions, fetching the next page while the caller works on this one."""
+    next_page = asyncio.create_task(fetch_page(created, None))
+    try:
+        while next_page is not None:
+            page = await next_page
+            sessions = list(page.data)
+            next_page = None
+            if page.has_more and sessions:
+                next_page = asyncio.create_task(fetch_page(created, sessions[-1]["id"]))
+            yield sessions
+    finally:
+        if next_page is not None:
+            next_page.cancel()
+
+
+async def diff_page(session_ids: List[str]) -> Dict[str, Tuple[int, str]]:
+    """Maps each session id that already has an order to (order id, status), in one query."""
+    async with async_session_factory() as db:
+        rows = await db.exec(
+            select(Order.stripe_session_id, Order.id, Order.status)
+            .where(Order.stripe_session_id.in_(session_ids))
+        )
+        return {row.stripe_session_id: (row.id, row.status) for row in rows.all()}
+
+
+async def fulfill_missing(session: dict, report: ReconcileReport):
+    async with async_session_factory() as db:
+        try:
+            order = await fulfill_checkout_session(session, db)
+            await db.commit()
+        except IntegrityError:
+            # 并发的 webhook 已为该会话创建订单
+            await db.rollback()
+            logger.info("Checkout session %s was fulfilled concurrently", session["id"])
+            return
+    if order is None:
+        return
+    report.fulfilled += 1
+    if order.status == "partially_fulfilled":
+        report.still_short += 1
+    logger.info("Backfilled order %s for checkout session %s (%s)", order.id, session["id"], order.status)
+
+
+async def top_up(order_id: int, report: ReconcileReport):
+    async with async_session_factory() as db:
+        # The row lock keeps two reconcilers from topping up the same order
+        order = (await db.exec(select(Order).where(Order.id == order_id).with_for_update())).one()
+        if order.status != "partially_fulfilled":
+            return
+        assigned = Counter(dict((await db.exec(
+            select(CopilotAccount.account_type, func.count(CopilotAccount.id))
+            .where(CopilotAccount.order_id == order.id)
+            .group_by(CopilotAccount.account_type)
+        )).all()))
+        missing = {
+            account_type: quantity - assigned[account_type]
+            for account_type, quantity in order.quantities.items()
+            if quantity > assigned[account_type]
+        }
+        accounts = await allocate_order(order, missing, db)
+        await db.commit()
+    if accounts:
+        report.topped_up += 1
+    if order.status == "partially_fulfilled":
+        report.still_short += 1
+    logger.info("Topped up order %s with %s accounts (%s)", order.id, len(accounts), order.status)
+
+
+async def reconcile(days: float, settle_minutes: float = 10.0, dry_run: bool = False) -> ReconcileReport:
+    now = int(time.time())
+    created = {"gte": now - int(days * 86400), "lte": now - int(settle_minutes * 60)}
+    report = ReconcileReport()
+
+    async for sessions in iter_pages(created):
+        report.pages += 1
+        report.sessions += len(sessions)
+        paid = [session for session in sessions if session.get("payment_status") in PAID_STATUSES]
+        report.unpaid += len(sessions) - len(paid)
+        if not paid:
+            continue
+
+        orders = await diff_page([session["id"] for session in paid])
+        for session in paid:
+            order = orders.get(session["id"])
+            if order is not None and order[1] != "partially_fulfilled":
+                report.in_order += 1
+                continue
+            if order is None:
+                report.missing += 1
+            else:
+                report.short += 1
+            if dry_run:
+                logger.info("Would %s checkout session %s", "fulfill" if order is None else "top up", session["id"])
+                continue
+            try:
+                if order is None:
+                    await fulfill_missing(session, report)
+                else:
+                    await top_up(order[0], report)
+            except Exception as e:
+                report.failed += 1
+                logger.error("Reconciling checkout session %s failed: %r", session["id"], e)
+
+    return report
+
+
+async def main(args):
+    started = time.perf_counter()
+    try:
+        report = await reconcile(args.days, args.settle_minutes, args.dry_run)
+    finally:
+        await engine.dispose()
+    logger.info("Stripe reconciliation finished in %.1fs", time.perf_counter() - started)
+    print(json.dumps(report.to_dict()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=float, default=30, help="how far back to look at checkout sessions")
+    parser.add_argument("--settle-minutes", type=float, default=10, help="skip sessions newer than this")
+    parser.add_argument("--dry-run", action="store_true", help="report the gaps without fixing them")
+    setup_logging()
+    asyncio.run(main(parser.parse_args()))
@@ -1,26 +1,157 @@
 from pydantic_settings import BaseSettings
 from pydantic import validator
+from typing import Dict, List, Optional
+import ipaddress
+import logging
 import os
 import re
 
+logger = logging.getLogger(__name__)
+
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements per connection
+    # Optional read replicas as a JSON list of URLs. Read-only endpoints are
+    # spread over the healthy ones and fall back to the primary when a replica
+    # is down or more than DB_REPLICA_MAX_LAG_SECONDS behind.
+    DATABASE_REPLICA_URLS: List[str] = []
+    DB_REPLICA_POOL_SIZE: int = 5
+    DB_REPLICA_MAX_OVERFLOW: int = 10
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_CHECK_INTERVAL_SECONDS: float = 5.0
+    DB_REPLICA_CHECK_TIMEOUT_SECONDS: float = 2.0
 
     # Stripe
     STRIPE_API_KEY: str
     STRIPE_WEBHOOK_SECRET: str
     STRIPE_PRICE_ID: str
+    # Extra price → account_type mappings as JSON, e.g. {"price_123": "pro"};
+    # STRIPE_PRICE_ID itself always maps to "education".
+    STRIPE_PRICE_ACCOUNT_TYPES: Dict[str, str] = {}
     FRONTEND_URL: str
+    STRIPE_EVENT_WORKERS: int = 4
+    STRIPE_EVENT_POLL_INTERVAL_SECONDS: float = 5.0
+    STRIPE_API_BASE: Optional[str] = None  # override for a local fake Stripe API
+    STRIPE_MAX_CONCURRENCY: int = 8
+    STRIPE_TIMEOUT_SECONDS: float = 20.0
+    STRIPE_EVENT_MAX_ATTEMPTS: int = 10
+    STRIPE_EVENT_BACKOFF_BASE_SECONDS: float = 10.0
+    STRIPE_EVENT_BACKOFF_MAX_SECONDS: float = 1800.0
+    STRIPE_EVENT_LEASE_SECONDS: float = 120.0
 
     # Gmail API OAuth2
     GMAIL_CLIENT_ID: str
     GMAIL_CLIENT_SECRET: str
     GMAIL_REFRESH_TOKEN: str
     EMAIL_SENDER: str
+    GMAIL_API_ENDPOINT: Optional[str] = None  # override for a local fake Gmail API
+    EMAIL_SEND_CONCURRENCY: int = 8
+    EMAIL_SEND_TIMEOUT_SECONDS: float = 30.0
+
+    # Email outbox dispatcher
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_OUTBOX_POLL_INTERVAL_SECONDS: float = 5.0
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 10
+    EMAIL_OUTBOX_BACKOFF_BASE_SECONDS: float = 30.0
+    EMAIL_OUTBOX_BACKOFF_MAX_SECONDS: float = 3600.0
+    EMAIL_OUTBOX_LEASE_SECONDS: float = 300.0
 
     # Gemini API
     GEMINI_API_KEY: str
+    GEMINI_MODEL: str = "gemini-2.0-flash"
+    GEMINI_MAX_CONCURRENCY: int = 16
+    # Deadline for a complete answer, and for each chunk of a streamed one
+    GEMINI_TIMEOUT_SECONDS: float = 30.0
+
+    # Circuit breakers around Stripe, Gmail and Gemini (app.core.resilience)
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_RESET_SECONDS: float = 30.0
+
+    # AI answer cache
+    AI_CACHE_MAX_ENTRIES: int = 1024
+    AI_CACHE_TTL_SECONDS: float = 3600.0
+    AI_CACHE_PERSISTENT: bool = False  # share answers across workers via the ai_answer_cache table
+    AI_CACHE_PERSISTENT_TTL_SECONDS: float = 86400.0
+
+    # AI chat sessions (per worker process)
+    AI_SESSION_MAX_SESSIONS: int = 10000
+    AI_SESSION_MAX_TURNS: int = 20
+    AI_SESSION_MEMORY_CAP_CHARS: int = 20_000_000
+    AI_SESSION_TOKEN_BUDGET: int = 2000
+    AI_SESSION_SUMMARY_MAX_CHARS: int = 2000
+    AI_SESSION_TTL_SECONDS: float = 3600.0
+
+    # AI chat admission control. Requests are rate limited per client IP and
+    # per chat session; "memory" buckets are per worker, "postgres" shares
+    # them across workers through the rate_limit_bucket table.
+    AI_MAX_PROMPT_CHARS: int = 4000
+    AI_RATE_LIMIT_BACKEND: str = "memory"
+    AI_RATE_LIMIT_IP_PER_MINUTE: float = 30.0
+    AI_RATE_LIMIT_SESSION_PER_MINUTE: float = 10.0
+    AI_RATE_LIMIT_BURST: int = 5
+    AI_RATE_LIMIT_MAX_KEYS: int = 100000
+    # Chat requests in progress per worker before new ones get a 503
+    AI_MAX_PENDING_REQUESTS: int = 64
+    # Peers trusted to set X-Forwarded-For (nginx in front of the API). The
+    # client IP is the last address in the chain outside these networks, so a
+    # caller reaching port 8000 directly cannot pick its own rate limit key.
+    TRUSTED_PROXY_NETWORKS: List[str] = [
+        "127.0.0.0/8", "10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16", "::1/128", "fc00::/7"
+    ]
+
+    # Inventory bulk import
+    INVENTORY_IMPORT_BATCH_SIZE: int = 1000
+    INVENTORY_IMPORT_MAX_REPORTED_ERRORS: int = 100
+
+    # Inventory count cache (per worker process)
+    INVENTORY_COUNT_CACHE_TTL_SECONDS: float = 5.0
+
+    # Live inventory stream (SSE): stock changes are sent with NOTIFY and each
+    # worker LISTENs on one connection, whatever the number of clients.
+    INVENTORY_STREAM_ENABLED: bool = True
+    INVENTORY_STREAM_COALESCE_SECONDS: float = 0.25
+    INVENTORY_STREAM_HEARTBEAT_SECONDS: float = 15.0
+    INVENTORY_STREAM_MAX_SECONDS: float = 300.0  # clients reconnect after this
+
+    # Account expiry sweeper: marks assigned accounts past expires_at as expired
+    # and later moves them to copilot_account_history, in chunks
+    INVENTORY_EXPIRY_BATCH_SIZE: int = 500
+    INVENTORY_EXPIRY_POLL_INTERVAL_SECONDS: float = 300.0
+    INVENTORY_EXPIRY_NOTIFY: bool = False  # email customers when their accounts expire
+    # Expiry notices look the accounts up in copilot_account, so keep this well
+    # above the outbox retry window; None keeps expired rows in place.
+    INVENTORY_EXPIRY_ARCHIVE_AFTER_DAYS: Optional[float] = 30.0
+
+    # Inventory reservation: each worker leases a batch of accounts and serves
+    # allocations from it. The refresh interval must be well below the lease.
+    INVENTORY_RESERVATION_ENABLED: bool = False
+    INVENTORY_RESERVATION_BATCH_SIZE: int = 20
+    INVENTORY_RESERVATION_LOW_WATER: int = 5
+    INVENTORY_RESERVATION_LEASE_SECONDS: float = 300.0
+    INVENTORY_RESERVATION_REFRESH_SECONDS: float = 60.0
+
+    # Logging: records are queued and written as JSON by a background thread
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # or "text"
+    LOG_QUEUE_SIZE: int = 10000  # records beyond this are dropped, not waited on
+    # Fraction of DEBUG/INFO records kept per logger (and its children) as JSON,
+    # e.g. {"uvicorn.access": 0.1, "app.services.inventory_service": 0.5}
+    LOG_SAMPLE_RATES: Dict[str, float] = {}
+
+    # Admin API (/api/v1/admin and the inventory add/import endpoints):
+    # requests must send this in X-Admin-Token; they are disabled while it is unset
+    ADMIN_API_TOKEN: Optional[str] = None
+
+    # Import and configure the Stripe/Gmail/Gemini clients in a background
+    # thread once the app is up, so the first request does not pay for it.
+    PRELOAD_SDKS: bool = True
 
     @validator('DATABASE_URL')
     def validate_database_url(cls, v):
@@ -30,6 +161,33 @@ class Settings(BaseSettings):
             raise ValueError('DATABASE_URL must be a valid PostgreSQL connection string')
         return v
 
+    @validator('DATABASE_REPLICA_URLS', each_item=True)
+    def validate_database_replica_urls(cls, v):
+        if not v.startswith(('postgresql://', 'postgresql+asyncpg://')):
+            raise ValueError('DATABASE_REPLICA_URLS must contain valid PostgreSQL connection strings')
+        return v
+
+    @validator('TRUSTED_PROXY_NETWORKS', each_item=True)
+    def validate_trusted_proxy_networks(cls, v):
+        try:
+            ipaddress.ip_network(v)
+        except ValueError:
+            raise ValueError(f'TRUSTED_PROXY_NETWORKS entry {v!r} is not an IP network')
+        return v
+
+    @validator('AI_SESSION_MAX_TURNS')
+    def validate_session_max_turns(cls, v):
+        # History is kept and trimmed in user/model pairs
+        if v < 2 or v % 2:
+            raise ValueError('AI_SESSION_MAX_TURNS must be an even number of at least 2')
+        return v
+
+    @validator('AI_RATE_LIMIT_BACKEND')
+    def validate_rate_limit_backend(cls, v):
+        if v not in ('memory', 'postgres'):
+            raise ValueError('AI_RATE_LIMIT_BACKEND must be "memory" or "postgres"')
+        return v
+
     @validator('STRIPE_API_KEY')
     def validate_stripe_key(cls, v):
         if not v.startswith(('sk_test_', 'sk_live_')):
@@ -105,14 +263,15 @@ class Settings(BaseSettings):
         env_file = ".env"
         env_file_encoding = "utf-8"
 
-# 创建设置实例并验证
+# 创建设置实例（只解析环境变量，不做打印或外部调用，保证导入足够快）
 settings = Settings()
 
-# 在开发环境中验证配置
-if os.getenv('ENVIRONMENT', 'development') == 'development':
+def check_settings():
+    """在开发环境中检查配置是否仍为示例值；由应用启动时调用，而不是在导入时"""
+    if os.getenv('ENVIRONMENT', 'development') != 'development':
+        return
     try:
         settings.validate_all_required()
-        print("✅ 配置验证通过")
+        logger.info("✅ 配置验证通过")
     except ValueError as e:
-        print(f"⚠️  配置验证警告: {e}")
-        print("请检查 .env 文件并设置正确的配置值")
+        logger.warning("⚠️  配置验证警告: %s\n请检查 .env 文件并设置正确的配置值", e)
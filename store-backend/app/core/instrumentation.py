@@ -0,0 +1,96 @@
+import time
+from typing import Dict, Iterable, Sequence
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import BaseRoute, Match
+from app.core.metrics import (
+    Family,
+    current_operation,
+    db_query_duration_seconds,
+    http_request_duration_seconds,
+    http_requests_in_flight,
+    http_requests_total,
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, status counts and in-flight requests.
+
+    Requests are labelled with the matched route template rather than the raw
+    path, so label cardinality stays bounded. The path-to-template lookup is
+    memoized; /metrics itself is not recorded.
+    """
+
+    def __init__(self, app, routes: Sequence[BaseRoute], max_cached_paths: int = 1024):
+        self.app = app
+        self.routes = routes
+        self.max_cached_paths = max_cached_paths
+        self._templates: Dict[str, str] = {}
+
+    def _route_template(self, scope) -> str:
+        path = scope["path"]
+        template = self._templates.get(path)
+        if template is None:
+            template = "unmatched"
+            for route in self.routes:
+                match, _ = route.matches(scope)
+                if match != Match.NONE:
+                    template = getattr(route, "path", template)
+                    break
+            if len(self._templates) < self.max_cached_paths:
+                self._templates[path] = template
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route_template(scope)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        http_requests_in_flight.inc(method=method, route=route)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec(method=method, route=route)
+            http_request_duration_seconds.observe(time.perf_counter() - started, method=method, route=route)
+            http_requests_total.inc(method=method, route=route, status=status)
+
+
+def instrument_engine(engine: Engine):
+    """Times every statement on ``engine``, tagged with the current service operation."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if starts:
+            db_query_duration_seconds.observe(
+                time.perf_counter() - starts.pop(), operation=current_operation.get()
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+def gauges(prefix: str, documentation: str, values: dict) -> Iterable[Family]:
+    """Turns a flat dict of numbers into one gauge family per key."""
+    for key, value in values.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}_{key}", "gauge", f"{documentation} ({key})", [({}, value)]
@@ -0,0 +1,162 @@
+"""
+Queue-based logging with JSON output.
+
+Every logger (app, uvicorn, SQLAlchemy) ends at one handler on the root
+logger that only appends the record to an in-memory queue. A QueueListener
+thread formats the records and writes them to stdout, so a request never
+waits on log I/O, and a slow or blocked stdout only fills the queue. When
+the queue is full, new records are dropped and counted rather than blocking
+the caller.
+
+Records are queued unformatted. Their %-style arguments are rendered on the
+listener thread, so call sites should pass arguments (``logger.info("x %s",
+y)``) instead of f-strings, and must not log objects they mutate right
+afterwards.
+
+``LOG_SAMPLE_RATES`` keeps only a fraction of the DEBUG/INFO records of noisy
+loggers. It is keyed by logger name, and a key also covers the loggers below
+it. WARNING and above are never sampled.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from app.core.config import settings
+
+# Attributes every LogRecord has; anything else on a record came from ``extra=``.
+# color_message is uvicorn's ANSI-coloured copy of the message.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "color_message"}
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, any ``extra`` fields and the traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through only ``rate`` of the records below WARNING from the configured loggers."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+        self._resolved: Dict[str, float] = {}
+
+    def rate_for(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            candidate = name
+            while candidate:
+                if candidate in self.rates:
+                    rate = self.rates[candidate]
+                    break
+                candidate = candidate.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queues records as they are, leaving formatting to the listener, and drops them when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_sampler: Optional[SamplingFilter] = None
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging():
+    """
+    Routes all logging through the queue and starts the writer thread. Runs
+    once per process, from the app's lifespan startup or a command's main();
+    uvicorn has configured its own loggers by then, so their handlers are
+    removed here and they propagate to the root logger like everything else.
+    """
+    global _handler, _sampler, _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.Queue = queue.Queue(settings.LOG_QUEUE_SIZE)
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+    _handler = NonBlockingQueueHandler(log_queue)
+    _sampler = SamplingFilter(settings.LOG_SAMPLE_RATES)
+    _handler.addFilter(_sampler)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        for handler in uvicorn_logger.handlers[:]:
+            uvicorn_logger.removeHandler(handler)
+        uvicorn_logger.propagate = True
+
+    # Statement logging goes through the queue as well. The engine is created
+    # without echo=True, which would attach SQLAlchemy's own stdout handler.
+    if settings.DB_ECHO:
+        logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    # Flushes what is still queued when the process exits.
+    atexit.register(_listener.stop)
+
+
+def get_logging_stats() -> Dict[str, int]:
+    """Queue depth and records dropped by sampling or a full queue."""
+    if _handler is None:
+        return {}
+    return {
+        "queue_depth": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "sampled_out": _sampler.sampled_out,
+    }
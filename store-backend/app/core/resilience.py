@@ -0,0 +1,247 @@
+"""
+Failure isolation for calls to external services (Stripe, Gmail, Gemini).
+
+Every dependency gets its own ``Dependency`` with:
+
+* a bulkhead: at most ``max_concurrency`` calls in flight. A caller waits at
+  most ``max_wait`` seconds for a slot (0 fails fast, None waits), so a slow
+  dependency cannot tie up every worker and connection in the process;
+* a deadline: ``call`` gives up after ``timeout`` seconds;
+* a circuit breaker: after ``failure_threshold`` consecutive failures the
+  circuit opens and calls are rejected right away for ``reset_timeout``
+  seconds. After that a single probe call is let through (half-open); it
+  closes the circuit if it succeeds and re-opens it if it fails.
+
+Rejected calls raise ``DependencyUnavailable`` without touching the
+dependency; callers turn that into their fallback (a 503 for the client, a
+rescheduled outbox message, ...).
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional, TypeVar
+from app.core.config import settings
+from app.core.metrics import Family, external_call, registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+dependency_rejected_total = registry.counter(
+    "dependency_rejected_total",
+    "Calls to external services rejected without being made.",
+    ("dependency", "reason")
+)
+dependency_timeouts_total = registry.counter(
+    "dependency_timeouts_total",
+    "Calls to external services abandoned at their deadline.",
+    ("dependency", "operation")
+)
+
+
+class DependencyUnavailable(Exception):
+    """Raised instead of calling a dependency whose circuit is open or whose bulkhead is full."""
+
+    def __init__(self, dependency: str, reason: str, retry_after: float = 0.0):
+        super().__init__(f"{dependency} is unavailable: {reason}")
+        self.dependency = dependency
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def is_failure(exc: BaseException) -> bool:
+    """
+    Whether an error says something about the dependency's health. 4xx
+    responses other than 429 are the caller's fault (bad input, unknown id) and
+    show the dependency is up, so they do not count against the circuit.
+    """
+    for attribute in ("http_status", "status_code", "code"):
+        status = getattr(exc, attribute, None)
+        if isinstance(status, int) and 400 <= status < 500:
+            return status == 429
+    return True
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def available(self) -> bool:
+        """Whether a call would currently be let through (does not claim the probe)."""
+        if self.state == OPEN:
+            return self.retry_after() == 0.0
+        return not (self.state == HALF_OPEN and self._probing)
+
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return False
+            self.state = HALF_OPEN
+            logger.info("Circuit for %s is half-open, sending a probe call", self.name)
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def release(self):
+        """Called when an admitted call ends, whatever its outcome."""
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            logger.info("Circuit for %s closed, the probe call succeeded", self.name)
+
+    def record_failure(self, error: BaseException):
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+            logger.warning(
+                "Circuit for %s opened after %s consecutive failures, failing fast for %.0fs: %r",
+                self.name, self.failures, self.reset_timeout, error
+            )
+
+
+class Dependency:
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        timeout: float,
+        max_wait: Optional[float],
+        failure_threshold: int,
+        reset_timeout: float
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_wait = max_wait
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.in_flight = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    def available(self) -> bool:
+        return self.breaker.available()
+
+    def _reject(self, reason: str):
+        dependency_rejected_total.inc(dependency=self.name, reason=reason)
+        raise DependencyUnavailable(self.name, reason.replace("_", " "), self.breaker.retry_after())
+
+    async def _acquire(self):
+        if self.max_wait is None or not self._slots.locked():
+            await self._slots.acquire()
+            return
+        if self.max_wait <= 0:
+            self._reject("bulkhead_full")
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.max_wait)
+        except TimeoutError:
+            self._reject("bulkhead_full")
+
+    @asynccontextmanager
+    async def guard(self, operation: str) -> AsyncIterator[None]:
+        """
+        Holds a bulkhead slot for the body and records its outcome on the
+        circuit. It sets no deadline; use ``call``, or ``deadline()`` for each
+        step of a streamed response.
+        """
+        await self._acquire()
+        try:
+            if not self.breaker.allow():
+                self._reject("circuit_open")
+            self.in_flight += 1
+            try:
+                with external_call(self.name, operation):
+                    yield
+            except Exception as e:
+                if isinstance(e, TimeoutError):
+                    dependency_timeouts_total.inc(dependency=self.name, operation=operation)
+                if is_failure(e):
+                    self.breaker.record_failure(e)
+                else:
+                    self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+            finally:
+                self.in_flight -= 1
+                self.breaker.release()
+        finally:
+            self._slots.release()
+
+    def deadline(self):
+        return asyncio.timeout(self.timeout)
+
+    async def call(self, operation: str, fn: Callable[..., Awaitable[T]], *args) -> T:
+        """Awaits ``fn(*args)`` inside the bulkhead and circuit, with the dependency's deadline."""
+        async with self.guard(operation):
+            async with self.deadline():
+                return await fn(*args)
+
+
+stripe_dependency = Dependency(
+    "stripe",
+    max_concurrency=settings.STRIPE_MAX_CONCURRENCY,
+    timeout=settings.STRIPE_TIMEOUT_SECONDS,
+    max_wait=settings.STRIPE_TIMEOUT_SECONDS,
+    failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.CIRCUIT_BREAKER_RESET_SECONDS
+)
+# Sends run on email_service's executor with EMAIL_SEND_CONCURRENCY threads;
+# only the outbox dispatcher sends, so waiting for a slot is fine. Sends are
+# guarded without a deadline: abandoning one that still completes would send
+# the email twice, so the HTTP timeout of the transport bounds them instead.
+gmail_dependency = Dependency(
+    "gmail",
+    max_concurrency=settings.EMAIL_SEND_CONCURRENCY,
+    timeout=settings.EMAIL_SEND_TIMEOUT_SECONDS,
+    max_wait=None,
+    failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.CIRCUIT_BREAKER_RESET_SECONDS
+)
+# Chat requests are user-facing: when every slot is busy they fail fast with a
+# 503 instead of queueing behind a slow model.
+gemini_dependency = Dependency(
+    "gemini",
+    max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+    timeout=settings.GEMINI_TIMEOUT_SECONDS,
+    max_wait=0,
+    failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.CIRCUIT_BREAKER_RESET_SECONDS
+)
+
+DEPENDENCIES = (stripe_dependency, gmail_dependency, gemini_dependency)
+
+
+def dependency_metrics() -> Iterable[Family]:
+    """Collector for the metrics registry: circuit state and bulkhead usage per dependency."""
+    yield "dependency_circuit_state", "gauge", "Circuit breaker state (0 closed, 1 half-open, 2 open)", [
+        ({"dependency": dependency.name}, STATE_VALUES[dependency.breaker.state]) for dependency in DEPENDENCIES
+    ]
+    yield "dependency_consecutive_failures", "gauge", "Consecutive failed calls", [
+        ({"dependency": dependency.name}, dependency.breaker.failures) for dependency in DEPENDENCIES
+    ]
+    yield "dependency_in_flight", "gauge", "Calls currently holding a bulkhead slot", [
+        ({"dependency": dependency.name}, dependency.in_flight) for dependency in DEPENDENCIES
+    ]
+    yield "dependency_max_concurrency", "gauge", "Bulkhead size", [
+        ({"dependency": dependency.name}, dependency.max_concurrency) for dependency in DEPENDENCIES
+    ]
@@ -1,21 +1,244 @@
+import asyncio
+import itertools
+import logging
+import time
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy.orm import sessionmaker
-from typing import AsyncGenerator
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from typing import AsyncGenerator, Dict, List, Optional
 from app.core.config import settings
+from app.services.background import PollingWorker
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Checkout wait totals for the connection pool."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.waits_over_1ms = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        if wait > 0.001:
+            self.waits_over_1ms += 1
+        if timed_out:
+            self.timeouts += 1
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except Exception:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+# SQLAlchemy names pool loggers after the pool class, which puts this one
+# outside the sqlalchemy.* hierarchy; keep its dispose/recreate chatter quiet.
+logging.getLogger(f"{__name__}.{InstrumentedQueuePool.__name__}").setLevel(logging.WARNING)
+
+
+def _create_engine(url: str, pool_size: int, max_overflow: int) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        # DB_ECHO is applied through the logging config (app.core.logging_config),
+        # so statements are logged via the queue instead of a stdout handler.
+        future=True,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+    )
+
 
 # The database URL is loaded from the settings object
-engine = create_async_engine(settings.DATABASE_URL, echo=True, future=True)
+engine = _create_engine(settings.DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
+
+# Built once and shared; creating a sessionmaker per request is wasted work.
+async_session_factory = async_sessionmaker(
+    engine, class_=AsyncSession, expire_on_commit=False
+)
 
 async def init_db():
+    """
+    Creates any missing tables straight from the models. Only meant for scratch
+    databases (benchmarks, local experiments); real schemas are managed with
+    ``alembic upgrade head`` and this is not run at startup.
+    """
     async with engine.begin() as conn:
         # await conn.run_sync(SQLModel.metadata.drop_all) # Use for development reset
         await conn.run_sync(SQLModel.metadata.create_all)
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    async_session = sessionmaker(
-        engine, class_=AsyncSession, expire_on_commit=False
-    )
-    async with async_session() as session:
+    async with async_session_factory() as session:
         yield session
+
+
+# Seconds the replica is behind the primary. A replica that has replayed
+# everything it received is not lagging, even if the primary has been idle
+# since; a standby that has never replayed anything reports NULL.
+REPLICATION_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class Replica:
+    """A read replica's engine and the outcome of its last health check."""
+
+    def __init__(self, url: str):
+        self.engine = _create_engine(url, settings.DB_REPLICA_POOL_SIZE, settings.DB_REPLICA_MAX_OVERFLOW)
+        self.session_factory = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.name = f"{self.engine.url.host}:{self.engine.url.port or 5432}"
+        self.healthy = False
+        self.lag: Optional[float] = None
+
+    def mark_down(self, reason: object):
+        if self.healthy:
+            logger.warning("Read replica %s marked down, reads go to the primary: %s", self.name, reason)
+        self.healthy = False
+
+
+class ReadReplicas(PollingWorker):
+    """
+    Optional read replicas for read-only requests.
+
+    A background check measures each replica's replication lag every
+    ``poll_interval`` seconds. Replicas that answer within ``check_timeout``
+    and are at most ``max_lag`` seconds behind are healthy. ``pick()`` rotates
+    over the healthy ones and returns None when there are none, in which case
+    callers read from the primary. Replicas start out unhealthy until their
+    first check passes, so a cold start never reads from a lagging standby.
+    """
+
+    name = "db-replica-health"
+
+    def __init__(self, urls: List[str], max_lag: float, check_timeout: float, poll_interval: float):
+        super().__init__(batch_size=1, poll_interval=poll_interval)
+        self.replicas = [Replica(url) for url in urls]
+        self.max_lag = max_lag
+        self.check_timeout = check_timeout
+        self._rotation = itertools.count()
+
+    def start(self):
+        if self.replicas:
+            super().start()
+
+    def pick(self) -> Optional[Replica]:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._rotation) % len(healthy)]
+
+    async def _check(self, replica: Replica):
+        try:
+            async with replica.engine.connect() as conn:
+                lag = await asyncio.wait_for(conn.scalar(REPLICATION_LAG_SQL), timeout=self.check_timeout)
+        except Exception as e:
+            replica.lag = None
+            replica.mark_down(e)
+            return
+        replica.lag = float(lag) if lag is not None else None
+        if replica.lag is None or replica.lag > self.max_lag:
+            replica.mark_down(f"replication lag {replica.lag}s exceeds {self.max_lag}s")
+        elif not replica.healthy:
+            replica.healthy = True
+            logger.info("Read replica %s is healthy (lag %.1fs)", replica.name, replica.lag)
+
+    async def run_once(self) -> int:
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+        return 0
+
+    async def stop(self):
+        await super().stop()
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> List[Dict[str, object]]:
+        return [
+            {"name": replica.name, "healthy": replica.healthy, "lag_seconds": replica.lag}
+            for replica in self.replicas
+        ]
+
+
+read_replicas = ReadReplicas(
+    urls=settings.DATABASE_REPLICA_URLS,
+    max_lag=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    check_timeout=settings.DB_REPLICA_CHECK_TIMEOUT_SECONDS,
+    poll_interval=settings.DB_REPLICA_CHECK_INTERVAL_SECONDS
+)
+
+
+def read_session_factory() -> async_sessionmaker:
+    """Session factory for read-only work: a healthy replica if there is one, else the primary."""
+    replica = read_replicas.pick()
+    return replica.session_factory if replica else async_session_factory
+
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for read-only endpoints. Reads may trail the primary by up to
+    DB_REPLICA_MAX_LAG_SECONDS, so do not use it for read-your-writes flows.
+    A connection failure takes the replica out of rotation until the next
+    health check passes.
+    """
+    factory = read_session_factory()
+    replica = next((r for r in read_replicas.replicas if r.session_factory is factory), None)
+    async with factory() as session:
+        try:
+            yield session
+        except (DBAPIError, OSError) as e:
+            if replica is not None and (isinstance(e, OSError) or e.connection_invalidated):
+                replica.mark_down(e)
+            raise
+
+def get_pool_stats() -> Dict[str, float]:
+    """Returns pool occupancy and checkout wait figures for sizing the pool."""
+    pool = engine.sync_engine.pool
+    capacity = settings.DB_POOL_SIZE + max(settings.DB_MAX_OVERFLOW, 0)
+    checked_out = pool.checkedout()
+    stats = pool.stats
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checked_out": checked_out,
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "utilization": checked_out / capacity if capacity else 0.0,
+        "checkouts": stats.checkouts,
+        "checkout_waits_over_1ms": stats.waits_over_1ms,
+        "checkout_timeouts": stats.timeouts,
+        "checkout_wait_avg_ms": stats.total_wait / stats.checkouts * 1000 if stats.checkouts else 0.0,
+        "checkout_wait_max_ms": stats.max_wait * 1000,
+    }
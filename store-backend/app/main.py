@@ -1,13 +1,70 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Union
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import payments, ai
-from app.db.session import init_db
-from app.core.config import settings
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from app.api.v1 import payments, ai, admin
+from app.core.instrumentation import MetricsMiddleware, gauges, instrument_engine
+from app.core.logging_config import get_logging_stats, setup_logging
+from app.core.metrics import registry
+from app.core.resilience import dependency_metrics
+from app.db.session import engine, get_pool_stats, read_replicas
+from app.services import ai_service, email_service, payment_service
+from app.services.email_outbox import email_outbox_dispatcher
+from app.services.inventory_expiry import inventory_expiry_sweeper
+from app.services.inventory_reservation import inventory_reservations
+from app.services.inventory_service import inventory_feed
+from app.schemas.payments import StatusResponse
+from app.services.payment_service import stripe_event_processor
+from app.core.config import settings, check_settings
+
+logger = logging.getLogger(__name__)
+
+def preload_sdks():
+    """Imports and configures the external service clients; runs in a worker thread."""
+    for name, load in (
+        ("stripe", payment_service.get_stripe),
+        ("gemini", ai_service.get_model),
+        ("gmail", email_service.get_gmail_service),
+    ):
+        try:
+            load()
+        except Exception as e:
+            logger.warning("Preloading %s client failed, it will be retried on first use: %s", name, e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 在启动时而不是导入时接管日志，测试和基准脚本导入 app.main 不会被改动日志配置
+    setup_logging()
+    # 数据库结构由 alembic upgrade head 管理，启动时不再执行 create_all
+    check_settings()
+    email_outbox_dispatcher.start()
+    stripe_event_processor.start()
+    inventory_reservations.start()
+    inventory_feed.start()
+    inventory_expiry_sweeper.start()
+    read_replicas.start()
+    preload = asyncio.create_task(asyncio.to_thread(preload_sdks)) if settings.PRELOAD_SDKS else None
+    yield
+    if preload is not None and not preload.done():
+        preload.cancel()
+    await inventory_feed.stop()
+    await inventory_expiry_sweeper.stop()
+    await stripe_event_processor.stop()
+    await inventory_reservations.stop()
+    await email_outbox_dispatcher.stop()
+    await read_replicas.stop()
+    email_service.shutdown()
 
 app = FastAPI(
     title="Copilot Store API",
     description="API for selling GitHub Copilot Education Edition accounts.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Responses are validated against their response_model, then encoded with orjson
+    default_response_class=ORJSONResponse
 )
 
 # CORS Middleware
@@ -19,14 +76,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.on_event("startup")
-async def on_startup():
-    await init_db()
+# Request metrics; added last so it also times the CORS middleware
+app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+instrument_engine(engine.sync_engine)
+for replica in read_replicas.replicas:
+    instrument_engine(replica.engine.sync_engine)
+
+def replica_metrics():
+    stats = read_replicas.stats()
+    if not stats:
+        return
+    yield "db_replica_healthy", "gauge", "Whether the read replica is in rotation", [
+        ({"replica": replica["name"]}, int(replica["healthy"])) for replica in stats
+    ]
+    yield "db_replica_lag_seconds", "gauge", "Replication lag at the last health check", [
+        ({"replica": replica["name"]}, replica["lag_seconds"]) for replica in stats if replica["lag_seconds"] is not None
+    ]
+
+registry.add_collector(lambda: gauges("db_pool", "Database connection pool", get_pool_stats()))
+registry.add_collector(replica_metrics)
+registry.add_collector(dependency_metrics)
+registry.add_collector(lambda: gauges("ai_answer_cache", "AI answer cache", ai_service.answer_cache.stats.to_dict()))
+registry.add_collector(lambda: gauges("ai_chat", "AI chat session store", {
+    "sessions": len(ai_service.chat_sessions),
+    "session_chars": ai_service.chat_sessions.total_chars,
+}))
+registry.add_collector(lambda: gauges("ai_admission", "AI chat admission control", {
+    "pending": ai_service.chat_load_shedder.pending,
+    "max_pending": ai_service.chat_load_shedder.max_pending,
+    "ip_buckets": len(ai_service.chat_ip_limiter),
+    "session_buckets": len(ai_service.chat_session_limiter),
+}))
+registry.add_collector(lambda: gauges("logging", "Log pipeline", get_logging_stats()))
+registry.add_collector(lambda: gauges("inventory_stream", "Live inventory stream", {
+    "clients": inventory_feed.clients,
+    "listening": int(inventory_feed.listening),
+}))
+registry.add_collector(lambda: gauges("inventory_reserved", "Accounts reserved by this worker", inventory_reservations.sizes()))
 
 # Include API routers
 app.include_router(payments.router, prefix="/api/v1/payments", tags=["Payments"])
 app.include_router(ai.router, prefix="/api/v1/ai", tags=["AI"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
 
-@app.get("/health")
+@app.get("/health", response_model=StatusResponse)
 def health_check():
     return {"status": "ok"}
+
+@app.get("/health/pool", response_model=Dict[str, Union[int, float]])
+def pool_health():
+    """Database connection pool occupancy and checkout wait times."""
+    return get_pool_stats()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
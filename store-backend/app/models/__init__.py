@@ -1,2 +1,6 @@
 from .order import Order
-from .inventory import CopilotAccount
\ No newline at end of file
+from .inventory import CopilotAccount, CopilotAccountHistory
+from .outbox import EmailOutbox
+from .stripe_event import StripeEvent
+from .ai_cache import AIAnswerCache
+from .rate_limit import RateLimitBucket
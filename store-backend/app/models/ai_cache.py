@@ -0,0 +1,12 @@
+from sqlmodel import SQLModel, Field, Column, Text
+from datetime import datetime
+
+class AIAnswerCache(SQLModel, table=True):
+    """AI 客服回答缓存表：按规范化后的问题哈希存储，供多个进程共享"""
+    __tablename__ = "ai_answer_cache"
+
+    key: str = Field(primary_key=True, max_length=64, description="规范化问题的 SHA-256")
+    prompt: str = Field(sa_column=Column(Text, nullable=False), description="规范化后的问题")
+    answer: str = Field(sa_column=Column(Text, nullable=False), description="缓存的回答")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
+    expires_at: datetime = Field(index=True, description="过期时间")
@@ -1,19 +1,68 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, text
 from datetime import datetime
 from typing import Optional
 
+# 支持的账号类型
+ACCOUNT_TYPES = ("education", "pro", "business")
+
+# 计入库存的状态：被工作进程预留的账号仍然可以售出
+STOCK_STATUSES = ("available", "reserved")
+
 class CopilotAccount(SQLModel, table=True):
     """GitHub Copilot账号库存表"""
     __tablename__ = "copilot_account"
+    __table_args__ = (
+        # 分配和库存统计只看 available/reserved 的行；部分索引只包含这些行，
+        # 不会随着已分配/已过期的历史数据增长
+        Index(
+            "ix_copilot_account_available_type",
+            "account_type", "id",
+            postgresql_where=text("status IN ('available', 'reserved')")
+        ),
+        # 用于回收过期的预留租约
+        Index(
+            "ix_copilot_account_reserved_until",
+            "reserved_until",
+            postgresql_where=text("status = 'reserved'")
+        ),
+        # 过期清理按 (status, expires_at, id) 分块扫描：先把到期的 assigned 标记为
+        # expired，再把过期已久的行归档到 copilot_account_history
+        Index(
+            "ix_copilot_account_status_expires_at",
+            "status", "expires_at", "id",
+            postgresql_where=text("status IN ('assigned', 'expired')")
+        ),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    email: str = Field(index=True, description="GitHub Copilot账号邮箱")
+    email: str = Field(index=True, unique=True, description="GitHub Copilot账号邮箱")
     password: str = Field(description="GitHub Copilot账号密码")
     account_type: str = Field(default="education", description="账号类型：education, pro, business")
-    status: str = Field(default="available", description="状态：available, assigned, expired")
+    status: str = Field(default="available", description="状态：available, reserved, assigned, expired")
     assigned_to_email: Optional[str] = Field(default=None, description="分配给的客户邮箱")
     assigned_at: Optional[datetime] = Field(default=None, description="分配时间")
+    reserved_by: Optional[str] = Field(default=None, description="预留该账号的工作进程")
+    reserved_until: Optional[datetime] = Field(default=None, description="预留租约到期时间")
+    order_id: Optional[int] = Field(default=None, foreign_key="order.id", index=True, description="关联订单ID")
+    expires_at: Optional[datetime] = Field(default=None, index=True, description="账号过期时间")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
+    notes: Optional[str] = Field(default=None, description="备注信息")
+
+
+class CopilotAccountHistory(SQLModel, table=True):
+    """已归档的过期账号：从 copilot_account 移出，保持库存表较小，保留查询和对账所需的数据"""
+    __tablename__ = "copilot_account_history"
+
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False}, description="原 copilot_account ID")
+    email: str = Field(description="GitHub Copilot账号邮箱")
+    password: str = Field(description="GitHub Copilot账号密码")
+    account_type: str = Field(description="账号类型：education, pro, business")
+    status: str = Field(description="归档时的状态")
+    assigned_to_email: Optional[str] = Field(default=None, index=True, description="分配给的客户邮箱")
+    assigned_at: Optional[datetime] = Field(default=None, description="分配时间")
     order_id: Optional[int] = Field(default=None, description="关联订单ID")
     expires_at: Optional[datetime] = Field(default=None, description="账号过期时间")
-    created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
+    created_at: datetime = Field(description="创建时间")
     notes: Optional[str] = Field(default=None, description="备注信息")
+    archived_at: datetime = Field(default_factory=datetime.utcnow, description="归档时间")
@@ -0,0 +1,22 @@
+from sqlmodel import SQLModel, Field, Column, JSON
+from sqlalchemy import Index
+from datetime import datetime
+from typing import Dict, Optional
+
+class Order(SQLModel, table=True):
+    """订单表：每个完成的 Stripe Checkout Session 对应一个订单，分配的账号通过 order_id 关联"""
+    __tablename__ = "order"
+    __table_args__ = (
+        # 管理后台按 (created_at, id) 倒序做 keyset 分页
+        Index("ix_order_created_at_id", "created_at", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    stripe_session_id: str = Field(unique=True, description="Stripe Checkout Session ID (cs_...)")
+    customer_email: str = Field(index=True, description="客户邮箱")
+    quantities: Dict[str, int] = Field(default_factory=dict, sa_column=Column(JSON, nullable=False), description="购买数量：{账号类型: 数量}")
+    amount_total: Optional[int] = Field(default=None, description="实付金额（最小货币单位）")
+    currency: Optional[str] = Field(default=None, description="币种")
+    status: str = Field(default="pending", description="状态：pending, fulfilled, partially_fulfilled")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
+    fulfilled_at: Optional[datetime] = Field(default=None, description="账号分配完成时间")
@@ -0,0 +1,19 @@
+from sqlmodel import SQLModel, Field, Column, JSON
+from datetime import datetime
+from typing import List, Optional
+
+class EmailOutbox(SQLModel, table=True):
+    """待发送邮件表：与账号分配在同一事务中写入，由后台任务批量投递"""
+    __tablename__ = "email_outbox"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(default="account_credentials", description="邮件类型")
+    to_email: str = Field(description="收件人邮箱")
+    account_ids: List[int] = Field(default_factory=list, sa_column=Column(JSON, nullable=False), description="邮件涉及的账号ID")
+    order_id: Optional[int] = Field(default=None, description="关联订单ID")
+    status: str = Field(default="pending", description="状态：pending, sent, failed")
+    attempts: int = Field(default=0, description="已尝试发送次数")
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow, index=True, description="下次可发送时间")
+    last_error: Optional[str] = Field(default=None, description="最近一次发送错误")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
+    sent_at: Optional[datetime] = Field(default=None, description="发送成功时间")
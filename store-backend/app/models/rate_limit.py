@@ -0,0 +1,10 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class RateLimitBucket(SQLModel, table=True):
+    """限流令牌桶：启用共享限流（AI_RATE_LIMIT_BACKEND=postgres）时供多个进程共用"""
+    __tablename__ = "rate_limit_bucket"
+
+    key: str = Field(primary_key=True, max_length=200, description="限流键，例如 ip:1.2.3.4")
+    tokens: float = Field(description="上次请求后剩余的令牌数")
+    updated_at: datetime = Field(index=True, description="上次请求时间（UTC）")
@@ -0,0 +1,17 @@
+from sqlmodel import SQLModel, Field, Column, Text
+from datetime import datetime
+from typing import Optional
+
+class StripeEvent(SQLModel, table=True):
+    """Stripe webhook 事件表：按事件ID去重，验签后落库并由后台任务异步处理"""
+    __tablename__ = "stripe_event"
+
+    id: str = Field(primary_key=True, description="Stripe 事件ID (evt_...)")
+    type: str = Field(description="事件类型")
+    payload: str = Field(sa_column=Column(Text, nullable=False), description="原始事件 JSON")
+    status: str = Field(default="pending", description="状态：pending, processed, failed")
+    attempts: int = Field(default=0, description="已尝试处理次数")
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow, index=True, description="下次可处理时间")
+    last_error: Optional[str] = Field(default=None, description="最近一次处理错误")
+    received_at: datetime = Field(default_factory=datetime.utcnow, description="接收时间")
+    processed_at: Optional[datetime] = Field(default=None, description="处理完成时间")
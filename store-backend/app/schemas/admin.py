@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+
+class OrderSummary(BaseModel):
+    id: int
+    stripe_session_id: str
+    customer_email: str
+    status: str
+    quantities: Dict[str, int]
+    amount_total: Optional[int]
+    currency: Optional[str]
+    created_at: datetime
+    fulfilled_at: Optional[datetime]
+
+
+class AccountSummary(BaseModel):
+    """Inventory account as listed to admins; the password is never included."""
+    id: int
+    email: str
+    account_type: str
+    status: str
+    assigned_to_email: Optional[str]
+    assigned_at: Optional[datetime]
+    order_id: Optional[int]
+    expires_at: Optional[datetime]
+    created_at: datetime
+
+
+class OrderPage(BaseModel):
+    items: List[OrderSummary]
+    # Pass as ?cursor= for the next page; null on the last page
+    next_cursor: Optional[str]
+
+
+class AccountPage(BaseModel):
+    items: List[AccountSummary]
+    next_cursor: Optional[str]
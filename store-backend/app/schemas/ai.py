@@ -0,0 +1,28 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+from app.core.config import settings
+
+
+class AIChatRequest(BaseModel):
+    prompt: str = Field(min_length=1, max_length=settings.AI_MAX_PROMPT_CHARS)
+    # Returned by the previous turn; omit it to start a new conversation.
+    session_id: Optional[str] = Field(default=None, max_length=64)
+
+
+class AIChatResponse(BaseModel):
+    message: str
+    session_id: str
+
+
+class AICacheStats(BaseModel):
+    requests: int
+    memory_hits: int
+    persistent_hits: int
+    coalesced: int
+    upstream_calls: int
+    upstream_errors: int
+    hit_ratio: float
+    upstream_calls_saved: int
+    memory_entries: int
+    chat_sessions: int
+    chat_session_chars: int
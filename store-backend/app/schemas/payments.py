@@ -0,0 +1,36 @@
+from typing import Dict, List, Literal
+from pydantic import BaseModel, Field
+
+
+class StatusResponse(BaseModel):
+    status: str
+
+
+class WebhookResponse(BaseModel):
+    # "duplicate" when Stripe redelivered an event that is already stored
+    status: Literal["success", "duplicate"]
+
+
+class InventoryCount(BaseModel):
+    inventory_count: int
+    by_type: Dict[str, int]
+
+
+class AddInventoryRequest(BaseModel):
+    username: str = Field(min_length=1, description="Account email / login")
+    password: str = Field(min_length=1)
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    total_rows: int
+    inserted: int
+    duplicates: int
+    error_count: int
+    # Only the first INVENTORY_IMPORT_MAX_REPORTED_ERRORS row errors are listed
+    errors: List[ImportRowError]
+    errors_truncated: bool
@@ -0,0 +1,178 @@
+import base64
+import csv
+import io
+import json
+import logging
+import orjson
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import ColumnElement
+from sqlmodel import select, tuple_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.metrics import traced
+from app.db.session import read_session_factory
+from app.models.inventory import CopilotAccount
+from app.models.order import Order
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+
+# Columns shown in listings and exports. Account passwords are never included.
+ORDER_COLUMNS = (
+    Order.id, Order.stripe_session_id, Order.customer_email, Order.status,
+    Order.quantities, Order.amount_total, Order.currency, Order.created_at, Order.fulfilled_at,
+)
+ACCOUNT_COLUMNS = (
+    CopilotAccount.id, CopilotAccount.email, CopilotAccount.account_type, CopilotAccount.status,
+    CopilotAccount.assigned_to_email, CopilotAccount.assigned_at, CopilotAccount.order_id,
+    CopilotAccount.expires_at, CopilotAccount.created_at,
+)
+
+
+def encode_cursor(values: Sequence[object]) -> str:
+    """Opaque page cursor: the sort key of the last row on the page."""
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[object]:
+    """
+    Reads back a cursor made by ``encode_cursor``. ``types`` are the expected
+    types of its values; datetimes travel as ISO strings. Anything else raises
+    ValueError, which the API turns into a 400.
+    """
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise ValueError
+        values = []
+        for value, expected in zip(raw, types):
+            if expected is datetime:
+                value = datetime.fromisoformat(value)
+            elif expected is int:
+                # bool is an int subclass; ids are bigint
+                if type(value) is not int or not -2 ** 63 <= value < 2 ** 63:
+                    raise ValueError
+            elif not isinstance(value, expected):
+                raise ValueError
+            values.append(value)
+        return values
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def order_filters(
+    status: Optional[str] = None,
+    customer_email: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+) -> List[ColumnElement]:
+    conditions = []
+    if status:
+        conditions.append(Order.status == status)
+    if customer_email:
+        conditions.append(Order.customer_email == customer_email)
+    if created_from:
+        conditions.append(Order.created_at >= created_from)
+    if created_to:
+        conditions.append(Order.created_at < created_to)
+    return conditions
+
+
+def account_filters(
+    status: Optional[str] = None,
+    account_type: Optional[str] = None,
+    order_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+) -> List[ColumnElement]:
+    conditions = []
+    if status:
+        conditions.append(CopilotAccount.status == status)
+    if account_type:
+        conditions.append(CopilotAccount.account_type == account_type)
+    if order_id is not None:
+        conditions.append(CopilotAccount.order_id == order_id)
+    if created_from:
+        conditions.append(CopilotAccount.created_at >= created_from)
+    if created_to:
+        conditions.append(CopilotAccount.created_at < created_to)
+    return conditions
+
+
+@traced
+async def list_orders(
+    db: AsyncSession,
+    conditions: List[ColumnElement],
+    limit: int,
+    cursor: Optional[str] = None
+) -> Dict[str, object]:
+    """
+    Newest orders first, one page at a time. Pages continue from the
+    (created_at, id) of the previous page's last row instead of using OFFSET,
+    so every page costs the same index range scan, however deep it is.
+    """
+    statement = select(*ORDER_COLUMNS).where(*conditions)
+    if cursor:
+        created_at, order_id = decode_cursor(cursor, (datetime, int))
+        statement = statement.where(tuple_(Order.created_at, Order.id) < tuple_(created_at, order_id))
+    statement = statement.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit)
+    rows = (await db.exec(statement)).all()
+    next_cursor = encode_cursor((rows[-1].created_at, rows[-1].id)) if len(rows) == limit else None
+    return {"items": [dict(row._mapping) for row in rows], "next_cursor": next_cursor}
+
+
+@traced
+async def list_accounts(
+    db: AsyncSession,
+    conditions: List[ColumnElement],
+    limit: int,
+    cursor: Optional[str] = None
+) -> Dict[str, object]:
+    """Newest accounts first, keyset-paginated on id (ids grow with created_at)."""
+    statement = select(*ACCOUNT_COLUMNS).where(*conditions)
+    if cursor:
+        (account_id,) = decode_cursor(cursor, (int,))
+        statement = statement.where(CopilotAccount.id < account_id)
+    statement = statement.order_by(CopilotAccount.id.desc()).limit(limit)
+    rows = (await db.exec(statement)).all()
+    next_cursor = encode_cursor((rows[-1].id,)) if len(rows) == limit else None
+    return {"items": [dict(row._mapping) for row in rows], "next_cursor": next_cursor}
+
+
+def _csv_value(value: object) -> object:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS).decode()
+    return value
+
+
+async def export_csv(columns: Tuple, conditions: List[ColumnElement], order_by) -> AsyncIterator[str]:
+    """
+    Streams matching rows as CSV. Rows are read through a server-side cursor
+    (``AsyncSession.stream`` with ``yield_per``) and written out one batch at a
+    time, so memory use does not grow with the size of the export. The
+    generator opens its own session (on a read replica when one is healthy),
+    because it keeps running after the request handler has returned.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in columns])
+    yield buffer.getvalue()
+
+    exported = 0
+    async with read_session_factory()() as db:
+        result = await db.stream(
+            select(*columns).where(*conditions).order_by(order_by)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for rows in result.partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+            exported += len(rows)
+            yield buffer.getvalue()
+    logger.info("CSV export finished: %s rows", exported)
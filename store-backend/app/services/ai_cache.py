@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import select
+from app.core.metrics import traced
+from app.db.session import async_session_factory
+from app.models.ai_cache import AIAnswerCache
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = " \t?？!！.。,，;；~～"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Folds case, width and whitespace so trivially different FAQ prompts share a cache key."""
+    text = unicodedata.normalize("NFKC", prompt).lower()
+    return _WHITESPACE.sub(" ", text).strip(_TRAILING_PUNCTUATION)
+
+
+def prompt_key(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class AnswerCacheStats:
+    """Counters behind the cache metrics; upstream_calls_saved is what the cache paid for."""
+
+    def __init__(self):
+        self.requests = 0
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+
+    def to_dict(self) -> Dict[str, float]:
+        hits = self.memory_hits + self.persistent_hits
+        return {
+            "requests": self.requests,
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+            "hit_ratio": hits / self.requests if self.requests else 0.0,
+            "upstream_calls_saved": max(self.requests - self.upstream_calls, 0),
+        }
+
+
+class LRUTTLCache:
+    """Bounded in-memory map with least-recently-used eviction and per-entry expiry."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers share its result.
+
+    The call runs in its own task, so a caller that disconnects does not cancel
+    the upstream request for everyone else waiting on it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
+
+
+class AnswerCache:
+    """
+    Two-tier answer cache for FAQ-style chat prompts.
+
+    Lookups hit the per-process LRU first, then (optionally) the shared
+    ai_answer_cache table. Misses for the same normalized prompt are coalesced
+    so only one upstream call is made while it is in flight.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, persistent: bool, persistent_ttl: float):
+        self.memory = LRUTTLCache(max_entries, ttl)
+        self.persistent = persistent
+        self.persistent_ttl = persistent_ttl
+        self.stats = AnswerCacheStats()
+        self._flights = SingleFlight()
+
+    @traced
+    async def _load_persistent(self, key: str) -> Optional[str]:
+        async with async_session_factory() as db:
+            result = await db.exec(
+                select(AIAnswerCache.answer).where(
+                    AIAnswerCache.key == key,
+                    AIAnswerCache.expires_at > datetime.utcnow()
+                )
+            )
+            return result.first()
+
+    @traced
+    async def _store_persistent(self, key: str, prompt: str, answer: str):
+        now = datetime.utcnow()
+        values = {
+            "key": key,
+            "prompt": prompt,
+            "answer": answer,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.persistent_ttl),
+        }
+        statement = pg_insert(AIAnswerCache).values(**values).on_conflict_do_update(
+            index_elements=["key"],
+            set_={"answer": answer, "created_at": now, "expires_at": values["expires_at"]}
+        )
+        async with async_session_factory() as db:
+            await db.exec(statement)
+            await db.commit()
+
+    def lookup(self, prompt: str) -> Optional[str]:
+        """
+        Memory-only lookup, for callers that cannot wait on the database.
+        Counted in the stats like ``get_or_generate``; on a miss the caller
+        makes the upstream call itself and must count it in ``stats`` too.
+        """
+        self.stats.requests += 1
+        answer = self.memory.get(prompt_key(normalize_prompt(prompt)))
+        if answer is not None:
+            self.stats.memory_hits += 1
+        return answer
+
+    async def store(self, prompt: str, answer: str):
+        normalized = normalize_prompt(prompt)
+        key = prompt_key(normalized)
+        self.memory.set(key, answer)
+        if self.persistent:
+            try:
+                await self._store_persistent(key, normalized, answer)
+            except Exception as e:
+                logger.warning("Failed to persist cached AI answer: %s", e)
+
+    async def get_or_generate(self, prompt: str, generate: Callable[[str], Awaitable[str]]) -> str:
+        self.stats.requests += 1
+        normalized = normalize_prompt(prompt)
+        key = prompt_key(normalized)
+
+        answer = self.memory.get(key)
+        if answer is not None:
+            self.stats.memory_hits += 1
+            return answer
+
+        if self._flights.in_flight(key):
+            self.stats.coalesced += 1
+
+        async def load():
+            if self.persistent:
+                try:
+                    cached = await self._load_persistent(key)
+                except Exception as e:
+                    logger.warning("Failed to read persistent AI answer cache: %s", e)
+                    cached = None
+                if cached is not None:
+                    self.stats.persistent_hits += 1
+                    self.memory.set(key, cached)
+                    return cached
+
+            self.stats.upstream_calls += 1
+            try:
+                fresh = await generate(prompt)
+            except Exception:
+                self.stats.upstream_errors += 1
+                raise
+            await self.store(prompt, fresh)
+            return fresh
+
+        return await self._flights.do(key, load)
@@ -0,0 +1,156 @@
+import json
+import logging
+from typing import AsyncIterator, Optional, Tuple, Union
+from app.core.config import settings
+from app.core.metrics import external_call
+from app.core.resilience import gemini_dependency
+from .ai_cache import AnswerCache
+from .chat_sessions import ChatSessionStore
+from .rate_limit import LoadShedder, make_limiter
+
+logger = logging.getLogger(__name__)
+
+# Built on first use: importing google.generativeai is a large part of cold start.
+_model = None
+
+answer_cache = AnswerCache(
+    max_entries=settings.AI_CACHE_MAX_ENTRIES,
+    ttl=settings.AI_CACHE_TTL_SECONDS,
+    persistent=settings.AI_CACHE_PERSISTENT,
+    persistent_ttl=settings.AI_CACHE_PERSISTENT_TTL_SECONDS
+)
+
+chat_sessions = ChatSessionStore(
+    max_sessions=settings.AI_SESSION_MAX_SESSIONS,
+    max_turns=settings.AI_SESSION_MAX_TURNS,
+    memory_cap_chars=settings.AI_SESSION_MEMORY_CAP_CHARS,
+    token_budget=settings.AI_SESSION_TOKEN_BUDGET,
+    summary_max_chars=settings.AI_SESSION_SUMMARY_MAX_CHARS,
+    ttl=settings.AI_SESSION_TTL_SECONDS
+)
+
+chat_ip_limiter = make_limiter(
+    "ai_chat_ip",
+    backend=settings.AI_RATE_LIMIT_BACKEND,
+    per_minute=settings.AI_RATE_LIMIT_IP_PER_MINUTE,
+    burst=settings.AI_RATE_LIMIT_BURST,
+    max_keys=settings.AI_RATE_LIMIT_MAX_KEYS
+)
+chat_session_limiter = make_limiter(
+    "ai_chat_session",
+    backend=settings.AI_RATE_LIMIT_BACKEND,
+    per_minute=settings.AI_RATE_LIMIT_SESSION_PER_MINUTE,
+    burst=settings.AI_RATE_LIMIT_BURST,
+    max_keys=settings.AI_RATE_LIMIT_MAX_KEYS
+)
+chat_load_shedder = LoadShedder("ai_chat", max_pending=settings.AI_MAX_PENDING_REQUESTS)
+
+# Either a single prompt or a list of Gemini content dicts (multi-turn history).
+Contents = Union[str, list]
+
+def get_model():
+    """Returns the Gemini model used for chat, configuring the SDK on first use."""
+    global _model
+    if _model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        _model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    return _model
+
+def set_model(model):
+    """Replaces the chat model, e.g. with a local fake for benchmarks."""
+    global _model
+    _model = model
+
+async def _generate(contents: Contents) -> str:
+    response = await get_model().generate_content_async(contents)
+    return response.text
+
+async def generate(contents: Contents) -> str:
+    """
+    Generates a complete answer without blocking the event loop. Raises
+    DependencyUnavailable when Gemini's circuit is open or every slot is busy.
+    """
+    return await gemini_dependency.call("generate", _generate, contents)
+
+async def answer(prompt: str) -> str:
+    """
+    Answers a prompt from the answer cache, calling Gemini only on a miss.
+    Identical prompts that miss at the same time share one upstream call.
+    """
+    return await answer_cache.get_or_generate(prompt, generate)
+
+async def chat(prompt: str, session_id: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Answers one turn of a server-side chat session and returns (answer, session_id).
+
+    The first turn of a session is served through the answer cache; follow-up
+    turns send the token-budgeted history along with the prompt.
+    """
+    session_id, session = chat_sessions.get_or_create(session_id)
+    if session.is_empty():
+        message = await answer(prompt)
+    else:
+        message = await generate(chat_sessions.build_contents(session, prompt))
+    chat_sessions.append(session_id, session, prompt, message)
+    return message, session_id
+
+async def stream(contents: Contents) -> AsyncIterator[str]:
+    """
+    Yields answer text chunks as the model produces them. The stream holds one
+    Gemini slot until it ends, and each chunk must arrive within the deadline.
+    """
+    async with gemini_dependency.guard("stream"):
+        with external_call("gemini", "stream_first_chunk"):
+            async with gemini_dependency.deadline():
+                response = await get_model().generate_content_async(contents, stream=True)
+        chunks = response.__aiter__()
+        while True:
+            try:
+                async with gemini_dependency.deadline():
+                    chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                break
+            text = chunk.text
+            if text:
+                yield text
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Formats one Server-Sent Events message."""
+    message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return f"event: {event}\n{message}" if event else message
+
+async def stream_sse(prompt: str, session_id: str) -> AsyncIterator[str]:
+    """
+    Streams one chat turn as SSE: ``data`` messages carry text deltas, followed by
+    a final ``done`` event with the session id, or an ``error`` event if
+    generation fails midway.
+    """
+    session_id, session = chat_sessions.get_or_create(session_id)
+    first_turn = session.is_empty()
+    cached = answer_cache.lookup(prompt) if first_turn else None
+    if cached is not None:
+        chat_sessions.append(session_id, session, prompt, cached)
+        yield sse_event({"delta": cached})
+        yield sse_event({"session_id": session_id}, event="done")
+        return
+
+    contents = prompt if first_turn else chat_sessions.build_contents(session, prompt)
+    if first_turn:
+        # 与 /chat 一致：首轮未命中缓存时计入一次上游调用
+        answer_cache.stats.upstream_calls += 1
+    try:
+        parts = []
+        async for text in stream(contents):
+            parts.append(text)
+            yield sse_event({"delta": text})
+        message = "".join(parts)
+        chat_sessions.append(session_id, session, prompt, message)
+        yield sse_event({"session_id": session_id}, event="done")
+        if first_turn:
+            await answer_cache.store(prompt, message)
+    except Exception as e:
+        if first_turn:
+            answer_cache.stats.upstream_errors += 1
+        logger.error("Gemini streaming failed: %r", e)
+        yield sse_event({"detail": str(e) or e.__class__.__name__}, event="error")
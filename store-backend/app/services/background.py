@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import random
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay(attempts: int, base: float, maximum: float) -> float:
+    """Exponential backoff with jitter for the given (1-based) attempt number."""
+    ceiling = min(maximum, base * (2 ** max(attempts - 1, 0)))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class PollingWorker:
+    """
+    Base class for database-polling background workers.
+
+    Runs ``workers`` copies of a loop that calls ``run_once()``. A round that
+    returns ``batch_size`` or more items is followed immediately by the next
+    one; otherwise the loop sleeps until ``wake()`` is called or
+    ``poll_interval`` elapses.
+    """
+
+    name = "worker"
+
+    def __init__(self, batch_size: int, poll_interval: float, workers: int = 1):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.workers = workers
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def run_once(self) -> int:
+        raise NotImplementedError
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._run(), name=f"{self.name}-{i}")
+                for i in range(self.workers)
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self):
+        """Signals that new work was committed so it is picked up without waiting for the next poll."""
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("%s round failed: %s", self.name, e)
+                processed = 0
+
+            if processed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
@@ -0,0 +1,170 @@
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (role, text) where role is "user" or "model", matching Gemini's content roles.
+Turn = Tuple[str, str]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: ~4 ASCII characters per token, one token per CJK/other character."""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def summarize_turn(turn: Turn, max_chars: int = 160) -> str:
+    """Extractive one-line digest of a turn, used to fold old history into the summary."""
+    role, text = turn
+    text = " ".join(text.split())
+    if len(text) > max_chars:
+        text = text[:max_chars - 1] + "…"
+    return f"{'User' if role == 'user' else 'Assistant'}: {text}"
+
+
+class ChatSession:
+    """Recent turns in a fixed-size ring buffer plus a rolling summary of older ones."""
+
+    __slots__ = ("turns", "summary", "last_used")
+
+    def __init__(self, max_turns: int):
+        self.turns: Deque[Turn] = deque(maxlen=max_turns)
+        self.summary = ""
+        self.last_used = time.monotonic()
+
+    @property
+    def size(self) -> int:
+        return len(self.summary) + sum(len(text) for _, text in self.turns)
+
+    def is_empty(self) -> bool:
+        return not self.turns and not self.summary
+
+
+class ChatSessionStore:
+    """
+    In-process multi-turn chat history keyed by session id.
+
+    Sessions are kept in LRU order and evicted when there are more than
+    ``max_sessions``, when the text held by all sessions exceeds
+    ``memory_cap_chars``, or after ``ttl`` seconds of inactivity. Each session
+    keeps at most ``max_turns`` turns, trimmed in user/model pairs; turns
+    pushed out of the ring buffer, or dropped to fit the token budget, are
+    folded into a summary of at most ``summary_max_chars`` characters.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int,
+        max_turns: int,
+        memory_cap_chars: int,
+        token_budget: int,
+        summary_max_chars: int,
+        ttl: float
+    ):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.memory_cap_chars = memory_cap_chars
+        self.token_budget = token_budget
+        self.summary_max_chars = summary_max_chars
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._total_chars = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @property
+    def total_chars(self) -> int:
+        return self._total_chars
+
+    def get_or_create(self, session_id: Optional[str]) -> Tuple[str, ChatSession]:
+        """Returns the live session for ``session_id``, or a fresh one under a new id."""
+        session = self._sessions.get(session_id) if session_id else None
+        if session is not None and time.monotonic() - session.last_used > self.ttl:
+            self._drop(session_id)
+            session = None
+
+        if session is None:
+            session_id = uuid.uuid4().hex
+            session = ChatSession(self.max_turns)
+            self._sessions[session_id] = session
+            self._evict()
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+        return session_id, session
+
+    def _fold(self, session: ChatSession, turns: List[Turn]):
+        digest = "\n".join(summarize_turn(turn) for turn in turns)
+        summary = f"{session.summary}\n{digest}" if session.summary else digest
+        if len(summary) > self.summary_max_chars:
+            # Keep the most recent part of the summary.
+            summary = summary[-self.summary_max_chars:]
+        session.summary = summary
+
+    def append(self, session_id: str, session: ChatSession, user_text: str, model_text: str):
+        """Records one user/model exchange, folding turns that fall out of the ring buffer."""
+        if self._sessions.get(session_id) is not session:
+            # Evicted while the answer was being generated; bring it back as most recent.
+            self._sessions[session_id] = session
+            self._total_chars += session.size
+        self._sessions.move_to_end(session_id)
+        before = session.size
+        overflow = len(session.turns) + 2 - self.max_turns
+        if overflow > 0:
+            # Drop whole user/model pairs so history still starts with a user turn
+            overflow += overflow % 2
+            self._fold(session, [session.turns.popleft() for _ in range(min(overflow, len(session.turns)))])
+        session.turns.append(("user", user_text))
+        session.turns.append(("model", model_text))
+        self._total_chars += session.size - before
+        self._evict(keep=session_id)
+
+    def build_contents(self, session: ChatSession, prompt: str) -> List[Dict[str, object]]:
+        """
+        Builds the Gemini ``contents`` for the next request: the summary (if any),
+        as many recent turns as fit in the token budget, and the new prompt.
+        Turns that do not fit are folded into the summary for good.
+        """
+        before = session.size
+        budget = self.token_budget - estimate_tokens(prompt) - estimate_tokens(session.summary)
+        kept = 0
+        for _, text in reversed(session.turns):
+            cost = estimate_tokens(text)
+            if cost > budget:
+                break
+            budget -= cost
+            kept += 1
+        # Keep whole user/model pairs so roles keep alternating.
+        kept -= kept % 2
+        dropped = len(session.turns) - kept
+        if dropped:
+            self._fold(session, [session.turns.popleft() for _ in range(dropped)])
+            self._total_chars += session.size - before
+
+        contents: List[Dict[str, object]] = []
+        if session.summary:
+            contents.append({"role": "user", "parts": [f"Summary of our earlier conversation:\n{session.summary}"]})
+            contents.append({"role": "model", "parts": ["Understood."]})
+        contents.extend({"role": role, "parts": [text]} for role, text in session.turns)
+        contents.append({"role": "user", "parts": [prompt]})
+        return contents
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._total_chars -= session.size
+
+    def _evict(self, keep: Optional[str] = None):
+        now = time.monotonic()
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            over_capacity = (
+                len(self._sessions) > self.max_sessions or self._total_chars > self.memory_cap_chars
+            )
+            if oldest_id == keep or not (over_capacity or now - oldest.last_used > self.ttl):
+                break
+            self._drop(oldest_id)
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.core.metrics import traced
+from app.core.resilience import DependencyUnavailable, gmail_dependency
+from app.db.session import async_session_factory
+from app.models.inventory import CopilotAccount
+from app.models.outbox import EmailOutbox
+from . import email_service
+from .background import PollingWorker, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+
+async def deliver(message: EmailOutbox, accounts: Dict[int, CopilotAccount]):
+    """Sends one outbox message; raises if it could not be delivered."""
+    if message.kind not in ("account_credentials", "account_expired"):
+        raise ValueError(f"Unknown outbox message kind: {message.kind}")
+
+    referenced = []
+    for account_id in message.account_ids:
+        account = accounts.get(account_id)
+        if account is None:
+            raise ValueError(f"Account {account_id} referenced by outbox message {message.id} no longer exists")
+        referenced.append(account)
+
+    if message.kind == "account_expired":
+        await email_service.send_expiry_notice(
+            to_email=message.to_email,
+            accounts=[(account.email, account.account_type, account.expires_at) for account in referenced]
+        )
+        return
+
+    credentials = [(account.email, account.password, account.account_type) for account in referenced]
+    # 一个订单的所有账号合并为一封邮件
+    await email_service.send_order_credentials(
+        to_email=message.to_email,
+        accounts=credentials,
+        order_id=message.order_id or 0
+    )
+
+
+class EmailOutboxDispatcher(PollingWorker):
+    """
+    Background task that drains the email_outbox table.
+
+    Each round claims up to ``batch_size`` due messages with one
+    UPDATE ... RETURNING (FOR UPDATE SKIP LOCKED, so several workers can run
+    it side by side), pushes their ``next_attempt_at`` out by a lease so a
+    crashed worker's messages are picked up again later, and commits. It then
+    sends them outside any transaction with at most ``concurrency`` deliveries
+    in flight, and records the outcomes in a second short transaction.
+    Failures are rescheduled with exponential backoff until ``max_attempts``
+    is reached, after which the message is parked as ``failed`` for manual
+    follow-up.
+    """
+
+    name = "email-outbox-dispatcher"
+
+    def __init__(
+        self,
+        batch_size: int,
+        concurrency: int,
+        max_attempts: int,
+        lease_seconds: float,
+        poll_interval: float
+    ):
+        super().__init__(batch_size=batch_size, poll_interval=poll_interval)
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+
+    async def _claim_batch(self, db: AsyncSession) -> List[EmailOutbox]:
+        now = datetime.utcnow()
+        due = (
+            select(EmailOutbox.id)
+            .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(due.scalar_subquery()))
+            .values(
+                attempts=EmailOutbox.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=self.lease_seconds)
+            )
+            .returning(EmailOutbox)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.exec(statement)
+        messages = list(result.scalars().all())
+        await db.commit()
+        return messages
+
+    def _result_values(self, message: EmailOutbox, exc: Optional[Exception], now: datetime) -> Dict[str, object]:
+        if exc is None:
+            return {"status": "sent", "sent_at": now, "last_error": None}
+        error = str(exc) or exc.__class__.__name__
+        if isinstance(exc, DependencyUnavailable):
+            # Never reached Gmail: give the attempt back and try again once
+            # the circuit lets calls through
+            retry_at = now + timedelta(seconds=max(exc.retry_after, self.poll_interval))
+            return {"attempts": EmailOutbox.attempts - 1, "next_attempt_at": retry_at, "last_error": error}
+        if message.attempts >= self.max_attempts:
+            logger.error(
+                "Outbox message %s to %s failed after %s attempts, needs manual handling: %s",
+                message.id, message.to_email, message.attempts, error
+            )
+            return {"status": "failed", "last_error": error}
+        delay = backoff_delay(
+            message.attempts,
+            settings.EMAIL_OUTBOX_BACKOFF_BASE_SECONDS,
+            settings.EMAIL_OUTBOX_BACKOFF_MAX_SECONDS
+        )
+        retry_at = now + timedelta(seconds=delay)
+        logger.warning(
+            "Outbox message %s attempt %s failed, retrying at %s: %s",
+            message.id, message.attempts, retry_at, error
+        )
+        return {"next_attempt_at": retry_at, "last_error": error}
+
+    @traced
+    async def run_once(self) -> int:
+        """Claims and sends one batch; returns how many messages were attempted."""
+        # While Gmail's circuit is open, leave messages pending instead of
+        # spending their attempts on sends that would be rejected anyway.
+        if not gmail_dependency.available():
+            return 0
+        # Lease the batch and load its accounts in one short transaction; no
+        # connection or row lock is held while Gmail is being called.
+        async with async_session_factory() as db:
+            messages = await self._claim_batch(db)
+            if not messages:
+                return 0
+            account_ids = {account_id for message in messages for account_id in message.account_ids}
+            result = await db.exec(select(CopilotAccount).where(CopilotAccount.id.in_(account_ids)))
+            accounts = {account.id: account for account in result.all()}
+            await db.commit()
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def attempt(message: EmailOutbox) -> Optional[Exception]:
+            async with semaphore:
+                try:
+                    await deliver(message, accounts)
+                    return None
+                except Exception as e:
+                    return e
+
+        errors = await asyncio.gather(*(attempt(message) for message in messages))
+
+        # Record the outcomes in a second short transaction
+        now = datetime.utcnow()
+        async with async_session_factory() as db:
+            for message, exc in zip(messages, errors):
+                await db.exec(
+                    update(EmailOutbox)
+                    .where(EmailOutbox.id == message.id, EmailOutbox.status == "pending")
+                    .values(**self._result_values(message, exc, now))
+                )
+            await db.commit()
+
+        sent = sum(1 for error in errors if error is None)
+        logger.info("Email outbox round: %s/%s sent", sent, len(messages))
+        return len(messages)
+
+
+email_outbox_dispatcher = EmailOutboxDispatcher(
+    batch_size=settings.EMAIL_OUTBOX_BATCH_SIZE,
+    concurrency=settings.EMAIL_SEND_CONCURRENCY,
+    max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+    lease_seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS,
+    poll_interval=settings.EMAIL_OUTBOX_POLL_INTERVAL_SECONDS
+)
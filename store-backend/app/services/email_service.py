@@ -1,10 +1,19 @@
+import asyncio
 import base64
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from email.mime.text import MIMEText
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google.auth.exceptions import RefreshError
+from typing import TYPE_CHECKING, List, Optional, Tuple
 from app.core.config import settings
+from app.core.resilience import DependencyUnavailable, gmail_dependency
+
+# The Google client libraries take a noticeable share of cold start, so they are
+# imported on first use rather than when the app is imported.
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+    from google_auth_httplib2 import AuthorizedHttp
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -12,29 +21,128 @@ logger = logging.getLogger(__name__)
 SCOPES = ['https://www.googleapis.com/auth/gmail.send']
 SENDER_EMAIL = settings.EMAIL_SENDER
 
+# The Gmail client and its credentials are built once per process and shared by
+# every send. googleapiclient's httplib2 transport is not thread-safe, so each
+# executor thread keeps its own AuthorizedHttp (and with it, its own keep-alive
+# connection), while token refreshes are serialized on the shared credentials.
+_service = None
+_credentials = None
+# Re-entrant: get_gmail_service builds the credentials while holding it.
+_init_lock = threading.RLock()
+_refresh_lock = threading.Lock()
+_thread_local = threading.local()
+_executor = ThreadPoolExecutor(
+    max_workers=settings.EMAIL_SEND_CONCURRENCY,
+    thread_name_prefix="gmail-send"
+)
+
+def get_gmail_credentials() -> "Credentials":
+    """Returns the process-wide OAuth 2.0 credentials, creating them on first use."""
+    global _credentials
+    if _credentials is None:
+        with _init_lock:
+            if _credentials is None:
+                from google.oauth2.credentials import Credentials
+                _credentials = Credentials.from_authorized_user_info(
+                    info={
+                        "client_id": settings.GMAIL_CLIENT_ID,
+                        "client_secret": settings.GMAIL_CLIENT_SECRET,
+                        "refresh_token": settings.GMAIL_REFRESH_TOKEN,
+                    },
+                    scopes=SCOPES
+                )
+    return _credentials
+
 def get_gmail_service():
-    """Initializes and returns the Gmail API service using OAuth 2.0 credentials."""
+    """Initializes the Gmail API service once and returns the cached instance."""
+    global _service
+    if _service is not None:
+        return _service
     try:
-        creds = Credentials.from_authorized_user_info(
-            info={
-                "client_id": settings.GMAIL_CLIENT_ID,
-                "client_secret": settings.GMAIL_CLIENT_SECRET,
-                "refresh_token": settings.GMAIL_REFRESH_TOKEN,
-            },
-            scopes=SCOPES
-        )
-        service = build('gmail', 'v1', credentials=creds)
-        logger.info("Gmail service initialized successfully")
-        return service
-    except RefreshError as e:
-        logger.error(f"Gmail credentials refresh failed: {e}")
-        return None
+        with _init_lock:
+            if _service is None:
+                from googleapiclient.discovery import build
+                client_options = {"api_endpoint": settings.GMAIL_API_ENDPOINT} if settings.GMAIL_API_ENDPOINT else None
+                _service = build(
+                    'gmail', 'v1',
+                    credentials=get_gmail_credentials(),
+                    cache_discovery=False,
+                    static_discovery=True,
+                    client_options=client_options
+                )
+                logger.info("Gmail service initialized successfully")
+        return _service
     except Exception as e:
-        logger.error(f"Failed to create Gmail service: {e}")
+        logger.error("Failed to create Gmail service: %s", e)
         return None
 
+def _ensure_fresh_token(creds: "Credentials"):
+    """Refreshes the access token at most once when it is missing or expired."""
+    if creds.valid:
+        return
+    with _refresh_lock:
+        if not creds.valid:
+            from google.auth.transport.requests import Request
+            creds.refresh(Request())
+            logger.info("Gmail access token refreshed")
+
+def _get_thread_http() -> "AuthorizedHttp":
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        http = AuthorizedHttp(
+            get_gmail_credentials(),
+            http=httplib2.Http(timeout=settings.EMAIL_SEND_TIMEOUT_SECONDS)
+        )
+        _thread_local.http = http
+    return http
+
+def _send_message_blocking(service, message: dict) -> dict:
+    """Runs the blocking Gmail send; must be called from an executor thread."""
+    _ensure_fresh_token(get_gmail_credentials())
+    return service.users().messages().send(userId='me', body=message).execute(http=_get_thread_http())
+
+async def send_message(service, message: dict) -> dict:
+    """
+    Sends a prepared Gmail message on the bounded executor, off the event loop.
+    Raises DependencyUnavailable while Gmail's circuit is open.
+    """
+    loop = asyncio.get_running_loop()
+    async with gmail_dependency.guard("send"):
+        return await loop.run_in_executor(_executor, _send_message_blocking, service, message)
+
+def shutdown():
+    """Stops the send executor, waiting for in-flight sends to finish."""
+    _executor.shutdown(wait=True)
+
 async def send_account_credentials(to_email: str, account_email: str, account_password: str, order_id: int):
     """发送GitHub Copilot账号密码"""
+    return await send_order_credentials(to_email, [(account_email, account_password, "education")], order_id)
+
+def _html_message(to_email: str, subject: str, body: str) -> dict:
+    """Builds the Gmail API message body for an HTML email."""
+    message = MIMEText(body, 'html')
+    message['to'] = to_email
+    message['from'] = SENDER_EMAIL
+    message['subject'] = subject
+    return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
+
+def _account_details(accounts: List[Tuple[str, str, str]]) -> str:
+    blocks = []
+    for index, (account_email, account_password, account_type) in enumerate(accounts, start=1):
+        title = f"Account {index} ({account_type.title()})" if len(accounts) > 1 else f"{account_type.title()} Edition"
+        blocks.append(f"""
+            <p style="margin-bottom: 4px;"><strong>{title}</strong></p>
+            <p><strong>Account Email:</strong> <code style="background: #e1e4e8; padding: 2px 4px; border-radius: 3px;">{account_email}</code></p>
+            <p><strong>Password:</strong> <code style="background: #e1e4e8; padding: 2px 4px; border-radius: 3px;">{account_password}</code></p>""")
+    return "".join(blocks)
+
+async def send_order_credentials(to_email: str, accounts: List[Tuple[str, str, str]], order_id: int):
+    """在一封邮件中发送订单的全部GitHub Copilot账号密码
+
+    accounts 为 (账号邮箱, 密码, 账号类型) 列表。
+    """
     service = get_gmail_service()
     if not service:
         logger.error("Gmail service not available. Skipping email.")
@@ -42,23 +150,31 @@ async def send_account_credentials(to_email: str, account_email: str, account_pa
 
     # Validate email format
     if not to_email or "@" not in to_email:
-        logger.error(f"Invalid email address: {to_email}")
+        logger.error("Invalid email address: %s", to_email)
         raise ValueError("Invalid email address")
 
-    subject = "🎉 Your GitHub Copilot Account Details"
+    from google.auth.exceptions import RefreshError
+
+    if len(accounts) > 1:
+        subject = f"🎉 Your {len(accounts)} GitHub Copilot Accounts"
+        heading = f"🚀 Your {len(accounts)} GitHub Copilot Accounts are Ready!"
+        processed = f"Congratulations! Your order of {len(accounts)} GitHub Copilot accounts has been processed successfully."
+    else:
+        subject = "🎉 Your GitHub Copilot Account Details"
+        heading = "🚀 Your GitHub Copilot Account is Ready!"
+        processed = f"Congratulations! Your GitHub Copilot {accounts[0][2].title()} Edition purchase has been processed successfully."
+
     body = f"""
     <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-        <h2 style="color: #24292e;">🚀 Your GitHub Copilot Account is Ready!</h2>
+        <h2 style="color: #24292e;">{heading}</h2>
         
         <p>Hello,</p>
         
-        <p>Congratulations! Your GitHub Copilot Education Edition purchase has been processed successfully.</p>
+        <p>{processed}</p>
         
         <div style="background-color: #f6f8fa; padding: 20px; border-radius: 8px; margin: 20px 0;">
             <h3 style="color: #0366d6; margin-top: 0;">📋 Account Details</h3>
-            <p><strong>Order ID:</strong> #{order_id}</p>
-            <p><strong>Account Email:</strong> <code style="background: #e1e4e8; padding: 2px 4px; border-radius: 3px;">{account_email}</code></p>
-            <p><strong>Password:</strong> <code style="background: #e1e4e8; padding: 2px 4px; border-radius: 3px;">{account_password}</code></p>
+            <p><strong>Order ID:</strong> #{order_id}</p>{_account_details(accounts)}
         </div>
         
         <div style="background-color: #fff3cd; padding: 15px; border-left: 4px solid #ffc107; margin: 20px 0;">
@@ -94,21 +210,80 @@ async def send_account_credentials(to_email: str, account_email: str, account_pa
     """
     
     try:
-        message = MIMEText(body, 'html')
-        message['to'] = to_email
-        message['from'] = SENDER_EMAIL
-        message['subject'] = subject
-        
-        encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-        
-        create_message = {
-            'raw': encoded_message
-        }
-
-        send_message = (service.users().messages().send(userId='me', body=create_message).execute())
-        logger.info(f"Account credentials sent to {to_email}, Message Id: {send_message['id']}")
-        return send_message['id']
+        sent = await send_message(service, _html_message(to_email, subject, body))
+        logger.info("Credentials for %s account(s) sent to %s, Message Id: %s", len(accounts), to_email, sent['id'])
+        return sent['id']
         
+    except DependencyUnavailable:
+        # Gmail was never called; the outbox gives the attempt back
+        raise
+    except RefreshError as e:
+        logger.error("Gmail credentials refresh failed: %s", e)
+        raise Exception(f"Failed to send account credentials: {str(e)}")
     except Exception as e:
-        logger.error(f"Failed to send account credentials to {to_email}: {e}")
+        logger.error("Failed to send account credentials to %s: %s", to_email, e)
         raise Exception(f"Failed to send account credentials: {str(e)}")
+
+async def send_expiry_notice(to_email: str, accounts: List[Tuple[str, str, Optional[datetime]]]):
+    """通知客户其GitHub Copilot账号已到期
+
+    accounts 为 (账号邮箱, 账号类型, 到期时间) 列表，同一客户的账号合并为一封邮件。
+    """
+    service = get_gmail_service()
+    if not service:
+        logger.error("Gmail service not available. Skipping email.")
+        raise Exception("Email service unavailable")
+
+    if not to_email or "@" not in to_email:
+        logger.error("Invalid email address: %s", to_email)
+        raise ValueError("Invalid email address")
+
+    from google.auth.exceptions import RefreshError
+
+    rows = "".join(
+        f"""
+            <li><code style="background: #e1e4e8; padding: 2px 4px; border-radius: 3px;">{account_email}</code>
+                ({account_type.title()} Edition{f", expired {expires_at:%Y-%m-%d}" if expires_at else ""})</li>"""
+        for account_email, account_type, expires_at in accounts
+    )
+    subject = (
+        f"Your {len(accounts)} GitHub Copilot Accounts Have Expired" if len(accounts) > 1
+        else "Your GitHub Copilot Account Has Expired"
+    )
+    body = f"""
+    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+        <h2 style="color: #24292e;">⏰ {subject}</h2>
+
+        <p>Hello,</p>
+
+        <p>The following GitHub Copilot account{"s have" if len(accounts) > 1 else " has"} reached the end of {"their" if len(accounts) > 1 else "its"} one-year term and can no longer be used:</p>
+
+        <div style="background-color: #f6f8fa; padding: 20px; border-radius: 8px; margin: 20px 0;">
+            <ul style="margin: 0;">{rows}
+            </ul>
+        </div>
+
+        <p>To keep using GitHub Copilot, you can purchase a new account at <a href="{settings.FRONTEND_URL}" style="color: #0366d6;">{settings.FRONTEND_URL}</a>.</p>
+
+        <hr style="border: none; border-top: 1px solid #e1e4e8; margin: 30px 0;">
+
+        <p>If you have any questions or need support, please don't hesitate to contact us.</p>
+
+        <p>Best regards,<br>
+        <strong>The GitHub Copilot Store Team</strong></p>
+    </div>
+    """
+
+    try:
+        sent = await send_message(service, _html_message(to_email, subject, body))
+        logger.info("Expiry notice for %s account(s) sent to %s, Message Id: %s", len(accounts), to_email, sent['id'])
+        return sent['id']
+    except DependencyUnavailable:
+        # Gmail was never called; the outbox gives the attempt back
+        raise
+    except RefreshError as e:
+        logger.error("Gmail credentials refresh failed: %s", e)
+        raise Exception(f"Failed to send expiry notice: {str(e)}")
+    except Exception as e:
+        logger.error("Failed to send expiry notice to %s: %s", to_email, e)
+        raise Exception(f"Failed to send expiry notice: {str(e)}")
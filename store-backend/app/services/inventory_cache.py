@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+CountLoader = Callable[[AsyncSession], Awaitable[Dict[str, int]]]
+
+
+class InventoryCountCache:
+    """
+    Per-process cache of available-account counts keyed by account_type.
+
+    Allocations and imports done by this process adjust the counts in place
+    once their transaction commits, so reads are answered from memory. Other workers' writes are only seen through
+    the TTL backstop, which reloads the counts from the database once they are
+    older than ``ttl`` seconds. While one request reloads, concurrent readers
+    keep getting the previous snapshot instead of queueing behind it.
+    """
+
+    def __init__(self, loader: CountLoader, ttl: float):
+        self._loader = loader
+        self._ttl = ttl
+        self._counts: Dict[str, int] = {}
+        self._loaded_at = 0.0
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._loaded and time.monotonic() - self._loaded_at < self._ttl
+
+    async def get_counts(self, db: AsyncSession) -> Dict[str, int]:
+        if self._is_fresh() or (self._loaded and self._lock.locked()):
+            return dict(self._counts)
+
+        async with self._lock:
+            if not self._is_fresh():
+                await self.reload(db)
+        return dict(self._counts)
+
+    async def reload(self, db: AsyncSession):
+        counts = await self._loader(db)
+        self._counts = counts
+        self._loaded_at = time.monotonic()
+        self._loaded = True
+        logger.debug("Inventory count cache reloaded: %s", counts)
+
+    def adjust(self, account_type: str, delta: int):
+        """Apply a local change; ignored until the first load so we never guess a base."""
+        if not self._loaded or not delta:
+            return
+        self._counts[account_type] = max(0, self._counts.get(account_type, 0) + delta)
+
+    def adjust_on_commit(self, db: AsyncSession, deltas: Dict[str, int]):
+        """
+        Applies ``deltas`` when ``db``'s transaction commits and drops them if it
+        rolls back, so the counts never run ahead of the database. For writes
+        whose commit is left to the caller.
+        """
+        session = db.sync_session
+        key = ("inventory_count_cache", id(self))
+        pending = session.info.get(key)
+        if pending is None:
+            pending = session.info[key] = Counter()
+            event.listen(session, "after_commit", lambda _: self._apply(pending))
+            event.listen(session, "after_rollback", lambda _: pending.clear())
+        pending.update(deltas)
+
+    def _apply(self, pending: Counter):
+        for account_type, delta in pending.items():
+            self.adjust(account_type, delta)
+        pending.clear()
+
+    def invalidate(self):
+        self._loaded_at = 0.0
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+from typing import AsyncIterator, Dict, List, Optional, Set
+import asyncpg
+from sqlalchemy.engine import make_url
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.db.session import async_session_factory
+from .background import backoff_delay
+from .inventory_cache import InventoryCountCache
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "inventory_changed"
+# Tells EventSource how long to wait before reconnecting after a stream ends.
+RECONNECT_DELAY_MS = 1000
+# Identifies this process's own notifications, whose deltas are already in its cache.
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def notify_inventory_changed(db: AsyncSession, deltas: Dict[str, int]):
+    """
+    Queues a NOTIFY with per-type count changes in the caller's transaction.
+    Postgres delivers it on commit and drops it on rollback, so listeners only
+    hear about changes that actually happened.
+    """
+    deltas = {account_type: delta for account_type, delta in deltas.items() if delta}
+    if not deltas or not settings.INVENTORY_STREAM_ENABLED:
+        return
+    payload = json.dumps({"origin": ORIGIN, "deltas": deltas})
+    await db.exec(select(func.pg_notify(CHANNEL, payload)))
+
+
+def _sse_event(counts: Dict[str, int]) -> str:
+    data = json.dumps({"inventory_count": sum(counts.values()), "by_type": counts})
+    return f"event: inventory\ndata: {data}\n\n"
+
+
+class InventoryChangeFeed:
+    """
+    Fans inventory count changes out to this worker's SSE clients.
+
+    One asyncpg connection per process LISTENs on ``CHANNEL``, however many
+    clients are connected. Deltas from other workers are applied to the count
+    cache, so it stays current without waiting for its TTL. Any notification
+    marks the counts as changed. Bursts are coalesced for ``coalesce_seconds``,
+    and each client is then sent the latest counts. A client's queue holds one
+    snapshot, so a slow client skips intermediate states instead of building
+    a backlog. Notifications missed while the connection was down are covered
+    by reloading the cache after each reconnect.
+    """
+
+    def __init__(
+        self,
+        cache: InventoryCountCache,
+        enabled: bool,
+        coalesce_seconds: float,
+        heartbeat_seconds: float,
+        max_stream_seconds: float,
+        reconnect_max_seconds: float = 30.0
+    ):
+        self.cache = cache
+        self.enabled = enabled
+        self.coalesce_seconds = coalesce_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_stream_seconds = max_stream_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+        self.listening = False
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._changed = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def clients(self) -> int:
+        return len(self._subscribers)
+
+    def start(self):
+        if self.enabled and not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._listen(), name="inventory-listen"),
+                asyncio.create_task(self._broadcast(), name="inventory-broadcast"),
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Ends any streams still open, e.g. once the server stops waiting for them.
+        self._publish(None)
+
+    def _publish(self, counts: Optional[Dict[str, int]]):
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(counts)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed inventory notification: %s", payload)
+            return
+        if message.get("origin") != ORIGIN:
+            for account_type, delta in message.get("deltas", {}).items():
+                self.cache.adjust(account_type, delta)
+        self._changed.set()
+
+    async def snapshot(self) -> Dict[str, int]:
+        async with async_session_factory() as db:
+            return await self.cache.get_counts(db)
+
+    async def _broadcast(self):
+        while True:
+            await self._changed.wait()
+            await asyncio.sleep(self.coalesce_seconds)
+            self._changed.clear()
+            if not self._subscribers:
+                continue
+            try:
+                counts = await self.snapshot()
+            except Exception as e:
+                logger.error("Failed to load inventory counts for the stream: %s", e)
+                continue
+            self._publish(counts)
+
+    async def _listen(self):
+        dsn = make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        attempts = 0
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+            except Exception as e:
+                attempts += 1
+                delay = backoff_delay(attempts, 1.0, self.reconnect_max_seconds)
+                logger.error("Inventory LISTEN connection failed, retrying in %.1fs: %s", delay, e)
+                await asyncio.sleep(delay)
+                continue
+
+            attempts = 0
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            try:
+                await connection.add_listener(CHANNEL, self._on_notify)
+                self.listening = True
+                # Anything that changed while we were not listening was missed.
+                self.cache.invalidate()
+                self._changed.set()
+                logger.info("Listening for inventory changes on %s", CHANNEL)
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), timeout=self.heartbeat_seconds)
+                    except asyncio.TimeoutError:
+                        # A silently dropped connection is only noticed when used.
+                        await connection.fetchval("SELECT 1", timeout=self.heartbeat_seconds)
+                logger.warning("Inventory LISTEN connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Inventory LISTEN connection lost, reconnecting: %s", e)
+            finally:
+                self.listening = False
+                connection.terminate()
+
+    async def stream(self) -> AsyncIterator[str]:
+        """
+        Server-sent events for one client: the current counts first, then one
+        event per (coalesced) change, with a comment line as a keep-alive when
+        nothing changes for ``heartbeat_seconds``.
+
+        The stream ends after ``max_stream_seconds`` and EventSource reconnects
+        on its own. uvicorn waits for open responses before running shutdown
+        hooks, so an endless stream would hold up every restart.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_stream_seconds
+        try:
+            yield f"retry: {RECONNECT_DELAY_MS}\n" + _sse_event(await self.snapshot())
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    counts = await asyncio.wait_for(queue.get(), timeout=min(self.heartbeat_seconds, remaining))
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if counts is None:
+                    break
+                yield _sse_event(counts)
+        finally:
+            self._subscribers.discard(queue)
@@ -0,0 +1,143 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlmodel import delete, insert, select, tuple_, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.core.metrics import traced
+from app.db.session import async_session_factory
+from app.models.inventory import CopilotAccount, CopilotAccountHistory
+from app.models.outbox import EmailOutbox
+from .background import PollingWorker
+from .email_outbox import email_outbox_dispatcher
+
+logger = logging.getLogger(__name__)
+
+# Columns copied into copilot_account_history; archived_at is set on insert.
+ARCHIVED_COLUMNS = [name for name in CopilotAccountHistory.__table__.columns.keys() if name != "archived_at"]
+
+Cursor = Optional[Tuple[datetime, int]]
+
+
+class AccountExpirySweeper(PollingWorker):
+    """
+    Background task that retires accounts past ``expires_at``.
+
+    Each round handles one chunk of up to ``batch_size`` rows per phase. Both
+    phases walk ix_copilot_account_status_expires_at in (expires_at, id) keyset
+    order and lock their candidates with FOR UPDATE SKIP LOCKED:
+
+    1. Expire: assigned accounts whose expiry has passed become ``expired``
+       with one UPDATE ... RETURNING. With ``notify`` on, the same transaction
+       queues one ``account_expired`` outbox message per customer.
+    2. Archive: accounts expired more than ``archive_after_days`` ago are
+       removed with DELETE ... RETURNING and inserted into
+       copilot_account_history in the same transaction.
+
+    Every chunk is its own short transaction. A full chunk is followed right
+    away by the next one, which continues from the keyset cursor, so rows
+    skipped because another transaction held them are not rescanned until the
+    next sweep. Several workers can sweep side by side.
+    """
+
+    name = "inventory-expiry"
+
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval: float,
+        notify: bool,
+        archive_after_days: Optional[float]
+    ):
+        super().__init__(batch_size=batch_size, poll_interval=poll_interval)
+        self.notify = notify
+        self.archive_after_days = archive_after_days
+        self._expire_cursor: Cursor = None
+        self._archive_cursor: Cursor = None
+
+    def _candidates(self, status: str, cutoff: datetime, cursor: Cursor):
+        candidates = select(CopilotAccount.id).where(
+            CopilotAccount.status == status,
+            CopilotAccount.expires_at < cutoff
+        )
+        if cursor is not None:
+            candidates = candidates.where(tuple_(CopilotAccount.expires_at, CopilotAccount.id) > tuple_(*cursor))
+        return (
+            candidates
+            .order_by(CopilotAccount.expires_at, CopilotAccount.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+
+    def _next_cursor(self, rows) -> Cursor:
+        """Continue after the last row of a full chunk; start over after a short one."""
+        if len(rows) < self.batch_size:
+            return None
+        return max((row.expires_at, row.id) for row in rows)
+
+    async def _expire_chunk(self, db: AsyncSession) -> int:
+        result = await db.exec(
+            update(CopilotAccount)
+            .where(CopilotAccount.id.in_(self._candidates("assigned", datetime.utcnow(), self._expire_cursor)))
+            .values(status="expired")
+            .returning(CopilotAccount.id, CopilotAccount.expires_at, CopilotAccount.assigned_to_email)
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+
+        by_customer: Dict[str, List[int]] = {}
+        if self.notify:
+            for row in rows:
+                if row.assigned_to_email:
+                    by_customer.setdefault(row.assigned_to_email, []).append(row.id)
+            db.add_all(
+                EmailOutbox(kind="account_expired", to_email=to_email, account_ids=sorted(account_ids))
+                for to_email, account_ids in by_customer.items()
+            )
+        await db.commit()
+
+        self._expire_cursor = self._next_cursor(rows)
+        if by_customer:
+            email_outbox_dispatcher.wake()
+        if rows:
+            logger.info("Expired %s accounts, queued %s expiry notices", len(rows), len(by_customer))
+        return len(rows)
+
+    async def _archive_chunk(self, db: AsyncSession) -> int:
+        cutoff = datetime.utcnow() - timedelta(days=self.archive_after_days)
+        result = await db.exec(
+            delete(CopilotAccount)
+            .where(CopilotAccount.id.in_(self._candidates("expired", cutoff, self._archive_cursor)))
+            .returning(*(CopilotAccount.__table__.c[name] for name in ARCHIVED_COLUMNS))
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+        if rows:
+            archived_at = datetime.utcnow()
+            await db.exec(
+                insert(CopilotAccountHistory).values([
+                    {**row._asdict(), "archived_at": archived_at} for row in rows
+                ])
+            )
+        await db.commit()
+
+        self._archive_cursor = self._next_cursor(rows)
+        if rows:
+            logger.info("Archived %s expired accounts to copilot_account_history", len(rows))
+        return len(rows)
+
+    @traced
+    async def run_once(self) -> int:
+        """Expires and archives one chunk each; returns the larger of the two counts."""
+        async with async_session_factory() as db:
+            expired = await self._expire_chunk(db)
+            archived = await self._archive_chunk(db) if self.archive_after_days is not None else 0
+        return max(expired, archived)
+
+
+inventory_expiry_sweeper = AccountExpirySweeper(
+    batch_size=settings.INVENTORY_EXPIRY_BATCH_SIZE,
+    poll_interval=settings.INVENTORY_EXPIRY_POLL_INTERVAL_SECONDS,
+    notify=settings.INVENTORY_EXPIRY_NOTIFY,
+    archive_after_days=settings.INVENTORY_EXPIRY_ARCHIVE_AFTER_DAYS
+)
@@ -0,0 +1,248 @@
+import csv
+import codecs
+import json
+import logging
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.models.inventory import ACCOUNT_TYPES
+from .inventory_service import inventory_service
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_FORMATS = ("csv", "jsonl")
+
+
+class ImportReport:
+    """Running totals for one bulk import; only the first N row errors are kept."""
+
+    def __init__(self, max_errors: int):
+        self.total_rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, object]] = []
+        self._max_errors = max_errors
+
+    def add_error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < self._max_errors:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "total_rows": self.total_rows,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "errors_truncated": self.error_count > len(self.errors),
+        }
+
+
+def detect_format(content_type: Optional[str], explicit: Optional[str] = None) -> str:
+    """Pick the upload format from an explicit ?format= or the Content-Type header."""
+    if explicit:
+        fmt = explicit.lower()
+    else:
+        media_type = (content_type or "").split(";")[0].strip().lower()
+        if media_type in ("text/csv", "application/csv"):
+            fmt = "csv"
+        elif media_type in ("application/x-ndjson", "application/jsonl", "application/x-jsonlines"):
+            fmt = "jsonl"
+        else:
+            fmt = ""
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported import format. Use one of: {', '.join(SUPPORTED_FORMATS)}")
+    return fmt
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without holding more than one line in memory."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+def _normalize_row(raw: Dict[str, object]) -> Dict[str, str]:
+    email = str(raw.get("email") or raw.get("username") or "").strip()
+    # Passwords are credentials: keep them exactly as given
+    password = str(raw.get("password") or "")
+    account_type = str(raw.get("account_type") or "education").strip().lower()
+
+    if not email or "@" not in email:
+        raise ValueError("email is missing or invalid")
+    if not password:
+        raise ValueError("password is required")
+    if account_type not in ACCOUNT_TYPES:
+        raise ValueError(f"unknown account_type '{account_type}'")
+    return {"email": email, "password": password, "account_type": account_type}
+
+
+# A quoted field left open this long is a broken file, not a long password
+MAX_CSV_RECORD_CHARS = 64 * 1024
+
+
+def _parse_csv_record(record: str, header: List[str]) -> Dict[str, str]:
+    values = next(csv.reader([record]))
+    if len(values) != len(header):
+        raise ValueError(f"expected {len(header)} columns, got {len(values)}")
+    return dict(zip(header, values))
+
+
+def _ends_in_quotes(line: str, in_quotes: bool) -> bool:
+    """
+    Whether a CSV record is still inside a quoted field after ``line``. As in
+    csv.reader, a quote only opens a field at the start of that field, so a
+    literal quote inside an unquoted value does not.
+    """
+    field_start = not in_quotes
+    i = 0
+    while i < len(line):
+        ch = line[i]
+        if in_quotes:
+            if ch == '"':
+                if line[i + 1:i + 2] == '"':
+                    i += 1
+                else:
+                    in_quotes = False
+        elif ch == '"' and field_start:
+            in_quotes = True
+        field_start = not in_quotes and ch == ","
+        i += 1
+    return in_quotes
+
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Optional[str], Optional[str]]]:
+    """
+    Joins physical lines into CSV records and yields (first_line_number, record, error).
+    A quoted field may contain newlines, so a record ends at the first line
+    break outside quotes. A quoted field still open after MAX_CSV_RECORD_CHARS,
+    or at the end of the file, is reported as an error for the line it started
+    on, and parsing restarts on the next physical line.
+    """
+    source = lines.__aiter__()
+    replay: Deque[Tuple[int, str]] = deque()
+    pending: List[Tuple[int, str]] = []
+    size = 0
+    in_quotes = False
+    line_number = 0
+    while True:
+        if replay:
+            number, line = replay.popleft()
+        else:
+            try:
+                line = await source.__anext__()
+            except StopAsyncIteration:
+                if not pending:
+                    return
+                number = None
+            else:
+                line_number += 1
+                number = line_number
+        if number is not None:
+            pending.append((number, line))
+            size += len(line) + 1
+            in_quotes = _ends_in_quotes(line, in_quotes)
+            if not in_quotes:
+                yield pending[0][0], "\n".join(text for _, text in pending), None
+                pending, size = [], 0
+                continue
+            if size <= MAX_CSV_RECORD_CHARS:
+                continue
+        # 引号未闭合：报告起始行，从下一行重新解析已读入的内容
+        start = pending[0][0]
+        yield start, None, f"unterminated quoted field starting on line {start}"
+        replay.extendleft(reversed(pending[1:]))
+        pending, size, in_quotes = [], 0, False
+
+
+async def iter_json_lines(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Optional[str], Optional[str]]]:
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        yield line_number, line, None
+
+
+async def iter_rows(
+    lines: AsyncIterator[str], fmt: str
+) -> AsyncIterator[Tuple[int, Optional[Dict[str, str]], Optional[str]]]:
+    """Yield (line_number, row, error) for every non-blank record."""
+    header: Optional[List[str]] = None
+    records = iter_csv_records(lines) if fmt == "csv" else iter_json_lines(lines)
+    async for line_number, record, error in records:
+        if error:
+            if header is None:
+                raise ValueError(error)
+            yield line_number, None, error
+            continue
+        if not record.strip():
+            continue
+        try:
+            if fmt == "csv":
+                if header is None:
+                    columns = [column.strip().lower() for column in next(csv.reader([record]))]
+                    if "password" not in columns or not ({"email", "username"} & set(columns)):
+                        raise ValueError("CSV header must contain email (or username) and password columns")
+                    header = columns
+                    continue
+                raw = _parse_csv_record(record, header)
+            else:
+                raw = json.loads(record)
+                if not isinstance(raw, dict):
+                    raise ValueError("each JSONL line must be an object")
+            yield line_number, _normalize_row(raw), None
+        except (ValueError, csv.Error) as e:
+            if fmt == "csv" and header is None:
+                raise
+            yield line_number, None, str(e)
+
+
+async def import_inventory(
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    db: AsyncSession,
+    batch_size: Optional[int] = None,
+) -> Dict[str, object]:
+    """
+    Streams a CSV/JSONL upload into copilot_account in multi-row INSERT batches.
+
+    Only one batch is buffered at a time and every batch is committed on its own,
+    so memory stays flat regardless of file size and a late failure keeps the
+    rows already imported.
+    """
+    batch_size = batch_size or settings.INVENTORY_IMPORT_BATCH_SIZE
+    report = ImportReport(settings.INVENTORY_IMPORT_MAX_REPORTED_ERRORS)
+    batch: List[Dict[str, str]] = []
+
+    async def flush():
+        inserted, duplicates = await inventory_service.bulk_add_inventory(batch, db)
+        report.inserted += len(inserted)
+        report.duplicates += len(duplicates)
+        batch.clear()
+
+    async for line_number, row, error in iter_rows(iter_lines(chunks), fmt):
+        report.total_rows += 1
+        if error:
+            report.add_error(line_number, error)
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+
+    logger.info(
+        "Inventory import finished: %s inserted, %s duplicates, %s errors",
+        report.inserted, report.duplicates, report.error_count
+    )
+    return report.to_dict()
@@ -0,0 +1,234 @@
+import logging
+import os
+import socket
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Iterable, List, Optional
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.core.metrics import traced
+from app.db.session import async_session_factory
+from app.models.inventory import ACCOUNT_TYPES, CopilotAccount
+from .background import PollingWorker
+from .inventory_events import notify_inventory_changed
+from .inventory_service import InventoryService, assignment_values, inventory_count_cache
+
+logger = logging.getLogger(__name__)
+
+
+class AccountReservationPool(PollingWorker):
+    """
+    Per-process pool of accounts leased ahead of demand, one queue per account_type.
+
+    In reservation mode each round tops up every queue that fell below
+    ``low_water`` to ``batch_size`` with one UPDATE ... RETURNING per type
+    (FOR UPDATE SKIP LOCKED), marking the rows ``reserved`` by this process
+    until ``now + lease_seconds``. Allocations then pop an id from memory and
+    assign it by primary key, so a checkout no longer searches the table. The
+    search (``InventoryService.claim_accounts``) is only the fallback for an
+    empty queue.
+
+    Every round, in reservation mode or not, also returns leases whose expiry
+    has passed to ``available``, so accounts held by a worker that died are not
+    stranded. Live workers renew their own leases each round and return them on
+    shutdown.
+    """
+
+    name = "inventory-reservation"
+
+    def __init__(
+        self,
+        enabled: bool,
+        account_types: Iterable[str],
+        batch_size: int,
+        low_water: int,
+        lease_seconds: float,
+        refresh_interval: float
+    ):
+        super().__init__(batch_size=batch_size, poll_interval=refresh_interval)
+        self.enabled = enabled
+        self.low_water = low_water
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._reserved: Dict[str, Deque[int]] = {account_type: deque() for account_type in account_types}
+
+    def sizes(self) -> Dict[str, int]:
+        """Number of accounts currently held in memory, per account_type."""
+        return {account_type: len(ids) for account_type, ids in self._reserved.items()}
+
+    async def _lease(self, account_type: str, count: int, db: AsyncSession) -> int:
+        candidates = (
+            select(CopilotAccount.id)
+            .where(CopilotAccount.account_type == account_type, CopilotAccount.status == "available")
+            .order_by(CopilotAccount.id)
+            .limit(count)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            update(CopilotAccount)
+            .where(CopilotAccount.id.in_(candidates))
+            .values(
+                status="reserved",
+                reserved_by=self.owner,
+                reserved_until=datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+            )
+            .returning(CopilotAccount.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.exec(statement)
+        ids = sorted(result.scalars().all())
+        await db.commit()
+        self._reserved[account_type].extend(ids)
+        return len(ids)
+
+    async def _renew(self, db: AsyncSession):
+        """
+        Extends this worker's leases and syncs the queues with them: ids whose
+        lease was released elsewhere are dropped, and leased ids missing from
+        memory (e.g. popped by a claim whose transaction rolled back) are
+        queued again. Re-queuing an id that is still mid-claim is harmless,
+        because assignment only succeeds while the row is still reserved.
+        """
+        result = await db.exec(
+            update(CopilotAccount)
+            .where(CopilotAccount.reserved_by == self.owner, CopilotAccount.status == "reserved")
+            .values(reserved_until=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+            .returning(CopilotAccount.id, CopilotAccount.account_type)
+            .execution_options(synchronize_session=False)
+        )
+        held: Dict[str, set] = {}
+        for account_id, account_type in result.all():
+            held.setdefault(account_type, set()).add(account_id)
+        await db.commit()
+
+        for account_type, ids in self._reserved.items():
+            leased = held.get(account_type, set())
+            kept = [account_id for account_id in ids if account_id in leased]
+            if len(kept) < len(ids):
+                logger.warning("%s reserved %s accounts were released by someone else", len(ids) - len(kept), account_type)
+            queued = set(kept)
+            kept.extend(sorted(account_id for account_id in leased if account_id not in queued))
+            self._reserved[account_type] = deque(kept)
+
+    async def _release_expired(self, db: AsyncSession) -> int:
+        result = await db.exec(
+            update(CopilotAccount)
+            .where(CopilotAccount.status == "reserved", CopilotAccount.reserved_until < datetime.utcnow())
+            .values(status="available", reserved_by=None, reserved_until=None)
+            .returning(CopilotAccount.id)
+            .execution_options(synchronize_session=False)
+        )
+        released = len(result.scalars().all())
+        await db.commit()
+        if released:
+            logger.info("Released %s expired account reservations", released)
+        return released
+
+    @traced
+    async def run_once(self) -> int:
+        """Renews, releases expired leases and refills queues below the low-water mark; returns accounts leased."""
+        leased = 0
+        async with async_session_factory() as db:
+            if self.enabled:
+                await self._renew(db)
+            await self._release_expired(db)
+            if self.enabled:
+                for account_type, ids in self._reserved.items():
+                    if len(ids) < self.low_water:
+                        leased += await self._lease(account_type, self.batch_size - len(ids), db)
+        return leased
+
+    @traced
+    async def claim_accounts(
+        self,
+        quantities: Dict[str, int],
+        customer_email: str,
+        order_id: Optional[int],
+        db: AsyncSession,
+        commit: bool = True
+    ) -> List[CopilotAccount]:
+        """
+        Same contract as ``InventoryService.claim_accounts``. Takes as many
+        accounts as it can from this worker's reserved queues, assigns them by
+        primary key in one statement, and claims any shortfall from the table.
+        """
+        taken: List[int] = []
+        for account_type, count in quantities.items():
+            ids = self._reserved.get(account_type)
+            if not ids:
+                continue
+            taken.extend(ids.popleft() for _ in range(min(count, len(ids))))
+            if len(ids) < self.low_water:
+                self.wake()
+
+        try:
+            accounts: List[CopilotAccount] = []
+            if taken:
+                result = await db.exec(
+                    update(CopilotAccount)
+                    .where(
+                        CopilotAccount.id.in_(taken),
+                        CopilotAccount.status == "reserved",
+                        CopilotAccount.reserved_by == self.owner
+                    )
+                    .values(**assignment_values(customer_email, order_id))
+                    .returning(CopilotAccount)
+                    .execution_options(synchronize_session=False)
+                )
+                accounts = list(result.scalars().all())
+                assigned = {account_type: -n for account_type, n in Counter(account.account_type for account in accounts).items()}
+                await notify_inventory_changed(db, assigned)
+                inventory_count_cache.adjust_on_commit(db, assigned)
+
+            from_reserved = len(accounts)
+            # 队列不足或租约已被回收的部分，直接从库存表领取
+            served = Counter(account.account_type for account in accounts)
+            shortfall = {
+                account_type: count - served[account_type]
+                for account_type, count in quantities.items()
+                if count > served[account_type]
+            }
+            if shortfall:
+                accounts += await InventoryService.claim_accounts(
+                    shortfall, customer_email, order_id, db, commit=False
+                )
+            if commit:
+                await db.commit()
+        except Exception as e:
+            # 已取出的预留账号会在下一轮续租时重新入队，或随租约过期回收
+            logger.error("分配预留账号时出错: %s", e)
+            await db.rollback()
+            raise
+
+        logger.info("为客户 %s 分配了 %s 个账号，其中 %s 个来自预留", customer_email, len(accounts), from_reserved)
+        return accounts
+
+    async def stop(self):
+        """Stops the refill loop and hands this worker's reserved accounts back."""
+        await super().stop()
+        if not self.enabled:
+            return
+        try:
+            async with async_session_factory() as db:
+                await db.exec(
+                    update(CopilotAccount)
+                    .where(CopilotAccount.reserved_by == self.owner, CopilotAccount.status == "reserved")
+                    .values(status="available", reserved_by=None, reserved_until=None)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error("Failed to release account reservations on shutdown, they will expire: %s", e)
+        for ids in self._reserved.values():
+            ids.clear()
+
+
+inventory_reservations = AccountReservationPool(
+    enabled=settings.INVENTORY_RESERVATION_ENABLED,
+    account_types=ACCOUNT_TYPES,
+    batch_size=settings.INVENTORY_RESERVATION_BATCH_SIZE,
+    low_water=settings.INVENTORY_RESERVATION_LOW_WATER,
+    lease_seconds=settings.INVENTORY_RESERVATION_LEASE_SECONDS,
+    refresh_interval=settings.INVENTORY_RESERVATION_REFRESH_SECONDS
+)
@@ -1,91 +1,208 @@
 import logging
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+from collections import Counter
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlmodel import select, func
-from app.models.inventory import CopilotAccount
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import union_all
+from sqlmodel import select, func, update
+from app.core.config import settings
+from app.core.metrics import traced
+from app.models.inventory import CopilotAccount, STOCK_STATUSES
+from .inventory_cache import InventoryCountCache
+from .inventory_events import InventoryChangeFeed, notify_inventory_changed
 
 logger = logging.getLogger(__name__)
 
+def assignment_values(customer_email: str, order_id: Optional[int]) -> Dict[str, object]:
+    """分配账号时写入的字段，同时清除预留租约"""
+    now = datetime.utcnow()
+    return {
+        "status": "assigned",
+        "assigned_to_email": customer_email,
+        "assigned_at": now,
+        "order_id": order_id,
+        # 设置账号1年后过期
+        "expires_at": now + timedelta(days=365),
+        "reserved_by": None,
+        "reserved_until": None,
+    }
+
 class InventoryService:
     """库存管理服务"""
     
     @staticmethod
-    async def get_available_account(account_type: str, db: AsyncSession) -> Optional[CopilotAccount]:
-        """获取可用的账号"""
+    @traced
+    async def claim_accounts(
+        quantities: Dict[str, int],
+        customer_email: str,
+        order_id: Optional[int],
+        db: AsyncSession,
+        commit: bool = True
+    ) -> List[CopilotAccount]:
+        """一条语句为一个订单领取多个类型、多个数量的账号
+
+        quantities 为 {account_type: 数量}。每个类型用一个
+        FOR UPDATE SKIP LOCKED LIMIT n 查询选出候选行，各类型的结果在 CTE 中
+        UNION ALL 合并，再用 UPDATE ... FROM picked ... RETURNING 一次分配，
+        50 个席位也只需要一次往返。不能用 OR 连接多个 IN 子查询：PostgreSQL
+        无法把它们改写成半连接，会对整张表做顺序扫描，也用不上
+        ix_copilot_account_available_type 部分索引。
+        库存不足时返回的账号少于请求数量，由调用方处理。
+        """
+        quantities = {account_type: n for account_type, n in quantities.items() if n > 0}
+        if not quantities:
+            return []
+
+        candidates = [
+            # 每个分支包一层子查询，LIMIT / FOR UPDATE 才能出现在 UNION ALL 里
+            select(
+                select(CopilotAccount.id)
+                .where(
+                    CopilotAccount.account_type == account_type,
+                    CopilotAccount.status == "available"
+                )
+                .order_by(CopilotAccount.id)
+                .limit(n)
+                .with_for_update(skip_locked=True)
+                .subquery()
+                .c.id
+            )
+            for account_type, n in quantities.items()
+        ]
+        picked = union_all(*candidates).cte("picked")
+        statement = (
+            update(CopilotAccount)
+            .where(CopilotAccount.id == picked.c.id)
+            .values(**assignment_values(customer_email, order_id))
+            .returning(CopilotAccount)
+            .execution_options(synchronize_session=False)
+        )
+
         try:
-            statement = select(CopilotAccount).where(
-                CopilotAccount.account_type == account_type,
-                CopilotAccount.status == "available"
-            ).limit(1)
-            
             result = await db.exec(statement)
-            account = result.first()
-            
-            if account:
-                logger.info(f"找到可用账号: {account.email} (类型: {account_type})")
-            else:
-                logger.warning(f"没有可用的 {account_type} 账号")
-                
-            return account
-            
+            accounts = list(result.scalars().all())
+            claimed = {account_type: -n for account_type, n in Counter(account.account_type for account in accounts).items()}
+            await notify_inventory_changed(db, claimed)
+            # 和 NOTIFY 一样，缓存只在事务提交后才扣减
+            inventory_count_cache.adjust_on_commit(db, claimed)
+            if commit:
+                await db.commit()
         except Exception as e:
-            logger.error(f"查询可用账号时出错: {str(e)}")
-            return None
-    
-    @staticmethod
-    async def assign_account(
-        account: CopilotAccount, 
-        customer_email: str, 
-        order_id: int,
-        db: AsyncSession
-    ) -> bool:
-        """分配账号给客户"""
-        try:
-            account.status = "assigned"
-            account.assigned_to_email = customer_email
-            account.assigned_at = datetime.utcnow()
-            account.order_id = order_id
-            # 设置账号1年后过期
-            account.expires_at = datetime.utcnow() + timedelta(days=365)
-            
-            db.add(account)
-            await db.commit()
-            await db.refresh(account)
-            
-            logger.info(f"成功分配账号 {account.email} 给客户 {customer_email}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"分配账号时出错: {str(e)}")
+            logger.error("批量领取账号时出错: %s", e)
             await db.rollback()
-            return False
+            raise
+
+        logger.info("为客户 %s 领取了 %s/%s 个账号", customer_email, len(accounts), sum(quantities.values()))
+        return accounts
+
+    @staticmethod
+    @traced
+    async def get_inventory_counts_by_type(db: AsyncSession) -> Dict[str, int]:
+        """按账号类型统计可用库存数量（含已预留但未售出的账号）"""
+        statement = (
+            select(CopilotAccount.account_type, func.count())
+            .where(CopilotAccount.status.in_(STOCK_STATUSES))
+            .group_by(CopilotAccount.account_type)
+        )
+        result = await db.exec(statement)
+        return {account_type: count for account_type, count in result.all()}
 
     @staticmethod
-    async def get_inventory_count(db: AsyncSession) -> int:
-        """获取库存中的项目数"""
+    @traced
+    async def get_cached_inventory_counts(db: AsyncSession) -> Dict[str, int]:
+        """从进程内缓存获取按类型划分的可用库存数量，过期后才查询数据库"""
         try:
-            statement = select(func.count()).select_from(CopilotAccount).where(CopilotAccount.status == "available")
-            result = await db.exec(statement)
-            count = result.one()
-            return count
+            return await inventory_count_cache.get_counts(db)
         except Exception as e:
-            logger.error(f"查询库存数量时出错: {str(e)}")
-            return 0
+            logger.error("查询库存数量时出错: %s", e)
+            return {}
 
     @staticmethod
+    @traced
     async def add_inventory_item(username: str, password: str, db: AsyncSession):
         """向库存中添加一个新项目"""
         try:
             new_item = CopilotAccount(email=username, password=password, account_type="education", status="available")
             db.add(new_item)
+            await notify_inventory_changed(db, {new_item.account_type: 1})
             await db.commit()
             await db.refresh(new_item)
-            logger.info(f"成功添加新库存项目: {username}")
+            inventory_count_cache.adjust(new_item.account_type, 1)
+            logger.info("成功添加新库存项目: %s", username)
         except Exception as e:
-            logger.error(f"添加库存项目时出错: {str(e)}")
+            logger.error("添加库存项目时出错: %s", e)
             await db.rollback()
             raise
 
+    @staticmethod
+    @traced
+    async def bulk_add_inventory(
+        items: List[Dict[str, str]],
+        db: AsyncSession
+    ) -> Tuple[List[str], List[str]]:
+        """批量添加库存项目
+
+        items 为 {"email", "password", "account_type"} 字典列表。按邮箱去重：
+        同一批次内重复的、以及数据库中已存在的邮箱都会被跳过，其余的用一条
+        多行 INSERT ... ON CONFLICT DO NOTHING 写入并提交，并发导入同一批账号
+        也只会插入一次。返回 (已插入的邮箱列表, 重复的邮箱列表)。
+        """
+        unique: Dict[str, Dict[str, str]] = {}
+        duplicates: List[str] = []
+        for item in items:
+            if item["email"] in unique:
+                duplicates.append(item["email"])
+            else:
+                unique[item["email"]] = item
+
+        if not unique:
+            return [], duplicates
+
+        try:
+            result = await db.exec(
+                pg_insert(CopilotAccount)
+                .values([
+                    {
+                        "email": item["email"],
+                        "password": item["password"],
+                        "account_type": item["account_type"],
+                        "status": "available",
+                        "created_at": datetime.utcnow(),
+                    }
+                    for item in unique.values()
+                ])
+                .on_conflict_do_nothing(index_elements=["email"])
+                .returning(CopilotAccount.email, CopilotAccount.account_type)
+            )
+            inserted = result.all()
+            added = Counter(account_type for _, account_type in inserted)
+            if added:
+                await notify_inventory_changed(db, dict(added))
+            await db.commit()
+        except Exception as e:
+            logger.error("批量添加库存项目时出错: %s", e)
+            await db.rollback()
+            raise
+
+        for account_type, count in added.items():
+            inventory_count_cache.adjust(account_type, count)
+
+        inserted_emails = [email for email, _ in inserted]
+        duplicates.extend(set(unique) - set(inserted_emails))
+        logger.info("批量添加库存项目: 插入 %s 条, 重复 %s 条", len(inserted_emails), len(duplicates))
+        return inserted_emails, duplicates
+
 # 创建全局实例
 inventory_service = InventoryService()
+inventory_count_cache = InventoryCountCache(
+    loader=InventoryService.get_inventory_counts_by_type,
+    ttl=settings.INVENTORY_COUNT_CACHE_TTL_SECONDS
+)
+inventory_feed = InventoryChangeFeed(
+    cache=inventory_count_cache,
+    enabled=settings.INVENTORY_STREAM_ENABLED,
+    coalesce_seconds=settings.INVENTORY_STREAM_COALESCE_SECONDS,
+    heartbeat_seconds=settings.INVENTORY_STREAM_HEARTBEAT_SECONDS,
+    max_stream_seconds=settings.INVENTORY_STREAM_MAX_SECONDS
+)
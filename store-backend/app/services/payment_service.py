@@ -1,96 +1,249 @@
-import stripe
+import asyncio
 import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
-from . import email_service
+from app.core.metrics import external_call, traced
+from app.core.resilience import stripe_dependency
+from app.models.inventory import ACCOUNT_TYPES, CopilotAccount
+from app.models.order import Order
+from app.models.outbox import EmailOutbox
+from app.models.stripe_event import StripeEvent
 from .inventory_service import inventory_service
+from .inventory_reservation import inventory_reservations
+from .stripe_events import StripeEventProcessor
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Initialize Stripe with API key
-if settings.STRIPE_API_KEY:
-    stripe.api_key = settings.STRIPE_API_KEY
-    logger.info(f"Stripe API key initialized with key ending in: {settings.STRIPE_API_KEY[-4:]}")
-else:
-    logger.error("STRIPE_API_KEY not found in environment variables")
-    raise ValueError("STRIPE_API_KEY not configured")
+# The Stripe SDK is imported and configured on first use, not at import time.
+_stripe = None
 
-async def handle_stripe_webhook(payload: bytes, sig_header: str, db: AsyncSession):
+def get_stripe():
+    """Returns the ``stripe`` module with the API key set, importing it on first use."""
+    global _stripe
+    if _stripe is None:
+        if not settings.STRIPE_API_KEY:
+            logger.error("STRIPE_API_KEY not found in environment variables")
+            raise ValueError("STRIPE_API_KEY not configured")
+        import stripe
+        stripe.api_key = settings.STRIPE_API_KEY
+        stripe.default_http_client = stripe.http_client.RequestsClient(timeout=settings.STRIPE_TIMEOUT_SECONDS)
+        if settings.STRIPE_API_BASE:
+            stripe.api_base = settings.STRIPE_API_BASE
+        logger.info("Stripe API key initialized with key ending in: %s", settings.STRIPE_API_KEY[-4:])
+        _stripe = stripe
+    return _stripe
+
+# Events we persist and fulfil; anything else is acknowledged and dropped.
+HANDLED_EVENT_TYPES = {"checkout.session.completed"}
+
+def verify_webhook_event(payload: bytes, sig_header: str):
     """
-    Handles Stripe webhook events, specifically for completed checkouts.
+    Verifies the Stripe signature and returns the parsed event.
     """
-    endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
-    
+    stripe = get_stripe()
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, endpoint_secret
-        )
-        logger.info(f"Received webhook event: {event['type']}")
+        with external_call("stripe", "verify_webhook"):
+            event = stripe.Webhook.construct_event(
+                payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
+            )
+        logger.info("Received webhook event: %s", event['type'])
+        return event
     except stripe.error.SignatureVerificationError as e:
-        logger.error(f"Webhook signature verification failed: {str(e)}")
+        logger.error("Webhook signature verification failed: %s", e)
         raise ValueError("Invalid signature") from e
 
-    # Handle the checkout.session.completed event
+@traced
+async def handle_stripe_webhook(payload: bytes, sig_header: str, db: AsyncSession) -> bool:
+    """
+    Verifies a Stripe webhook and stores it in the stripe_event table for async processing.
+
+    The insert is keyed on the Stripe event id, so redelivered events are
+    recognised and dropped here. Returns False for such duplicates.
+    """
+    event = verify_webhook_event(payload, sig_header)
+
+    if event['type'] not in HANDLED_EVENT_TYPES:
+        logger.info("Unhandled event type %s", event['type'])
+        return True
+
+    now = datetime.utcnow()
+    statement = (
+        pg_insert(StripeEvent)
+        .values(
+            id=event['id'],
+            type=event['type'],
+            payload=payload.decode("utf-8"),
+            status="pending",
+            attempts=0,
+            next_attempt_at=now,
+            received_at=now
+        )
+        .on_conflict_do_nothing(index_elements=["id"])
+        .returning(StripeEvent.id)
+    )
+    result = await db.exec(statement)
+    inserted = result.first() is not None
+    await db.commit()
+
+    if inserted:
+        stripe_event_processor.wake()
+    else:
+        logger.info("Duplicate webhook event %s ignored", event['id'])
+    return inserted
+
+async def prepare_stripe_event(event: dict):
+    """
+    Does the Stripe API calls an event needs before it is applied, so that
+    ``process_stripe_event`` runs without network calls inside its transaction.
+    """
     if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        customer_email = session.get('customer_details', {}).get('email')
-        
-        if not customer_email:
-            logger.error(f"Customer email not found in webhook event for session {session.id}")
-            raise ValueError("Customer email not found in webhook event.")
-
-        try:
-            # 🔥 核心业务逻辑：分配GitHub Copilot账号
-            account_type = "education"  # 根据产品类型确定账号类型
-            
-            # 从库存中获取可用账号
-            available_account = await inventory_service.get_available_account(account_type, db)
-            
-            if available_account:
-                # 分配账号给客户
-                success = await inventory_service.assign_account(
-                    available_account, customer_email, 0, db
-                )
-                
-                if success:
-                    logger.info(f"成功分配账号 {available_account.email} 给客户 {customer_email}")
-                    
-                    # 发送账号密码邮件
-                    try:
-                        await email_service.send_account_credentials(
-                            to_email=customer_email,
-                            account_email=available_account.email,
-                            account_password=available_account.password,
-                            order_id=0
-                        )
-                        logger.info(f"已发送账号密码到 {customer_email}")
-                    except Exception as email_error:
-                        logger.error(f"发送账号密码邮件失败: {str(email_error)}")
-                        # 账号已分配，但邮件发送失败，需要手动处理
-                else:
-                    logger.error(f"分配账号失败，客户: {customer_email}")
-            else:
-                logger.error(f"没有可用的 {account_type} 账号！客户: {customer_email}")
-                # 应该发送缺货通知或退款
-                
-        except Exception as db_error:
-            logger.error(f"Database error processing webhook: {str(db_error)}")
-            await db.rollback()
-            raise
+        await fetch_line_items(event['data']['object'])
 
+@traced
+async def process_stripe_event(event: dict, db: AsyncSession):
+    """
+    Applies a stored Stripe event inside the caller's transaction (does not commit).
+    """
+    if event['type'] == 'checkout.session.completed':
+        await fulfill_checkout_session(event['data']['object'], db)
     else:
-        logger.info(f"Unhandled event type {event['type']}")
-        print(f"Unhandled event type {event['type']}")
+        logger.info("Unhandled event type %s", event['type'])
+
+def price_account_types() -> Dict[str, str]:
+    """Maps Stripe price ids to the account_type they sell."""
+    return {settings.STRIPE_PRICE_ID: "education", **settings.STRIPE_PRICE_ACCOUNT_TYPES}
 
-async def get_inventory_count(db: AsyncSession):
+def _list_line_items(session_id: str) -> List[dict]:
+    return list(get_stripe().checkout.Session.list_line_items(session_id, limit=100).auto_paging_iter())
+
+async def fetch_line_items(session: dict):
     """
-    Returns the number of items in the inventory.
+    Makes ``session['line_items']`` hold every line item of a checkout session.
+    Keeps the embedded list when it is complete, and otherwise fetches the
+    items from Stripe off the event loop. Call it before opening a transaction:
+    the request can take up to STRIPE_TIMEOUT_SECONDS.
     """
-    return await inventory_service.get_inventory_count(db)
+    embedded = session.get('line_items')
+    if embedded and not embedded.get('has_more'):
+        return
+    items = await stripe_dependency.call("list_line_items", asyncio.to_thread, _list_line_items, session['id'])
+    session['line_items'] = {'data': items, 'has_more': False}
+
+async def get_line_items(session: dict) -> List[Tuple[str, int]]:
+    """Returns (price id, quantity) for each line item of a checkout session."""
+    await fetch_line_items(session)
+    return [(item['price']['id'], item.get('quantity') or 1) for item in session['line_items']['data']]
+
+def quantities_by_account_type(line_items: List[Tuple[str, int]]) -> Dict[str, int]:
+    """Sums line item quantities per account_type; unknown prices are an error, not a guess."""
+    mapping = price_account_types()
+    quantities: Counter = Counter()
+    for price_id, quantity in line_items:
+        account_type = mapping.get(price_id)
+        if account_type not in ACCOUNT_TYPES:
+            raise ValueError(f"Price {price_id} is not mapped to a known account type")
+        quantities[account_type] += quantity
+    return dict(quantities)
+
+async def allocate_order(order: Order, quantities: Dict[str, int], db: AsyncSession) -> List[CopilotAccount]:
+    """
+    Assigns ``quantities`` accounts to ``order`` with one batched claim, queues
+    a single credentials email for them and sets the order's status. Does not
+    commit.
+    """
+    # 一条语句原子领取并分配全部账号，并发的 webhook 不会拿到同一个账号；
+    # 开启预留模式时优先使用本进程预留的账号
+    assigned_accounts = await inventory_reservations.claim_accounts(
+        quantities, order.customer_email, order.id, db, commit=False
+    )
+
+    if assigned_accounts:
+        # 账号密码邮件与分配写在同一事务中，由后台任务发送和重试
+        db.add(EmailOutbox(
+            to_email=order.customer_email,
+            account_ids=[account.id for account in assigned_accounts],
+            order_id=order.id
+        ))
+        logger.info("已为客户 %s 排队发送订单 %s 的 %s 个账号密码邮件", order.customer_email, order.id, len(assigned_accounts))
+
+    order.status = "fulfilled"
+    order.fulfilled_at = datetime.utcnow()
+    assigned = Counter(account.account_type for account in assigned_accounts)
+    for account_type, quantity in quantities.items():
+        if assigned[account_type] < quantity:
+            order.status = "partially_fulfilled"
+            logger.error(
+                "%s 账号库存不足！订单: %s, 客户: %s, 需要 %s 个, 仅分配 %s 个",
+                account_type, order.id, order.customer_email, quantity, assigned[account_type]
+            )
+            # 应该发送缺货通知或退款
+    db.add(order)
+    return assigned_accounts
+
+@traced
+async def fulfill_checkout_session(session: dict, db: AsyncSession) -> Optional[Order]:
+    """
+    Records the order for a completed checkout session, assigns every account
+    bought in it with one batched claim and queues a single credentials email
+    for all of them. A session that already has an order is skipped. Returns
+    the new order, or None if none was created.
+    """
+    customer_email = (session.get('customer_details') or {}).get('email')
+
+    if not customer_email:
+        logger.error("Customer email not found in webhook event for session %s", session.get('id'))
+        raise ValueError("Customer email not found in webhook event.")
+
+    # 🔥 核心业务逻辑：按商品价格确定账号类型和数量
+    # 可能要请求 Stripe，必须在本事务的第一条 SQL 之前完成
+    quantities = quantities_by_account_type(await get_line_items(session))
+    if not quantities:
+        logger.error("Checkout session %s has no line items", session.get('id'))
+        return None
+
+    # stripe_session_id 唯一，并发重复处理时只有一个事务能提交
+    existing = (await db.exec(select(Order.id).where(Order.stripe_session_id == session['id']))).first()
+    if existing is not None:
+        logger.info("Checkout session %s already has order %s, skipping", session['id'], existing)
+        return None
+
+    order = Order(
+        stripe_session_id=session['id'],
+        customer_email=customer_email,
+        quantities=quantities,
+        amount_total=session.get('amount_total'),
+        currency=session.get('currency')
+    )
+    db.add(order)
+    await db.flush()
+
+    await allocate_order(order, quantities, db)
+    return order
+
+async def get_inventory_counts(db: AsyncSession):
+    """
+    Returns the number of available items per account type.
+    """
+    return await inventory_service.get_cached_inventory_counts(db)
 
 async def add_inventory_item(username: str, password: str, db: AsyncSession):
     """
     Adds a new item to the inventory.
     """
     await inventory_service.add_inventory_item(username=username, password=password, db=db)
+
+
+stripe_event_processor = StripeEventProcessor(
+    handler=process_stripe_event,
+    prepare=prepare_stripe_event,
+    workers=settings.STRIPE_EVENT_WORKERS,
+    max_attempts=settings.STRIPE_EVENT_MAX_ATTEMPTS,
+    lease_seconds=settings.STRIPE_EVENT_LEASE_SECONDS,
+    poll_interval=settings.STRIPE_EVENT_POLL_INTERVAL_SECONDS
+)
@@ -0,0 +1,184 @@
+import ipaddress
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Tuple
+from fastapi import Request
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.metrics import registry, traced
+from app.db.session import async_session_factory
+
+logger = logging.getLogger(__name__)
+
+requests_rejected_total = registry.counter(
+    "requests_rejected_total",
+    "Requests turned away by admission control before doing any work.",
+    ("limiter", "reason")
+)
+
+TRUSTED_PROXY_NETWORKS = [ipaddress.ip_network(network) for network in settings.TRUSTED_PROXY_NETWORKS]
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXY_NETWORKS)
+
+
+def client_ip(request: Request) -> str:
+    """
+    The address a request came from, for keying rate limits. X-Forwarded-For
+    is only believed as far as it was written by trusted proxies: starting
+    from the peer, hops are walked right to left and the first address that
+    is not a trusted proxy is the client. Anything further left was supplied
+    by the client itself.
+    """
+    peer = request.client.host if request.client else "unknown"
+    forwarded = [hop.strip() for header in request.headers.getlist("x-forwarded-for") for hop in header.split(",")]
+    hops = [peer] + [hop for hop in reversed(forwarded) if hop]
+    for hop in hops:
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[-1]
+
+
+class TokenBucketLimiter:
+    """
+    Per-process token buckets, one per key.
+
+    A bucket holds up to ``burst`` tokens and refills at ``rate`` tokens per
+    second; every request takes one. The refill is computed from the time of
+    the key's previous request, so a check is O(1) and needs no background
+    task. Buckets live in an LRU capped at ``max_keys``; an evicted key starts
+    over with a full bucket. Each worker process has its own buckets.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_keys: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def acquire(self, key: str) -> float:
+        """Takes a token for ``key``; returns 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        bucket = self._buckets.pop(key, None)
+        tokens = self.burst if bucket is None else min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / self.rate
+            requests_rejected_total.inc(limiter=self.name, reason="rate_limited")
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+# Refill and take a token in one statement. A denied request leaves the row
+# untouched (the WHERE fails and nothing is returned), so its refill keeps
+# accruing from the last allowed request. The database clock is used, so
+# workers on different hosts agree on elapsed time.
+TAKE_TOKEN_SQL = text("""
+    WITH params AS (
+        SELECT CAST(:burst AS double precision) AS burst,
+               CAST(:rate AS double precision) AS rate,
+               CAST(now() AT TIME ZONE 'utc' AS timestamp) AS now
+    )
+    INSERT INTO rate_limit_bucket AS b (key, tokens, updated_at)
+    SELECT :key, burst - 1, now FROM params
+    ON CONFLICT (key) DO UPDATE
+    SET tokens = (SELECT LEAST(burst, b.tokens + EXTRACT(EPOCH FROM now - b.updated_at) * rate) - 1 FROM params),
+        updated_at = EXCLUDED.updated_at
+    WHERE (SELECT LEAST(burst, b.tokens + EXTRACT(EPOCH FROM now - b.updated_at) * rate) FROM params) >= 1
+    RETURNING tokens
+""")
+
+# Buckets idle long enough to have refilled completely carry no state.
+DELETE_FULL_BUCKETS_SQL = text("""
+    DELETE FROM rate_limit_bucket
+    WHERE key LIKE :prefix AND updated_at < (now() AT TIME ZONE 'utc') - make_interval(secs => CAST(:full_after AS double precision))
+""")
+
+
+class PostgresTokenBucketLimiter:
+    """
+    Token buckets shared by every worker through the rate_limit_bucket table,
+    at the cost of one round trip per check. If the database cannot be
+    reached the request is allowed: the limiter must not take the chat down
+    with it.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, cleanup_interval: float = 300.0):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.cleanup_interval = cleanup_interval
+        self._last_cleanup = time.monotonic()
+
+    def __len__(self) -> int:
+        return 0
+
+    @traced
+    async def acquire(self, key: str) -> float:
+        params = {"key": f"{self.name}:{key}", "burst": float(self.burst), "rate": self.rate}
+        try:
+            async with async_session_factory() as db:
+                allowed = (await db.execute(TAKE_TOKEN_SQL, params)).first() is not None
+                if time.monotonic() - self._last_cleanup > self.cleanup_interval:
+                    self._last_cleanup = time.monotonic()
+                    await db.execute(
+                        DELETE_FULL_BUCKETS_SQL,
+                        {"prefix": f"{self.name}:%", "full_after": self.burst / self.rate}
+                    )
+                await db.commit()
+        except Exception as e:
+            logger.warning("Shared rate limiter %s unavailable, allowing request: %s", self.name, e)
+            return 0.0
+        if allowed:
+            return 0.0
+        requests_rejected_total.inc(limiter=self.name, reason="rate_limited")
+        return 1 / self.rate
+
+
+def make_limiter(name: str, backend: str, per_minute: float, burst: int, max_keys: int):
+    if backend == "postgres":
+        return PostgresTokenBucketLimiter(name, rate=per_minute / 60, burst=burst)
+    return TokenBucketLimiter(name, rate=per_minute / 60, burst=burst, max_keys=max_keys)
+
+
+class LoadShedder:
+    """
+    Caps the requests in progress. Past ``max_pending`` new requests are
+    turned away at once instead of queueing, so the ones already admitted
+    keep their latency.
+    """
+
+    def __init__(self, name: str, max_pending: int):
+        self.name = name
+        self.max_pending = max_pending
+        self.pending = 0
+
+    def overloaded(self) -> bool:
+        if self.pending >= self.max_pending:
+            requests_rejected_total.inc(limiter=self.name, reason="overloaded")
+            return True
+        return False
+
+    @contextmanager
+    def hold(self):
+        """Counts an admitted request as pending until the block exits."""
+        self.pending += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
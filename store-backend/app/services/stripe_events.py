@@ -0,0 +1,137 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.core.metrics import traced
+from app.db.session import async_session_factory
+from app.models.stripe_event import StripeEvent
+from .background import PollingWorker, backoff_delay
+from .email_outbox import email_outbox_dispatcher
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[dict, AsyncSession], Awaitable[None]]
+EventPreparer = Callable[[dict], Awaitable[None]]
+
+
+class StripeEventProcessor(PollingWorker):
+    """
+    Worker pool that processes webhook events stored in the stripe_event table.
+
+    Each worker leases one due event at a time (SKIP LOCKED, pushing
+    ``next_attempt_at`` out by ``lease_seconds``) and commits the lease. The
+    optional ``prepare`` hook then runs with no transaction or connection held,
+    for network calls such as fetching Stripe line items. Only after that does
+    the worker flip the event to ``processed`` and run the handler in one
+    transaction. An event whose
+    lease expired mid-flight may be picked up twice, but only one transaction
+    can move it out of ``pending``, so it is never fulfilled twice. Failures
+    roll back and are retried with exponential backoff up to ``max_attempts``.
+    """
+
+    name = "stripe-event-processor"
+
+    def __init__(
+        self,
+        handler: EventHandler,
+        workers: int,
+        max_attempts: int,
+        lease_seconds: float,
+        poll_interval: float,
+        prepare: Optional[EventPreparer] = None
+    ):
+        super().__init__(batch_size=1, poll_interval=poll_interval, workers=workers)
+        self.handler = handler
+        self.prepare = prepare
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+
+    async def _lease_next(self, db: AsyncSession) -> Optional[StripeEvent]:
+        now = datetime.utcnow()
+        due = (
+            select(StripeEvent.id)
+            .where(StripeEvent.status == "pending", StripeEvent.next_attempt_at <= now)
+            .order_by(StripeEvent.next_attempt_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        statement = (
+            update(StripeEvent)
+            .where(StripeEvent.id == due)
+            .values(
+                attempts=StripeEvent.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=self.lease_seconds)
+            )
+            .returning(StripeEvent)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.exec(statement)
+        event = result.scalars().first()
+        await db.commit()
+        return event
+
+    async def _mark_processed(self, event_id: str, db: AsyncSession) -> bool:
+        statement = (
+            update(StripeEvent)
+            .where(StripeEvent.id == event_id, StripeEvent.status == "pending")
+            .values(status="processed", processed_at=datetime.utcnow(), last_error=None)
+            .returning(StripeEvent.id)
+        )
+        result = await db.exec(statement)
+        return result.first() is not None
+
+    async def _record_failure(self, event_id: str, attempts: int, error: str, db: AsyncSession):
+        values = {"last_error": error}
+        if attempts >= self.max_attempts:
+            values["status"] = "failed"
+            logger.error(
+                "Stripe event %s failed after %s attempts, needs manual handling: %s",
+                event_id, attempts, error
+            )
+        else:
+            delay = backoff_delay(
+                attempts,
+                settings.STRIPE_EVENT_BACKOFF_BASE_SECONDS,
+                settings.STRIPE_EVENT_BACKOFF_MAX_SECONDS
+            )
+            values["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=delay)
+            logger.warning("Stripe event %s attempt %s failed, retrying: %s", event_id, attempts, error)
+        await db.exec(
+            update(StripeEvent)
+            .where(StripeEvent.id == event_id, StripeEvent.status == "pending")
+            .values(**values)
+        )
+        await db.commit()
+
+    @traced
+    async def run_once(self) -> int:
+        """Leases and processes one event; returns 1 if there was one, 0 otherwise."""
+        async with async_session_factory() as db:
+            event = await self._lease_next(db)
+            if event is None:
+                return 0
+            # A rollback expires the leased row, so keep what is needed afterwards
+            event_id, event_type, attempts = event.id, event.type, event.attempts
+
+            try:
+                payload = json.loads(event.payload)
+                if self.prepare is not None:
+                    # The lease is committed, so the session holds no connection here
+                    await self.prepare(payload)
+                if not await self._mark_processed(event_id, db):
+                    await db.rollback()
+                    return 1
+                await self.handler(payload, db)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                await self._record_failure(event_id, attempts, str(e) or e.__class__.__name__, db)
+                return 1
+
+        logger.info("Processed Stripe event %s (%s)", event_id, event_type)
+        email_outbox_dispatcher.wake()
+        return 1
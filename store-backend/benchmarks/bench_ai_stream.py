@@ -0,0 +1,79 @@
+"""
+Time-to-first-byte benchmark for the AI chat endpoints, using a fake Gemini model.
+
+Runs ``--chats`` concurrent conversations against /api/v1/ai/chat and
+/api/v1/ai/chat/stream and reports time to first byte and total time for each.
+While they run, /health is probed to show that other requests keep flowing.
+
+    python -m benchmarks.bench_ai_stream --chats 50 --first-token-ms 300 --token-ms 20
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.main import app
+from app.services import ai_service
+from benchmarks.common import lift_chat_limits, percentile, serve_app
+from benchmarks.fakes import FakeGeminiModel
+
+
+async def timed_chat(client, path, prompt):
+    started = time.perf_counter()
+    first_byte = None
+    async with client.stream("POST", path, json={"prompt": prompt}) as response:
+        async for _ in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+    return first_byte, time.perf_counter() - started
+
+
+async def probe_health(client, stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/health")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+
+
+async def run_endpoint(client, path, chats):
+    stop, health = asyncio.Event(), []
+    prober = asyncio.create_task(probe_health(client, stop, health))
+    results = await asyncio.gather(*(
+        # Prompts differ per route, or the second route would be served from the answer cache
+        timed_chat(client, path, f"question {i} for {path}") for i in range(chats)
+    ))
+    stop.set()
+    await prober
+    ttfb = [first for first, _ in results]
+    total = [whole for _, whole in results]
+    print(f"{path}")
+    print(f"  ttfb p50/p99:    {percentile(ttfb, 50) * 1000:.0f}ms / {percentile(ttfb, 99) * 1000:.0f}ms")
+    print(f"  total p50/p99:   {percentile(total, 50) * 1000:.0f}ms / {percentile(total, 99) * 1000:.0f}ms")
+    print(f"  /health p99:     {percentile(health, 99) * 1000:.1f}ms ({len(health)} probes)")
+
+
+async def run(args):
+    ai_service.set_model(FakeGeminiModel(
+        tokens=args.tokens,
+        first_token_latency=args.first_token_ms / 1000,
+        token_interval=args.token_ms / 1000,
+    ))
+    lift_chat_limits(args.chats)
+    async with serve_app(app) as base_url, httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await run_endpoint(client, "/api/v1/ai/chat", args.chats)
+        await run_endpoint(client, "/api/v1/ai/chat/stream", args.chats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Concurrency benchmark for account allocation.
+
+Seeds a batch of accounts under a throwaway account_type, then lets N parallel
+claimers drain it one account at a time through
+``InventoryService.claim_accounts`` (or, with ``--legacy``, the old
+select-then-update allocation kept here as the baseline) and reports
+allocations/sec, claim latency and any double-assignments.
+
+``--types N`` spreads the accounts over N account types and makes every claim
+an order for one account of each type, the multi-type checkout path.
+``--assigned-rows M`` first fills the table with M already-assigned rows, as a
+long-running store would have; a claim that scans the whole table instead of
+the available-rows index slows down with M.
+
+Requires a real PostgreSQL database (SKIP LOCKED is a no-op elsewhere):
+
+    python -m benchmarks.bench_allocation --claimers 64 --accounts 5000
+    python -m benchmarks.bench_allocation --types 3 --assigned-rows 200000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from collections import Counter
+
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.inventory import CopilotAccount
+from app.services.inventory_service import assignment_values, inventory_service
+from benchmarks.common import percentile
+
+
+async def legacy_claim(account_type, customer, db):
+    """The allocation the service used before claim_accounts: read a row, then assign it."""
+    account = (await db.exec(
+        select(CopilotAccount).where(
+            CopilotAccount.account_type == account_type,
+            CopilotAccount.status == "available",
+        ).limit(1)
+    )).first()
+    if account is None:
+        return None
+    for field, value in assignment_values(customer, None).items():
+        setattr(account, field, value)
+    db.add(account)
+    await db.commit()
+    return account
+
+
+async def claim_loop(engine, account_types, claimer_id, legacy, claimed, latencies):
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        while True:
+            started = time.perf_counter()
+            customer = f"claimer-{claimer_id}@bench.local"
+            if legacy:
+                accounts = [
+                    account for account in [
+                        await legacy_claim(account_type, customer, db) for account_type in account_types
+                    ] if account is not None
+                ]
+            else:
+                accounts = await inventory_service.claim_accounts(
+                    {account_type: 1 for account_type in account_types}, customer, None, db
+                )
+            if not accounts:
+                return
+            latencies.append(time.perf_counter() - started)
+            claimed.extend((account.id, claimer_id) for account in accounts)
+
+
+async def run(args):
+    engine = create_async_engine(
+        args.database_url, pool_size=args.claimers, max_overflow=0
+    )
+    run_id = uuid.uuid4().hex[:8]
+    account_types = [f"bench-{run_id}-{n}" for n in range(args.types)]
+    history_type = f"bench-{run_id}-assigned"
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine) as db:
+        db.add_all(
+            CopilotAccount(
+                email=f"{account_types[i % args.types]}-{i}@bench.local",
+                password="bench",
+                account_type=account_types[i % args.types],
+            )
+            for i in range(args.accounts)
+        )
+        await db.commit()
+        for start in range(0, args.assigned_rows, 10000):
+            db.add_all(
+                CopilotAccount(
+                    email=f"{history_type}-{i}@bench.local",
+                    password="bench",
+                    account_type=history_type,
+                    status="assigned",
+                )
+                for i in range(start, min(start + 10000, args.assigned_rows))
+            )
+            await db.commit()
+        await db.exec(text("ANALYZE copilot_account"))
+        await db.commit()
+
+    claimed, latencies = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        claim_loop(engine, account_types, i, args.legacy, claimed, latencies)
+        for i in range(args.claimers)
+    ))
+    elapsed = time.perf_counter() - started
+
+    async with AsyncSession(engine) as db:
+        assigned = (await db.exec(
+            select(func.count()).select_from(CopilotAccount).where(
+                CopilotAccount.account_type.in_(account_types),
+                CopilotAccount.status == "assigned",
+            )
+        )).one()
+        await db.exec(delete(CopilotAccount).where(
+            CopilotAccount.account_type.in_(account_types + [history_type])
+        ))
+        await db.commit()
+    await engine.dispose()
+
+    per_account = Counter(account_id for account_id, _ in claimed)
+    double_assigned = sum(1 for hits in per_account.values() if hits > 1)
+
+    print(f"mode:              {'legacy select+update' if args.legacy else 'claim (SKIP LOCKED)'}")
+    print(f"claimers:          {args.claimers}")
+    print(f"account types:     {args.types}")
+    print(f"accounts seeded:   {args.accounts} (+{args.assigned_rows} assigned)")
+    print(f"accounts claimed:  {len(claimed)}")
+    print(f"rows assigned:     {assigned}")
+    print(f"double-assigned:   {double_assigned}")
+    print(f"elapsed:           {elapsed:.3f}s")
+    print(f"allocations/sec:   {len(claimed) / elapsed:.1f}")
+    print(f"latency p50/p99:   {percentile(latencies, 50) * 1000:.2f}ms / "
+          f"{percentile(latencies, 99) * 1000:.2f}ms")
+    return 1 if double_assigned or len(claimed) != assigned else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--claimers", type=int, default=64)
+    parser.add_argument("--accounts", type=int, default=5000)
+    parser.add_argument("--types", type=int, default=1,
+                        help="account types per claim; >1 exercises the multi-type checkout")
+    parser.add_argument("--assigned-rows", type=int, default=0,
+                        help="already-assigned rows to seed before the run")
+    parser.add_argument("--legacy", action="store_true",
+                        help="use the old select-then-update allocation instead of claim_accounts")
+    raise SystemExit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Gmail delivery benchmark against a local fake Gmail API.
+
+Starts a threaded HTTP server that answers ``messages.send`` after a fixed
+delay, points ``email_service`` at it through GMAIL_API_ENDPOINT, and fires
+concurrent sends while a ticker task measures event-loop lag. ``--inline``
+runs the blocking send directly on the loop, like the old implementation.
+
+    python -m benchmarks.bench_email --sends 200 --concurrency 50 --latency-ms 50
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.services import email_service
+from benchmarks.common import percentile
+from benchmarks.fakes import start_fake_gmail, use_fake_gmail_credentials
+
+
+async def measure_loop_lag(stop, lags, interval=0.01):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(args):
+    server = start_fake_gmail(args.latency_ms / 1000)
+    settings.GMAIL_API_ENDPOINT = f"http://127.0.0.1:{server.server_port}/"
+    use_fake_gmail_credentials()
+
+    if args.inline:
+        async def send(i):
+            service = email_service.get_gmail_service()
+            message = {"raw": "ZmFrZQ=="}
+            return service.users().messages().send(userId="me", body=message).execute()
+    else:
+        async def send(i):
+            return await email_service.send_account_credentials(
+                to_email=f"customer-{i}@bench.local",
+                account_email=f"account-{i}@bench.local",
+                account_password="bench",
+                order_id=i,
+            )
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def timed_send(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await send(i)
+            latencies.append(time.perf_counter() - started)
+
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(measure_loop_lag(stop, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(timed_send(i) for i in range(args.sends)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    server.shutdown()
+
+    print(f"mode:             {'inline (blocking)' if args.inline else 'executor'}")
+    print(f"sends:            {args.sends} @ concurrency {args.concurrency}")
+    print(f"fake latency:     {args.latency_ms}ms")
+    print(f"sends/sec:        {args.sends / elapsed:.1f}")
+    print(f"send p50/p99:     {percentile(latencies, 50) * 1000:.1f}ms / "
+          f"{percentile(latencies, 99) * 1000:.1f}ms")
+    print(f"loop lag p99/max: {percentile(lags, 99) * 1000:.1f}ms / "
+          f"{max(lags, default=0) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sends", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--inline", action="store_true",
+                        help="call the blocking Gmail client on the event loop")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+    email_service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
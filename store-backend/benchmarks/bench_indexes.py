@@ -0,0 +1,164 @@
+"""
+Allocation and count query timings on a large copilot_account table.
+
+Bulk-seeds ``--rows`` accounts (1M by default) with generate_series. Most of
+them are assigned/expired history, and ``--available-pct`` percent are
+available, spread over the account types. It then times the account claim
+statement, the per-type inventory count and the expiry scan, and prints each
+query plan. Every claim runs in a savepoint that is rolled back, so the
+available pool stays the same size throughout. ``--without-indexes`` drops the
+allocation indexes inside the measuring transaction (rolled back at the end)
+to show the sequential-scan baseline.
+
+Requires a scratch PostgreSQL database migrated to head (``alembic upgrade head``):
+
+    python -m benchmarks.bench_indexes --rows 1000000 --iterations 200
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete, func, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.inventory import ACCOUNT_TYPES, STOCK_STATUSES, CopilotAccount
+from app.services.inventory_service import InventoryService
+from benchmarks.common import percentile
+
+ALLOCATION_INDEXES = ("ix_copilot_account_available_type", "ix_copilot_account_expires_at")
+
+SEED = text("""
+    INSERT INTO copilot_account
+        (email, password, account_type, status, assigned_to_email, assigned_at, expires_at, created_at)
+    SELECT
+        CAST(:prefix AS text) || g || '@bench.local',
+        'bench',
+        (CAST(:types AS text[]))[1 + g % cardinality(CAST(:types AS text[]))],
+        CASE
+            WHEN g % 10000 < :available_bp THEN 'available'
+            WHEN g % 3 = 0 THEN 'expired'
+            ELSE 'assigned'
+        END,
+        CASE WHEN g % 10000 < :available_bp THEN NULL ELSE 'customer-' || g || '@bench.local' END,
+        CASE WHEN g % 10000 < :available_bp THEN NULL ELSE now() - (g % 700) * interval '1 day' END,
+        CASE WHEN g % 10000 < :available_bp THEN NULL ELSE now() + (365 - g % 700) * interval '1 day' END,
+        now()
+    FROM generate_series(1, :rows) AS g
+""")
+
+
+async def explain(db, statement):
+    result = await db.exec(text("EXPLAIN " + str(statement.compile(
+        dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}
+    ))))
+    return [row[0] for row in result.all()]
+
+
+async def time_query(label, iterations, run_once, latencies):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await run_once()
+        samples.append(time.perf_counter() - started)
+    latencies[label] = samples
+
+
+async def run(args):
+    engine = create_async_engine(args.database_url)
+    prefix = f"idx-{uuid.uuid4().hex[:8]}-"
+    types = list(ACCOUNT_TYPES)
+
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.execute(SEED, {
+            "prefix": prefix,
+            "types": types,
+            "available_bp": int(args.available_pct * 100),
+            "rows": args.rows,
+        })
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE copilot_account"))
+    print(f"seeded {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+    latencies = {}
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            if args.without_indexes:
+                for name in ALLOCATION_INDEXES:
+                    await db.exec(text(f"DROP INDEX IF EXISTS {name}"))
+
+            async def claim():
+                savepoint = await db.begin_nested()
+                await InventoryService.claim_accounts({types[0]: 1}, "bench@bench.local", None, db, commit=False)
+                await savepoint.rollback()
+
+            async def count():
+                await InventoryService.get_inventory_counts_by_type(db)
+
+            expiring = (
+                select(func.count())
+                .select_from(CopilotAccount)
+                .where(CopilotAccount.status == "assigned", CopilotAccount.expires_at < datetime.utcnow())
+            )
+
+            async def expiry_scan():
+                await db.exec(expiring)
+
+            claim_candidate = (
+                select(CopilotAccount.id)
+                .where(CopilotAccount.account_type == types[0], CopilotAccount.status == "available")
+                .order_by(CopilotAccount.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            counts = (
+                select(CopilotAccount.account_type, func.count())
+                .where(CopilotAccount.status.in_(STOCK_STATUSES))
+                .group_by(CopilotAccount.account_type)
+            )
+            plans = {
+                "claim": await explain(db, claim_candidate),
+                "count": await explain(db, counts),
+                "expiry_scan": await explain(db, expiring),
+            }
+
+            await time_query("claim", args.iterations, claim, latencies)
+            await time_query("count", args.iterations, count, latencies)
+            await time_query("expiry_scan", max(args.iterations // 10, 1), expiry_scan, latencies)
+            # Also undoes the DROP INDEX statements in --without-indexes mode.
+            await db.rollback()
+    finally:
+        async with AsyncSession(engine) as db:
+            await db.exec(delete(CopilotAccount).where(CopilotAccount.email.like(f"{prefix}%")))
+            await db.commit()
+        await engine.dispose()
+
+    print(f"mode:         {'without allocation indexes' if args.without_indexes else 'with allocation indexes'}")
+    print(f"rows:         {args.rows} ({args.available_pct}% available)")
+    for label, samples in latencies.items():
+        print(f"\n{label}: n={len(samples)}  p50/p95/max {percentile(samples, 50) * 1000:.2f}ms / "
+              f"{percentile(samples, 95) * 1000:.2f}ms / {max(samples) * 1000:.2f}ms")
+        for line in plans[label]:
+            print(f"    {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--available-pct", type=float, default=2.0,
+                        help="percentage of seeded rows left available")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--without-indexes", action="store_true",
+                        help="drop the allocation indexes for the measurement (rolled back afterwards)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
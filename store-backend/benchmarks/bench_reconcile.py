@@ -0,0 +1,125 @@
+"""
+Stripe reconciliation benchmark against a local fake Stripe API.
+
+Serves ``--sessions`` completed checkout sessions spread over ``--days`` days
+from a fake Stripe API with ``--latency-ms`` per list call. It seeds orders
+for all of them except ``--gaps`` missing and ``--short`` partially fulfilled
+ones, plus enough available accounts to close every gap. It then runs
+``app.commands.reconcile_stripe`` and reports wall time, Stripe calls and
+whether every gap was closed.
+
+Seeds and then deletes its own rows, so point it at a scratch PostgreSQL database:
+
+    python -m benchmarks.bench_reconcile --sessions 30000 --gaps 200 --short 50
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+from sqlalchemy import delete
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.commands import reconcile_stripe
+from app.core.config import settings
+from app.db.session import engine, init_db
+from app.models.inventory import CopilotAccount
+from app.models.order import Order
+from app.models.outbox import EmailOutbox
+from benchmarks.fakes import FakeStripeHandler, fake_checkout_session, start_fake_stripe
+
+
+def build_sessions(run_id, args):
+    now = int(time.time()) - 3600
+    step = args.days * 86400 / args.sessions
+    return [
+        fake_checkout_session(
+            f"cs_{run_id}_{i:08d}",
+            now - int(i * step),
+            settings.STRIPE_PRICE_ID,
+            f"customer-{i}@bench.local",
+            payment_status="unpaid" if i % 50 == 49 else "paid",
+        )
+        for i in range(args.sessions)
+    ]
+
+
+async def seed(run_id, sessions, args):
+    paid = [session for session in sessions if session["payment_status"] == "paid"]
+    random.shuffle(paid)
+    gaps, short = paid[:args.gaps], paid[args.gaps:args.gaps + args.short]
+    gap_ids = {session["id"] for session in gaps}
+    short_ids = {session["id"] for session in short}
+    async with AsyncSession(engine) as db:
+        db.add_all(
+            Order(
+                stripe_session_id=session["id"],
+                customer_email=session["customer_details"]["email"],
+                quantities={"education": 1},
+                status="partially_fulfilled" if session["id"] in short_ids else "fulfilled",
+            )
+            for session in paid if session["id"] not in gap_ids
+        )
+        db.add_all(
+            CopilotAccount(email=f"{run_id}-{i}@bench.local", password="bench", account_type="education")
+            for i in range(args.gaps + args.short)
+        )
+        await db.commit()
+    return [session["id"] for session in gaps + short]
+
+
+async def cleanup(run_id):
+    async with AsyncSession(engine) as db:
+        orders = select(Order.id).where(Order.stripe_session_id.like(f"cs_{run_id}_%"))
+        await db.exec(delete(EmailOutbox).where(EmailOutbox.order_id.in_(orders)))
+        await db.exec(delete(CopilotAccount).where(CopilotAccount.email.like(f"{run_id}-%")))
+        await db.exec(delete(Order).where(Order.stripe_session_id.like(f"cs_{run_id}_%")))
+        await db.commit()
+
+
+async def run(args):
+    run_id = uuid.uuid4().hex[:8]
+    sessions = build_sessions(run_id, args)
+    server = start_fake_stripe(sessions, args.latency_ms / 1000)
+    settings.STRIPE_API_BASE = f"http://127.0.0.1:{server.server_port}"
+
+    await init_db()
+    try:
+        gap_ids = await seed(run_id, sessions, args)
+        started = time.perf_counter()
+        report = await reconcile_stripe.reconcile(args.days + 1, settle_minutes=0)
+        elapsed = time.perf_counter() - started
+
+        async with AsyncSession(engine) as db:
+            closed = (await db.exec(
+                select(func.count()).select_from(Order).where(
+                    Order.stripe_session_id.in_(gap_ids), Order.status == "fulfilled"
+                )
+            )).one()
+    finally:
+        await cleanup(run_id)
+        await engine.dispose()
+        server.shutdown()
+
+    print(f"sessions listed:   {report.sessions} in {report.pages} pages ({FakeStripeHandler.requests} Stripe calls)")
+    print(f"already in order:  {report.in_order}, unpaid: {report.unpaid}")
+    print(f"gaps found:        {report.missing} missing, {report.short} short")
+    print(f"gaps closed:       {closed}/{len(gap_ids)} (failed: {report.failed})")
+    print(f"elapsed:           {elapsed:.2f}s ({report.sessions / elapsed:.0f} sessions/s)")
+    return 0 if closed == len(gap_ids) and not report.failed else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=30000)
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--gaps", type=int, default=200)
+    parser.add_argument("--short", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=300, help="fake Stripe latency per list call")
+    raise SystemExit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Per-response serialization cost of the JSON API, before and after typed
+response models with ORJSONResponse.
+
+"before" is what FastAPI did for a handler returning a plain dict with no
+response_model: jsonable_encoder, then JSONResponse (json.dumps). "after" is
+the current path: validation and serialization against the route's
+response_model, then ORJSONResponse. The CSV case times one export batch
+(EXPORT_BATCH_SIZE rows) through the CSV writer with json.dumps and with
+orjson for the JSON columns. Payloads are synthetic; no database or server is
+involved.
+
+    python -m benchmarks.bench_serialization --rows 500 --iterations 200
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.schemas.admin import AccountPage, OrderPage
+from app.schemas.ai import AIChatResponse
+from app.schemas.payments import InventoryCount
+from app.services import admin_service
+
+
+def order_rows(n):
+    now = datetime.utcnow()
+    return [
+        {
+            "id": n - i,
+            "stripe_session_id": f"cs_test_{i:024d}",
+            "customer_email": f"customer{i}@example.com",
+            "status": random.choice(("fulfilled", "partially_fulfilled")),
+            "quantities": {"education": random.randint(1, 5), "pro": random.randint(0, 2)},
+            "amount_total": random.randint(500, 50000),
+            "currency": "usd",
+            "created_at": now - timedelta(minutes=i),
+            "fulfilled_at": now - timedelta(minutes=i, seconds=-3),
+        }
+        for i in range(n)
+    ]
+
+
+def account_rows(n):
+    now = datetime.utcnow()
+    return [
+        {
+            "id": n - i,
+            "email": f"account{i}@example.edu",
+            "account_type": random.choice(("education", "pro", "business")),
+            "status": "assigned",
+            "assigned_to_email": f"customer{i}@example.com",
+            "assigned_at": now - timedelta(hours=i),
+            "order_id": i,
+            "expires_at": now + timedelta(days=30),
+            "created_at": now - timedelta(days=1, hours=i),
+        }
+        for i in range(n)
+    ]
+
+
+def isoformatted(rows):
+    """Rows as the handlers used to return them, with datetimes already turned into strings."""
+    return [{key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()} for row in rows]
+
+
+def payloads(rows):
+    orders, accounts = order_rows(rows), account_rows(rows)
+    return [
+        ("inventory", InventoryCount,
+         {"inventory_count": 1234, "by_type": {"education": 1000, "pro": 200, "business": 34}}, None),
+        ("chat", AIChatResponse,
+         {"message": "您好！关于 Copilot 教育版账号的常见问题如下。" * 40, "session_id": "0" * 32}, None),
+        (f"orders page ({rows} rows)", OrderPage,
+         {"items": orders, "next_cursor": "abc"}, {"items": isoformatted(orders), "next_cursor": "abc"}),
+        (f"accounts page ({rows} rows)", AccountPage,
+         {"items": accounts, "next_cursor": "abc"}, {"items": isoformatted(accounts), "next_cursor": "abc"}),
+    ]
+
+
+def render_before(payload):
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+async def render_after(field, payload):
+    return ORJSONResponse(await serialize_response(field=field, response_content=payload)).body
+
+
+def csv_batch(rows, encode):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([encode(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def csv_value_before(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+def per_call(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+async def per_call_async(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await fn()
+    return (time.perf_counter() - started) / iterations
+
+
+def report(name, before, after, size):
+    print(f"{name:<28} {before * 1e6:>10.1f}us {after * 1e6:>10.1f}us {before / after:>7.2f}x {size / 1024:>8.1f}KiB")
+
+
+async def run(args):
+    random.seed(0)
+    print(f"{'payload':<28} {'before':>12} {'after':>12} {'speedup':>8} {'size':>11}")
+    for name, model, payload, old_payload in payloads(args.rows):
+        old_payload = old_payload or payload
+        field = create_response_field(name="response", type_=model)
+        # Same document either way, modulo whitespace
+        assert json.loads(render_before(old_payload)) == json.loads(await render_after(field, payload))
+        render_before(old_payload)
+        await render_after(field, payload)
+        before = per_call(lambda: render_before(old_payload), args.iterations)
+        after = await per_call_async(lambda: render_after(field, payload), args.iterations)
+        report(name, before, after, len(await render_after(field, payload)))
+
+    rows = [tuple(row.values()) for row in order_rows(admin_service.EXPORT_BATCH_SIZE)]
+    before = per_call(lambda: csv_batch(rows, csv_value_before), args.iterations)
+    after = per_call(lambda: csv_batch(rows, admin_service._csv_value), args.iterations)
+    report(f"orders CSV batch ({len(rows)} rows)", before, after, len(csv_batch(rows, admin_service._csv_value)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500, help="rows per admin list page")
+    parser.add_argument("--iterations", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Cold-start benchmark: import time of ``app.main`` and time to first healthy /health.
+
+Each run uses a fresh interpreter, the way a worker respawn does. The import
+runs measure ``import app.main`` on its own and list any heavy SDKs it pulled
+in (they should all load lazily). The serve runs start uvicorn as a subprocess
+and poll /health until it answers 200. Needs the usual settings in the
+environment or .env. The database does not have to be reachable, because
+startup no longer touches it.
+
+``--eager`` imports the SDKs up front as well, inside the timed region, which
+is what importing ``app.main`` cost before they were made lazy. Run it both
+ways to compare on the same tree:
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --runs 5 --eager
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+HEAVY_MODULES = ("stripe", "google.generativeai", "googleapiclient.discovery", "google.auth", "grpc")
+
+# What app.main used to import at module level
+EAGER_IMPORTS = "import stripe, google.generativeai, googleapiclient.discovery, google.oauth2.credentials"
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+{{eager}}
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(eager):
+    probe = IMPORT_PROBE.replace("{eager}", EAGER_IMPORTS if eager else "")
+    output = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_serve(timeout, eager):
+    port = free_port()
+    launcher = ["-c", f"{EAGER_IMPORTS}; import uvicorn; uvicorn.main()"] if eager else ["-m", "uvicorn"]
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, *launcher, "app.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode} before becoming healthy")
+            time.sleep(0.01)
+        raise TimeoutError(f"/health was not healthy within {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def summarize(label, samples):
+    print(f"{label:<22} median {statistics.median(samples) * 1000:8.1f}ms   "
+          f"min {min(samples) * 1000:8.1f}ms   max {max(samples) * 1000:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--eager", action="store_true", help="also import the SDKs up front, as before they were lazy")
+    args = parser.parse_args()
+
+    os.environ.setdefault("PYTHONDONTWRITEBYTECODE", "1")
+    imports = [measure_import(args.eager) for _ in range(args.runs)]
+    serves = [measure_serve(args.timeout, args.eager) for _ in range(args.runs)]
+
+    summarize("import app.main", [run["seconds"] for run in imports])
+    summarize("first healthy /health", serves)
+    heavy = sorted({module for run in imports for module in run["heavy"]})
+    print(f"heavy SDKs at import:  {', '.join(heavy) if heavy else 'none'}")
+    raise SystemExit(1 if heavy and not args.eager else 0)
+
+
+if __name__ == "__main__":
+    main()
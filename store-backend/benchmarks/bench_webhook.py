@@ -0,0 +1,134 @@
+"""
+Replay/load benchmark for the Stripe webhook.
+
+Signs ``checkout.session.completed`` payloads locally with STRIPE_WEBHOOK_SECRET,
+posts every event ``--deliveries`` times (simulating Stripe retries) at the
+given concurrency through the ASGI app, and reports ack latency. It then waits
+for the background processor to drain the events and checks that each event
+assigned exactly one account.
+
+Seeds ``education`` accounts, so point it at a scratch PostgreSQL database:
+
+    python -m benchmarks.bench_webhook --events 500 --deliveries 3 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import Counter
+
+import httpx
+from sqlalchemy import delete
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db.session import engine
+from app.main import app
+from app.models.inventory import CopilotAccount
+from app.models.outbox import EmailOutbox
+from app.models.stripe_event import StripeEvent
+from app.services.payment_service import stripe_event_processor
+from benchmarks.common import percentile, sign_stripe_payload
+
+
+def build_event(run_id, i):
+    return json.dumps({
+        "id": f"evt_bench_{run_id}_{i}",
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {"object": {
+            "id": f"cs_bench_{run_id}_{i}",
+            "object": "checkout.session",
+            "customer_details": {"email": f"customer-{run_id}-{i}@bench.local"},
+            # Embedded line items spare the processor a Stripe API call.
+            "line_items": {"object": "list", "has_more": False, "data": [
+                {"price": {"id": settings.STRIPE_PRICE_ID}, "quantity": 1},
+            ]},
+        }},
+    })
+
+
+async def run(args):
+    run_id = uuid.uuid4().hex[:8]
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine) as db:
+        db.add_all(
+            CopilotAccount(email=f"bench-{run_id}-{i}@bench.local", password="bench")
+            for i in range(args.events)
+        )
+        await db.commit()
+
+    deliveries = [i for i in range(args.events) for _ in range(args.deliveries)]
+    payloads = {i: build_event(run_id, i) for i in range(args.events)}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, statuses = [], Counter()
+
+    stripe_event_processor.start()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def deliver(i):
+            payload = payloads[i]
+            headers = {"stripe-signature": sign_stripe_payload(payload, settings.STRIPE_WEBHOOK_SECRET)}
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/v1/payments/webhook", content=payload, headers=headers)
+                latencies.append(time.perf_counter() - started)
+            statuses[response.json().get("status", response.status_code)] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(deliver(i) for i in deliveries))
+        ack_elapsed = time.perf_counter() - started
+
+    event_prefix = f"evt_bench_{run_id}_%"
+    customer_pattern = f"customer-{run_id}-%"
+    async with AsyncSession(engine) as db:
+        while True:
+            pending = (await db.exec(
+                select(StripeEvent.id).where(StripeEvent.id.like(event_prefix), StripeEvent.status == "pending")
+            )).all()
+            if not pending or time.perf_counter() - started > args.timeout:
+                break
+            await asyncio.sleep(0.2)
+        drain_elapsed = time.perf_counter() - started
+        await stripe_event_processor.stop()
+
+        stored = len((await db.exec(select(StripeEvent.id).where(StripeEvent.id.like(event_prefix)))).all())
+        assignments = Counter((await db.exec(
+            select(CopilotAccount.assigned_to_email).where(CopilotAccount.assigned_to_email.like(customer_pattern))
+        )).all())
+
+        await db.exec(delete(EmailOutbox).where(EmailOutbox.to_email.like(customer_pattern)))
+        await db.exec(delete(StripeEvent).where(StripeEvent.id.like(event_prefix)))
+        await db.exec(delete(CopilotAccount).where(CopilotAccount.email.like(f"bench-{run_id}-%")))
+        await db.commit()
+    await engine.dispose()
+
+    double_assigned = sum(1 for hits in assignments.values() if hits > 1)
+    print(f"events x deliveries:  {args.events} x {args.deliveries} @ concurrency {args.concurrency}")
+    print(f"responses:            {dict(statuses)}")
+    print(f"acks/sec:             {len(deliveries) / ack_elapsed:.1f}")
+    print(f"ack p50/p95/p99:      {percentile(latencies, 50) * 1000:.2f}ms / "
+          f"{percentile(latencies, 95) * 1000:.2f}ms / {percentile(latencies, 99) * 1000:.2f}ms")
+    print(f"events stored:        {stored}")
+    print(f"customers fulfilled:  {len(assignments)}")
+    print(f"double-assigned:      {double_assigned}")
+    print(f"drained in:           {drain_elapsed:.2f}s" + (" (still pending)" if pending else ""))
+    return 1 if double_assigned or stored != args.events or pending else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--deliveries", type=int, default=3,
+                        help="times each event is delivered (Stripe retries)")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=120,
+                        help="seconds to wait for the processor to drain")
+    raise SystemExit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
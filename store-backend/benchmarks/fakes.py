@@ -0,0 +1,169 @@
+"""Local stand-ins for the external services, used by the benchmarks and tests."""
+import asyncio
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from google.oauth2.credentials import Credentials
+
+from app.services import email_service
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStream:
+    def __init__(self, tokens, first_token_latency, token_interval):
+        self._tokens = tokens
+        self._first_token_latency = first_token_latency
+        self._token_interval = token_interval
+        self.text = "".join(tokens)
+
+    async def __aiter__(self):
+        await asyncio.sleep(self._first_token_latency)
+        for i, token in enumerate(self._tokens):
+            if i:
+                await asyncio.sleep(self._token_interval)
+            yield FakeChunk(token)
+
+
+class FakeGeminiModel:
+    """
+    Mimics ``GenerativeModel.generate_content_async``: answers with ``tokens``
+    words after ``first_token_latency`` seconds, then one word every
+    ``token_interval`` seconds. Counts upstream calls in ``calls``.
+    """
+
+    def __init__(self, tokens=60, first_token_latency=0.3, token_interval=0.02):
+        self.tokens = tokens
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+        self.calls = 0
+
+    def _answer(self, contents):
+        return [f"word{i} " for i in range(self.tokens)]
+
+    async def generate_content_async(self, contents, stream=False, **kwargs):
+        self.calls += 1
+        tokens = self._answer(contents)
+        if stream:
+            return FakeStream(tokens, self.first_token_latency, self.token_interval)
+        await asyncio.sleep(self.first_token_latency + self.token_interval * (len(tokens) - 1))
+        return FakeChunk("".join(tokens))
+
+
+class FakeGmailHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.05
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        body = json.dumps({"id": uuid.uuid4().hex, "labelIds": ["SENT"]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_gmail(latency):
+    FakeGmailHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGmailHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def use_fake_gmail_credentials():
+    """Installs a pre-issued token so nothing talks to Google's OAuth endpoint."""
+    email_service._credentials = Credentials(
+        token="fake-token", expiry=datetime.utcnow() + timedelta(hours=1)
+    )
+
+
+def fake_checkout_session(session_id, created, price_id, email, quantity=1, payment_status="paid"):
+    return {
+        "id": session_id,
+        "object": "checkout.session",
+        "created": created,
+        "status": "complete",
+        "payment_status": payment_status,
+        "customer_details": {"email": email},
+        "amount_total": 1000 * quantity,
+        "currency": "usd",
+        "line_items": {
+            "object": "list",
+            "has_more": False,
+            "data": [{"id": f"li_{session_id}", "object": "item", "price": {"id": price_id, "object": "price"}, "quantity": quantity}],
+        },
+    }
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    """
+    Serves ``GET /v1/checkout/sessions`` over ``sessions`` (newest first) with
+    Stripe's list semantics: ``limit``, ``starting_after`` and ``created[gte]``
+    / ``created[lte]``. Line items are always embedded.
+    """
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.2
+    sessions = []
+    positions = {}
+    requests = 0
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != "/v1/checkout/sessions":
+            self._reply(404, {"error": {"type": "invalid_request_error", "message": f"Unknown path {url.path}"}})
+            return
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        limit = min(int(query.get("limit", 10)), 100)
+        gte = int(query.get("created[gte]", 0))
+        lte = int(query.get("created[lte]", 2 ** 63))
+        start = self.positions[query["starting_after"]] + 1 if "starting_after" in query else 0
+        page = []
+        index = start
+        while index < len(self.sessions) and len(page) < limit + 1:
+            session = self.sessions[index]
+            if session["created"] < gte:
+                break
+            if session["created"] <= lte:
+                page.append(session)
+            index += 1
+        time.sleep(self.latency)
+        type(self).requests += 1
+        self._reply(200, {"object": "list", "url": url.path, "has_more": len(page) > limit, "data": page[:limit]})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_stripe(sessions, latency):
+    """``sessions`` must be sorted newest first, like Stripe lists them."""
+    FakeStripeHandler.sessions = sessions
+    FakeStripeHandler.positions = {session["id"]: i for i, session in enumerate(sessions)}
+    FakeStripeHandler.latency = latency
+    FakeStripeHandler.requests = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeStripeHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
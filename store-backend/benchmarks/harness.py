@@ -0,0 +1,324 @@
+"""
+Load-test harness for the backend hot paths.
+
+Boots ``app.main:app`` under uvicorn (startup hooks and background workers
+included) against DATABASE_URL, with a fake Gmail API and a fake Gemini model.
+Stripe needs no fake: webhooks are signed locally with STRIPE_WEBHOOK_SECRET.
+Each scenario runs at each concurrency level as a closed loop: ``concurrency``
+clients each send their next request as soon as the previous one returns.
+The harness reports throughput and p50/p95/p99 latency and writes the results
+as JSON. With ``--baseline``, it compares against an earlier results file and
+exits non-zero if a scenario regressed by more than ``--tolerance``.
+
+Seeds and then deletes its own rows, so point it at a scratch PostgreSQL database:
+
+    python -m benchmarks.harness --concurrency 1,16,64 --requests 500 \\
+        --output bench-results/today.json --baseline bench-results/main.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+import uuid
+from datetime import datetime
+from itertools import count
+
+import httpx
+from sqlalchemy import delete
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db.session import engine, init_db
+from app.main import app
+from app.models.inventory import CopilotAccount
+from app.models.outbox import EmailOutbox
+from app.models.stripe_event import StripeEvent
+from app.services import ai_service
+from benchmarks.common import lift_chat_limits, percentile, serve_app, sign_stripe_payload
+from benchmarks.fakes import FakeGeminiModel, start_fake_gmail, use_fake_gmail_credentials
+
+SCENARIOS = ("webhook", "inventory", "add_inventory", "chat")
+
+
+class Scenario:
+    """Builds the n-th request of a scenario; ``seed``/``cleanup`` manage its database rows."""
+
+    name = ""
+
+    def __init__(self, run_id, args):
+        self.run_id = run_id
+        self.args = args
+
+    async def seed(self, total_requests):
+        pass
+
+    async def request(self, client, i) -> httpx.Response:
+        raise NotImplementedError
+
+    async def cleanup(self):
+        pass
+
+
+class WebhookScenario(Scenario):
+    """Unique, correctly signed checkout.session.completed events."""
+
+    name = "webhook"
+
+    def _event(self, i):
+        return json.dumps({
+            "id": f"evt_harness_{self.run_id}_{i}",
+            "object": "event",
+            "type": "checkout.session.completed",
+            "data": {"object": {
+                "id": f"cs_harness_{self.run_id}_{i}",
+                "object": "checkout.session",
+                "customer_details": {"email": f"customer-{self.run_id}-{i}@harness.local"},
+                # Embedded line items spare the processor a Stripe API call.
+                "line_items": {"object": "list", "has_more": False, "data": [
+                    {"price": {"id": settings.STRIPE_PRICE_ID}, "quantity": 1},
+                ]},
+            }},
+        })
+
+    async def seed(self, total_requests):
+        async with AsyncSession(engine) as db:
+            db.add_all(
+                CopilotAccount(email=f"harness-{self.run_id}-{i}@harness.local", password="harness")
+                for i in range(total_requests)
+            )
+            await db.commit()
+
+    async def request(self, client, i):
+        payload = self._event(i)
+        headers = {"stripe-signature": sign_stripe_payload(payload, settings.STRIPE_WEBHOOK_SECRET)}
+        return await client.post("/api/v1/payments/webhook", content=payload, headers=headers)
+
+    async def cleanup(self):
+        event_pattern = f"evt_harness_{self.run_id}_%"
+        async with AsyncSession(engine) as db:
+            # Let the background workers finish so their rows are not left behind.
+            deadline = time.perf_counter() + self.args.drain_timeout
+            while time.perf_counter() < deadline:
+                pending = (await db.exec(
+                    select(StripeEvent.id)
+                    .where(StripeEvent.id.like(event_pattern), StripeEvent.status == "pending")
+                    .limit(1)
+                )).first()
+                if pending is None:
+                    break
+                await asyncio.sleep(0.2)
+            while time.perf_counter() < deadline:
+                queued = (await db.exec(
+                    select(EmailOutbox.id)
+                    .where(EmailOutbox.to_email.like(f"customer-{self.run_id}-%"), EmailOutbox.status == "pending")
+                    .limit(1)
+                )).first()
+                if queued is None:
+                    break
+                await asyncio.sleep(0.2)
+            await db.exec(delete(EmailOutbox).where(EmailOutbox.to_email.like(f"customer-{self.run_id}-%")))
+            await db.exec(delete(StripeEvent).where(StripeEvent.id.like(event_pattern)))
+            await db.exec(delete(CopilotAccount).where(CopilotAccount.email.like(f"harness-{self.run_id}-%")))
+            await db.commit()
+
+
+class InventoryScenario(Scenario):
+    name = "inventory"
+
+    async def request(self, client, i):
+        return await client.get("/api/v1/payments/inventory")
+
+
+class AddInventoryScenario(Scenario):
+    name = "add_inventory"
+
+    async def request(self, client, i):
+        return await client.post(
+            "/api/v1/payments/add-inventory",
+            json={"username": f"added-{self.run_id}-{i}@harness.local", "password": "harness"},
+            headers={"X-Admin-Token": settings.ADMIN_API_TOKEN}
+        )
+
+    async def cleanup(self):
+        async with AsyncSession(engine) as db:
+            await db.exec(delete(CopilotAccount).where(CopilotAccount.email.like(f"added-{self.run_id}-%")))
+            await db.commit()
+
+
+class ChatScenario(Scenario):
+    """Cycles through ``--chat-prompts`` distinct prompts, so repeats exercise the answer cache."""
+
+    name = "chat"
+
+    async def request(self, client, i):
+        prompt = f"harness question {i % self.args.chat_prompts} ({self.run_id})"
+        return await client.post("/api/v1/ai/chat", json={"prompt": prompt})
+
+
+SCENARIO_CLASSES = {cls.name: cls for cls in (WebhookScenario, InventoryScenario, AddInventoryScenario, ChatScenario)}
+
+
+async def run_level(client, scenario, concurrency, requests, offset):
+    """Sends ``requests`` requests from ``concurrency`` closed-loop clients."""
+    latencies, errors = [], 0
+    numbers = count(offset)
+    remaining = requests
+
+    async def client_loop():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            i = next(numbers)
+            started = time.perf_counter()
+            try:
+                response = await scenario.request(client, i)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0) * 1000, 2),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Prints throughput/p95 deltas against ``baseline``; returns the regressed rows."""
+    previous = {(row["scenario"], row["concurrency"]): row for row in baseline["results"]}
+    regressions = []
+    print(f"\nvs baseline {baseline['meta'].get('git_revision')} ({baseline['meta'].get('started_at')}):")
+    for row in results:
+        old = previous.get((row["scenario"], row["concurrency"]))
+        if old is None:
+            continue
+        rps_delta = row["throughput_rps"] / old["throughput_rps"] - 1 if old["throughput_rps"] else 0.0
+        p95_delta = row["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        regressed = rps_delta < -tolerance or p95_delta > tolerance
+        if regressed:
+            regressions.append(row)
+        print(f"  {row['scenario']:<14} c={row['concurrency']:<4} "
+              f"rps {rps_delta:+7.1%}  p95 {p95_delta:+7.1%}" + ("  REGRESSED" if regressed else ""))
+    return regressions
+
+
+async def run(args):
+    run_id = uuid.uuid4().hex[:8]
+    levels = [int(level) for level in args.concurrency.split(",")]
+    scenarios = [SCENARIO_CLASSES[name](run_id, args) for name in args.scenarios.split(",")]
+
+    gmail = start_fake_gmail(args.gmail_latency_ms / 1000)
+    settings.GMAIL_API_ENDPOINT = f"http://127.0.0.1:{gmail.server_port}/"
+    use_fake_gmail_credentials()
+    ai_service.set_model(FakeGeminiModel(
+        tokens=args.chat_tokens, first_token_latency=args.gemini_first_token_ms / 1000, token_interval=0.001
+    ))
+    lift_chat_limits(max(levels))
+
+    meta = {
+        "run_id": run_id,
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "database": engine.url.render_as_string(hide_password=True),
+        "db_pool_size": settings.DB_POOL_SIZE,
+        "db_max_overflow": settings.DB_MAX_OVERFLOW,
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "gmail_latency_ms": args.gmail_latency_ms,
+        "gemini_first_token_ms": args.gemini_first_token_ms,
+        "chat_prompts": args.chat_prompts,
+    }
+    results = []
+    per_scenario = args.warmup + args.requests * len(levels)
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+
+    await init_db()
+    # add-inventory is an admin endpoint; the app runs in-process, so any token will do
+    settings.ADMIN_API_TOKEN = settings.ADMIN_API_TOKEN or uuid.uuid4().hex
+    async with serve_app(app, lifespan="on") as base_url:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.request_timeout) as client:
+            for scenario in scenarios:
+                await scenario.seed(per_scenario)
+                try:
+                    offset = args.warmup
+                    await run_level(client, scenario, min(levels), args.warmup, 0)
+                    for level in levels:
+                        row = await run_level(client, scenario, level, args.requests, offset)
+                        offset += args.requests
+                        results.append(row)
+                        print(f"{row['scenario']:<14} c={level:<4} {row['throughput_rps']:>9.1f} req/s  "
+                              f"p50/p95/p99 {row['p50_ms']:.2f}/{row['p95_ms']:.2f}/{row['p99_ms']:.2f}ms  "
+                              f"errors {row['errors']}")
+                finally:
+                    await scenario.cleanup()
+    gmail.shutdown()
+    await engine.dispose()
+
+    report = {"meta": meta, "results": results}
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nresults written to {args.output}")
+
+    status = 1 if any(row["errors"] for row in results) else 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            status = 1
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,16,64", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests before each scenario")
+    parser.add_argument("--request-timeout", type=float, default=30)
+    parser.add_argument("--gmail-latency-ms", type=float, default=50)
+    parser.add_argument("--gemini-first-token-ms", type=float, default=200)
+    parser.add_argument("--chat-tokens", type=int, default=60)
+    parser.add_argument("--chat-prompts", type=int, default=50,
+                        help="distinct chat prompts to cycle through")
+    parser.add_argument("--drain-timeout", type=float, default=60,
+                        help="seconds to wait for queued webhook events before cleanup")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed throughput drop / p95 increase before flagging a regression")
+    raise SystemExit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
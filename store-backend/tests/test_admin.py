@@ -0,0 +1,74 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.main import app
+from app.models.order import Order
+from app.services.admin_service import encode_cursor
+
+ADMIN_TOKEN = "test-admin-token"
+
+
+def raw_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+@pytest.fixture
+async def client(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_TOKEN", ADMIN_TOKEN)
+    started = datetime(2026, 10, 1)
+    async with session_factory() as db:
+        db.add_all(
+            Order(
+                stripe_session_id=f"cs_{i}",
+                customer_email=f"customer{i}@example.com",
+                quantities={"education": 1},
+                status="fulfilled",
+                created_at=started + timedelta(minutes=i),
+            )
+            for i in range(5)
+        )
+        await db.commit()
+    headers = {"X-Admin-Token": ADMIN_TOKEN}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", headers=headers) as client:
+        yield client
+
+
+async def test_orders_page_through_with_the_cursor(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get("/api/v1/admin/orders", params=params)).json()
+        seen += [order["stripe_session_id"] for order in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"cs_{i}" for i in reversed(range(5))]
+
+
+@pytest.mark.parametrize("path, cursor", [
+    ("/api/v1/admin/orders", "not base64 json"),
+    ("/api/v1/admin/orders", raw_cursor({"created_at": "2026-10-01"})),
+    ("/api/v1/admin/orders", raw_cursor(["2026-10-01T00:00:00"])),
+    ("/api/v1/admin/orders", raw_cursor(["yesterday", 3])),
+    ("/api/v1/admin/orders", raw_cursor([20261001, 3])),
+    ("/api/v1/admin/orders", raw_cursor(["2026-10-01T00:00:00", "3"])),
+    ("/api/v1/admin/orders", raw_cursor(["2026-10-01T00:00:00", True])),
+    ("/api/v1/admin/accounts", raw_cursor(["3"])),
+    ("/api/v1/admin/accounts", raw_cursor([3.5])),
+    ("/api/v1/admin/accounts", raw_cursor([2 ** 64])),
+    ("/api/v1/admin/accounts", raw_cursor([None])),
+])
+async def test_malformed_cursor_is_a_400(client, path, cursor):
+    response = await client.get(path, params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+async def test_valid_account_cursor(client):
+    response = await client.get("/api/v1/admin/accounts", params={"cursor": encode_cursor((10,))})
+    assert response.status_code == 200
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.main import app
+from app.services import ai_service
+from app.services.ai_cache import AnswerCache
+from app.services.chat_sessions import ChatSessionStore
+from app.services.rate_limit import LoadShedder, TokenBucketLimiter
+from benchmarks.common import serve_app
+from benchmarks.fakes import FakeChunk, FakeGeminiModel
+
+TOKENS = 20
+ANSWER = "".join(f"word{i} " for i in range(TOKENS))
+
+
+class FailingStreamModel(FakeGeminiModel):
+    """Streams a few words, then fails the way a dropped upstream connection would."""
+
+    async def generate_content_async(self, contents, stream=False, **kwargs):
+        self.calls += 1
+
+        async def chunks():
+            for i in range(3):
+                yield FakeChunk(f"word{i} ")
+            raise ConnectionError("upstream reset")
+
+        return chunks()
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """A fresh fake Gemini model, cache, session store and admission limits for each test."""
+    model = FakeGeminiModel(tokens=TOKENS, first_token_latency=0.05, token_interval=0.01)
+    monkeypatch.setattr(ai_service, "_model", model)
+    monkeypatch.setattr(ai_service, "answer_cache", AnswerCache(max_entries=100, ttl=60, persistent=False, persistent_ttl=0))
+    monkeypatch.setattr(ai_service, "chat_sessions", ChatSessionStore(
+        max_sessions=100, max_turns=20, memory_cap_chars=1_000_000,
+        token_budget=2000, summary_max_chars=2000, ttl=60
+    ))
+    monkeypatch.setattr(ai_service, "chat_ip_limiter", TokenBucketLimiter("test_ip", rate=100, burst=100, max_keys=100))
+    monkeypatch.setattr(ai_service, "chat_session_limiter", TokenBucketLimiter("test_session", rate=100, burst=100, max_keys=100))
+    monkeypatch.setattr(ai_service, "chat_load_shedder", LoadShedder("test", max_pending=100))
+    return model
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+def parse_sse(body: str):
+    """Splits an SSE body into (event, data) pairs; plain messages have event None."""
+    events = []
+    for message in body.split("\n\n"):
+        if not message:
+            continue
+        event, data = None, None
+        for line in message.split("\n"):
+            field, _, value = line.partition(": ")
+            if field == "event":
+                event = value
+            elif field == "data":
+                data = json.loads(value)
+            else:
+                raise AssertionError(f"unexpected SSE line {line!r}")
+        events.append((event, data))
+    return events
+
+
+async def test_stream_frames_deltas_then_done(client, fake_model):
+    response = await client.post("/api/v1/ai/chat/stream", json={"prompt": "How do I activate Copilot?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.endswith("\n\n")
+    events = parse_sse(response.text)
+    deltas, (last_event, last_data) = events[:-1], events[-1]
+    assert all(event is None and set(data) == {"delta"} for event, data in deltas)
+    assert "".join(data["delta"] for _, data in deltas) == ANSWER
+    assert len(deltas) == TOKENS
+    assert last_event == "done"
+    assert last_data == {"session_id": response.headers["x-session-id"]}
+
+
+async def test_stream_ends_with_error_event_when_generation_fails(client, fake_model, monkeypatch):
+    monkeypatch.setattr(ai_service, "_model", FailingStreamModel())
+    response = await client.post("/api/v1/ai/chat/stream", json={"prompt": "How do I activate Copilot?"})
+
+    assert response.status_code == 200
+    events = parse_sse(response.text)
+    assert [data["delta"] for event, data in events[:-1]] == ["word0 ", "word1 ", "word2 "]
+    assert events[-1] == ("error", {"detail": "upstream reset"})
+    assert all(event != "done" for event, _ in events)
+
+
+async def test_chat_returns_the_whole_answer(client, fake_model):
+    response = await client.post("/api/v1/ai/chat", json={"prompt": "How do I activate Copilot?"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"message", "session_id"}
+    assert body["message"] == ANSWER
+
+    # Follow-up turn in the same session
+    response = await client.post("/api/v1/ai/chat", json={"prompt": "And in JetBrains?", "session_id": body["session_id"]})
+    assert response.status_code == 200
+    assert response.json() == {"message": ANSWER, "session_id": body["session_id"]}
+    assert fake_model.calls == 2
+
+
+async def test_streamed_and_plain_answers_match(client, fake_model):
+    plain = (await client.post("/api/v1/ai/chat", json={"prompt": "first"})).json()["message"]
+    streamed = parse_sse((await client.post("/api/v1/ai/chat/stream", json={"prompt": "second"})).text)
+    assert "".join(data["delta"] for event, data in streamed if event is None) == plain
+
+
+@pytest.mark.parametrize("route", ["/api/v1/ai/chat", "/api/v1/ai/chat/stream"])
+async def test_cache_stats_count_both_routes_alike(client, fake_model, route):
+    for prompt in ("How do I activate Copilot?", "How do I activate Copilot?", "Other question"):
+        assert (await client.post(route, json={"prompt": prompt})).status_code == 200
+
+    stats = ai_service.answer_cache.stats.to_dict()
+    assert stats["requests"] == 3
+    assert stats["memory_hits"] == 1
+    assert stats["upstream_calls"] == 2
+    assert stats["upstream_calls_saved"] == 1
+    assert fake_model.calls == 2
+
+
+async def test_failed_stream_counts_as_upstream_error(client, fake_model, monkeypatch):
+    monkeypatch.setattr(ai_service, "_model", FailingStreamModel())
+    await client.post("/api/v1/ai/chat/stream", json={"prompt": "How do I activate Copilot?"})
+
+    stats = ai_service.answer_cache.stats
+    assert (stats.requests, stats.upstream_calls, stats.upstream_errors) == (1, 1, 1)
+
+
+async def test_event_loop_keeps_serving_while_tokens_stream(fake_model):
+    fake_model.first_token_latency, fake_model.token_interval = 0.1, 0.02
+    generation = fake_model.first_token_latency + fake_model.token_interval * (TOKENS - 1)
+
+    async with serve_app(app) as base_url, httpx.AsyncClient(base_url=base_url) as client:
+        async def stream_chat(prompt):
+            started = time.perf_counter()
+            first_delta = None
+            async with client.stream("POST", "/api/v1/ai/chat/stream", json={"prompt": prompt}) as response:
+                async for line in response.aiter_lines():
+                    if first_delta is None and line.startswith("data: "):
+                        first_delta = time.perf_counter() - started
+            return first_delta, time.perf_counter() - started
+
+        chats = asyncio.gather(*(stream_chat(f"question {i}") for i in range(10)))
+        await asyncio.sleep(fake_model.first_token_latency)
+        started = time.perf_counter()
+        assert (await client.get("/health")).status_code == 200
+        health = time.perf_counter() - started
+        results = await chats
+
+    # The chats were still streaming when /health answered, and answered quickly
+    assert health < generation / 4
+    assert all(total >= generation for _, total in results)
+    # Text reaches the client as it is generated, not once the answer is complete
+    assert all(first_delta < generation / 2 for first_delta, _ in results)
@@ -0,0 +1,35 @@
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+from app.services.chat_sessions import ChatSessionStore
+
+
+def make_store(max_turns):
+    return ChatSessionStore(
+        max_sessions=10, max_turns=max_turns, memory_cap_chars=1_000_000,
+        token_budget=10_000, summary_max_chars=2000, ttl=60
+    )
+
+
+@pytest.mark.parametrize("max_turns", [3, 4, 5])
+def test_history_is_trimmed_in_whole_pairs(max_turns):
+    store = make_store(max_turns)
+    session_id, session = store.get_or_create(None)
+    for i in range(6):
+        store.append(session_id, session, f"question {i}", f"answer {i}")
+
+    roles = [role for role, _ in session.turns]
+    assert roles[0] == "user"
+    assert roles == ["user", "model"] * (len(roles) // 2)
+    assert session.turns[-1] == ("model", "answer 5")
+    assert "User: question 0" in session.summary
+
+    contents = store.build_contents(session, "question 6")
+    assert [entry["role"] for entry in contents] == ["user", "model"] * (len(contents) // 2) + ["user"]
+
+
+@pytest.mark.parametrize("max_turns", [0, 1, 7])
+def test_odd_or_too_small_max_turns_is_rejected(max_turns):
+    with pytest.raises(ValidationError, match="AI_SESSION_MAX_TURNS"):
+        Settings(AI_SESSION_MAX_TURNS=max_turns)
@@ -0,0 +1,130 @@
+import time
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import select
+
+from app.core.resilience import OPEN, DependencyUnavailable, gmail_dependency
+from app.models.inventory import CopilotAccount
+from app.models.outbox import EmailOutbox
+from app.services import email_service
+from app.services.email_outbox import EmailOutboxDispatcher
+
+
+@pytest.fixture
+def fake_gmail(monkeypatch):
+    """Replaces the blocking Gmail send; records the messages it was given."""
+    sent = []
+
+    def send(service, message):
+        time.sleep(0.05)
+        sent.append(message)
+        return {"id": f"msg-{len(sent)}"}
+
+    monkeypatch.setattr(email_service, "get_gmail_service", lambda: object())
+    monkeypatch.setattr(email_service, "_send_message_blocking", send)
+    yield sent
+    breaker = gmail_dependency.breaker
+    breaker.state, breaker.failures, breaker._probing = "closed", 0, False
+
+
+def open_circuit(elapsed: bool):
+    breaker = gmail_dependency.breaker
+    breaker.state = OPEN
+    breaker.failures = breaker.failure_threshold
+    breaker._opened_at = time.monotonic() - (breaker.reset_timeout + 1 if elapsed else 0)
+
+
+async def add_messages(session_factory, count):
+    async with session_factory() as db:
+        accounts = [CopilotAccount(email=f"account{i}@example.edu", password="pw") for i in range(count)]
+        db.add_all(accounts)
+        await db.flush()
+        db.add_all(
+            EmailOutbox(to_email=f"customer{i}@example.com", account_ids=[account.id], order_id=i + 1)
+            for i, account in enumerate(accounts)
+        )
+        await db.commit()
+
+
+async def outbox(session_factory):
+    async with session_factory() as db:
+        return (await db.exec(select(EmailOutbox).order_by(EmailOutbox.id))).all()
+
+
+def make_dispatcher(max_attempts=3):
+    return EmailOutboxDispatcher(batch_size=10, concurrency=4, max_attempts=max_attempts, lease_seconds=60, poll_interval=1)
+
+
+async def test_open_circuit_is_not_wrapped(fake_gmail):
+    open_circuit(elapsed=False)
+    with pytest.raises(DependencyUnavailable):
+        await email_service.send_order_credentials("customer@example.com", [("a@example.edu", "pw", "education")], 1)
+    assert fake_gmail == []
+
+
+async def test_sends_and_marks_sent(session_factory, fake_gmail):
+    await add_messages(session_factory, 3)
+    assert await make_dispatcher().run_once() == 3
+
+    assert len(fake_gmail) == 3
+    assert [message.status for message in await outbox(session_factory)] == ["sent"] * 3
+
+
+async def test_rejected_while_half_open_keeps_its_attempts(session_factory, fake_gmail):
+    # One probe goes through; the others are rejected without reaching Gmail
+    open_circuit(elapsed=True)
+    await add_messages(session_factory, 3)
+    assert await make_dispatcher(max_attempts=1).run_once() == 3
+
+    messages = await outbox(session_factory)
+    assert len(fake_gmail) == 1
+    assert sorted(message.status for message in messages) == ["pending", "pending", "sent"]
+    for message in messages:
+        if message.status == "pending":
+            assert message.attempts == 0
+            assert "circuit open" in message.last_error
+
+
+async def test_no_connection_is_held_while_sending(session_factory, monkeypatch):
+    in_use = []
+    engine = session_factory.kw["bind"].sync_engine
+    event.listen(engine, "checkout", lambda *args: in_use.append(1))
+    event.listen(engine, "checkin", lambda *args: in_use.pop())
+    checked_out = []
+
+    def send(service, message):
+        checked_out.append(len(in_use))
+        return {"id": "msg"}
+
+    monkeypatch.setattr(email_service, "get_gmail_service", lambda: object())
+    monkeypatch.setattr(email_service, "_send_message_blocking", send)
+    await add_messages(session_factory, 3)
+    assert await make_dispatcher().run_once() == 3
+
+    assert checked_out == [0, 0, 0]
+    assert [message.status for message in await outbox(session_factory)] == ["sent"] * 3
+
+
+async def test_failed_sends_back_off_then_fail(session_factory, monkeypatch):
+    def send(service, message):
+        raise ConnectionError("gmail down")
+
+    monkeypatch.setattr(email_service, "get_gmail_service", lambda: object())
+    monkeypatch.setattr(email_service, "_send_message_blocking", send)
+    monkeypatch.setattr(gmail_dependency.breaker, "failure_threshold", 100)
+    await add_messages(session_factory, 1)
+    dispatcher = make_dispatcher(max_attempts=2)
+
+    assert await dispatcher.run_once() == 1
+    [message] = await outbox(session_factory)
+    assert (message.status, message.attempts) == ("pending", 1)
+    assert "gmail down" in message.last_error
+
+    async with session_factory() as db:
+        message.next_attempt_at = message.created_at
+        db.add(message)
+        await db.commit()
+    assert await dispatcher.run_once() == 1
+    [message] = await outbox(session_factory)
+    assert (message.status, message.attempts) == ("failed", 2)
@@ -0,0 +1,71 @@
+from app.models.inventory import CopilotAccount
+from app.services.inventory_reservation import AccountReservationPool
+from app.services.inventory_service import InventoryService, inventory_count_cache
+
+
+async def seed(session_factory, count):
+    async with session_factory() as db:
+        db.add_all(CopilotAccount(email=f"account{i}@example.edu", password="pw") for i in range(count))
+        await db.commit()
+        await inventory_count_cache.reload(db)
+
+
+async def cached_counts(session_factory):
+    async with session_factory() as db:
+        return await inventory_count_cache.get_counts(db)
+
+
+async def test_claim_counts_only_once_committed(session_factory):
+    await seed(session_factory, 5)
+
+    async with session_factory() as db:
+        accounts = await InventoryService.claim_accounts({"education": 2}, "customer@example.com", None, db, commit=False)
+        assert len(accounts) == 2
+        assert await cached_counts(session_factory) == {"education": 5}
+        await db.rollback()
+    assert await cached_counts(session_factory) == {"education": 5}
+
+    async with session_factory() as db:
+        await InventoryService.claim_accounts({"education": 2}, "customer@example.com", None, db, commit=False)
+        await db.commit()
+    assert await cached_counts(session_factory) == {"education": 3}
+
+
+async def test_rolled_back_claim_does_not_leak_into_the_next_commit(session_factory):
+    await seed(session_factory, 5)
+
+    async with session_factory() as db:
+        await InventoryService.claim_accounts({"education": 1}, "customer@example.com", None, db, commit=False)
+        await db.rollback()
+        await InventoryService.claim_accounts({"education": 2}, "customer@example.com", None, db)
+    assert await cached_counts(session_factory) == {"education": 3}
+
+
+async def test_reserved_claim_counts_only_once_committed(session_factory):
+    await seed(session_factory, 5)
+    pool = AccountReservationPool(
+        enabled=True, account_types=("education",), batch_size=3, low_water=1,
+        lease_seconds=60, refresh_interval=30
+    )
+    await pool.run_once()
+
+    async with session_factory() as db:
+        accounts = await pool.claim_accounts({"education": 2}, "customer@example.com", None, db, commit=False)
+        assert len(accounts) == 2
+        await db.rollback()
+    assert await cached_counts(session_factory) == {"education": 5}
+
+
+async def test_multi_type_claim_takes_the_requested_mix(session_factory):
+    async with session_factory() as db:
+        db.add_all(CopilotAccount(email=f"edu{i}@example.edu", password="pw", account_type="education") for i in range(3))
+        db.add_all(CopilotAccount(email=f"pro{i}@example.com", password="pw", account_type="pro") for i in range(3))
+        db.add(CopilotAccount(email="old@example.edu", password="pw", status="assigned"))
+        await db.commit()
+        await inventory_count_cache.reload(db)
+
+    async with session_factory() as db:
+        accounts = await InventoryService.claim_accounts({"education": 2, "pro": 1, "team": 1}, "customer@example.com", 7, db)
+    assert sorted(account.email for account in accounts) == ["edu0@example.edu", "edu1@example.edu", "pro0@example.com"]
+    assert all(account.status == "assigned" and account.order_id == 7 for account in accounts)
+    assert await cached_counts(session_factory) == {"education": 1, "pro": 2}
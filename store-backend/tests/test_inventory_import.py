@@ -0,0 +1,129 @@
+import asyncio
+
+import httpx
+import pytest
+from sqlmodel import select
+
+from app.core.config import settings
+from app.main import app
+from app.models.inventory import CopilotAccount
+from app.services import inventory_import
+from app.services.inventory_import import import_inventory, iter_lines, iter_rows
+
+ADMIN_TOKEN = "test-admin-token"
+
+
+async def chunked(data: bytes, size: int = 7):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def parse(data: bytes, fmt: str):
+    return [row async for row in iter_rows(iter_lines(chunked(data)), fmt)]
+
+
+async def test_csv_quoted_fields_may_span_lines():
+    rows = await parse(
+        b'email,password,account_type\r\n'
+        b'a@example.edu,"multi\nline, with comma",pro\n'
+        b'b@example.edu,"say ""hi""",education\n'
+        b'\n'
+        b'c@example.edu,plain\n',
+        "csv"
+    )
+    assert rows == [
+        (2, {"email": "a@example.edu", "password": "multi\nline, with comma", "account_type": "pro"}, None),
+        (4, {"email": "b@example.edu", "password": 'say "hi"', "account_type": "education"}, None),
+        (6, None, "expected 3 columns, got 2"),
+    ]
+
+
+async def test_csv_literal_quote_in_unquoted_field_does_not_join_lines():
+    rows = await parse(b'email,password\na@example.edu,pa"ss\nb@example.edu,pw\nc@example.edu,"q""uoted"\n', "csv")
+    assert [(line, row["password"]) for line, row, _ in rows] == [(2, 'pa"ss'), (3, "pw"), (4, 'q"uoted')]
+
+
+async def test_csv_unterminated_quote_is_a_row_error():
+    rows = await parse(b'email,password\na@example.edu,"never closed\nb@example.edu,pw\n', "csv")
+    assert rows == [
+        (2, None, "unterminated quoted field starting on line 2"),
+        (3, {"email": "b@example.edu", "password": "pw", "account_type": "education"}, None),
+    ]
+
+
+async def test_csv_overlong_record_restarts_on_the_next_line(session_factory, monkeypatch):
+    monkeypatch.setattr(inventory_import, "MAX_CSV_RECORD_CHARS", 100)
+    data = (
+        b"email,password\n"
+        + b"".join(f"user{i}@example.edu,pw{i}\n".encode() for i in range(3))
+        + b'broken@example.edu,"open\n'
+        + b"".join(f"more{i}@example.edu,pw{i}\n".encode() for i in range(10))
+    )
+    async with session_factory() as db:
+        report = await import_inventory(chunked(data), "csv", db, batch_size=2)
+
+    assert report["inserted"] == 13
+    assert report["errors"] == [{"line": 5, "error": "unterminated quoted field starting on line 5"}]
+
+
+async def test_passwords_are_kept_verbatim():
+    csv_rows = await parse(b'email,password\n a@example.edu , pass word \n', "csv")
+    jsonl_rows = await parse(b'{"email": "b@example.edu", "password": "\\tsecret "}\n', "jsonl")
+    assert csv_rows[0][1] == {"email": "a@example.edu", "password": " pass word ", "account_type": "education"}
+    assert jsonl_rows[0][1]["password"] == "\tsecret "
+
+
+async def test_concurrent_imports_insert_each_account_once(session_factory):
+    data = b"email,password\n" + b"".join(f"user{i}@example.edu,pw{i}\n".encode() for i in range(50))
+
+    async def run_import():
+        async with session_factory() as db:
+            return await import_inventory(chunked(data, 64), "csv", db, batch_size=10)
+
+    reports = await asyncio.gather(run_import(), run_import())
+
+    assert sum(report["inserted"] for report in reports) == 50
+    assert sum(report["duplicates"] for report in reports) == 50
+    async with session_factory() as db:
+        emails = (await db.exec(select(CopilotAccount.email))).all()
+    assert sorted(emails) == sorted(f"user{i}@example.edu" for i in range(50))
+
+
+@pytest.fixture
+async def client(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_TOKEN", ADMIN_TOKEN)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize("path, kwargs", [
+    ("/api/v1/payments/add-inventory", {"json": {"username": "a@example.edu", "password": "pw"}}),
+    ("/api/v1/payments/import-inventory?format=csv", {"content": b"email,password\na@example.edu,pw\n"}),
+])
+async def test_inventory_writes_need_the_admin_token(client, session_factory, monkeypatch, path, kwargs):
+    assert (await client.post(path, **kwargs)).status_code == 401
+    assert (await client.post(path, headers={"X-Admin-Token": "wrong"}, **kwargs)).status_code == 401
+    async with session_factory() as db:
+        assert (await db.exec(select(CopilotAccount))).all() == []
+
+    monkeypatch.setattr(settings, "ADMIN_API_TOKEN", None)
+    assert (await client.post(path, headers={"X-Admin-Token": ADMIN_TOKEN}, **kwargs)).status_code == 503
+
+
+async def test_add_inventory_with_token(client, session_factory):
+    headers = {"X-Admin-Token": ADMIN_TOKEN}
+    body = {"username": "a@example.edu", "password": " pw "}
+    assert (await client.post("/api/v1/payments/add-inventory", json=body, headers=headers)).status_code == 200
+    assert (await client.post("/api/v1/payments/add-inventory", json=body, headers=headers)).status_code == 409
+
+    response = await client.post(
+        "/api/v1/payments/import-inventory?format=csv",
+        content=b'email,password\na@example.edu,pw\nb@example.edu,"p\nw"\n',
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 1
+    assert response.json()["duplicates"] == 1
+    async with session_factory() as db:
+        accounts = (await db.exec(select(CopilotAccount.email, CopilotAccount.password).order_by(CopilotAccount.email))).all()
+    assert accounts == [("a@example.edu", " pw "), ("b@example.edu", "p\nw")]
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+CHECK = """
+import logging, threading
+before = set(threading.enumerate())
+import app.main
+from app.core import logging_config
+assert logging_config._listener is None, "listener started at import"
+assert set(threading.enumerate()) == before, "threads started at import"
+assert not any(
+    type(handler).__name__ == "NonBlockingQueueHandler" for handler in logging.getLogger().handlers
+), "root handlers replaced at import"
+"""
+
+
+def test_importing_the_app_leaves_logging_alone():
+    # A fresh interpreter, so nothing else in the suite has imported app.main yet
+    result = subprocess.run(
+        [sys.executable, "-c", CHECK], cwd=PROJECT_ROOT, env={**os.environ, "PYTHONPATH": str(PROJECT_ROOT)},
+        capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
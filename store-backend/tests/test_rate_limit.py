@@ -0,0 +1,37 @@
+from starlette.requests import Request
+
+from app.services.rate_limit import client_ip
+
+NGINX = "172.18.0.5"
+
+
+def make_request(peer, *forwarded_for):
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded_for]
+    return Request({"type": "http", "client": (peer, 40000), "headers": headers})
+
+
+def test_direct_client_is_the_peer():
+    assert client_ip(make_request("203.0.113.7")) == "203.0.113.7"
+
+
+def test_untrusted_peer_cannot_forge_forwarded_for():
+    assert client_ip(make_request("203.0.113.7", "198.51.100.1")) == "203.0.113.7"
+
+
+def test_client_behind_nginx():
+    assert client_ip(make_request(NGINX, "198.51.100.1")) == "198.51.100.1"
+
+
+def test_spoofed_hops_left_of_nginx_are_ignored():
+    # nginx appends the address it saw to whatever the client sent
+    assert client_ip(make_request(NGINX, "10.0.0.1, 192.0.2.9, 198.51.100.1")) == "198.51.100.1"
+    assert client_ip(make_request(NGINX, "192.0.2.9", "198.51.100.1")) == "198.51.100.1"
+
+
+def test_all_trusted_hops_fall_back_to_the_leftmost():
+    assert client_ip(make_request(NGINX, "10.1.2.3")) == "10.1.2.3"
+    assert client_ip(make_request("127.0.0.1")) == "127.0.0.1"
+
+
+def test_garbage_hop_is_not_trusted():
+    assert client_ip(make_request(NGINX, "not-an-ip")) == "not-an-ip"
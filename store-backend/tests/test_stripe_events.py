@@ -0,0 +1,110 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import event as sa_event
+from sqlmodel import select
+
+from app.models.stripe_event import StripeEvent
+from app.services.stripe_events import StripeEventProcessor
+
+
+async def failing_handler(payload, db):
+    raise RuntimeError("inventory service down")
+
+
+def make_processor(handler, max_attempts=2, prepare=None):
+    return StripeEventProcessor(
+        handler, workers=1, max_attempts=max_attempts, lease_seconds=60, poll_interval=1, prepare=prepare
+    )
+
+
+async def add_event(session_factory, event_id="evt_1"):
+    async with session_factory() as db:
+        db.add(StripeEvent(id=event_id, type="checkout.session.completed", payload=json.dumps({"id": event_id})))
+        await db.commit()
+
+
+async def get_event(session_factory, event_id="evt_1") -> StripeEvent:
+    async with session_factory() as db:
+        return (await db.exec(select(StripeEvent).where(StripeEvent.id == event_id))).one()
+
+
+async def make_due(session_factory, event_id="evt_1"):
+    async with session_factory() as db:
+        event = await db.get(StripeEvent, event_id)
+        event.next_attempt_at = datetime.utcnow()
+        await db.commit()
+
+
+async def test_processed_event_is_marked_processed(session_factory):
+    handled = []
+
+    async def handler(payload, db):
+        handled.append(payload["id"])
+
+    await add_event(session_factory)
+    assert await make_processor(handler).run_once() == 1
+
+    event = await get_event(session_factory)
+    assert handled == ["evt_1"]
+    assert event.status == "processed"
+    assert event.attempts == 1
+
+
+async def test_failed_event_backs_off_then_fails(session_factory):
+    processor = make_processor(failing_handler, max_attempts=2)
+    await add_event(session_factory)
+
+    assert await processor.run_once() == 1
+    event = await get_event(session_factory)
+    assert event.status == "pending"
+    assert event.attempts == 1
+    assert event.last_error == "inventory service down"
+    assert event.next_attempt_at > datetime.utcnow()
+    # Backing off: not leased again until it is due
+    assert await processor.run_once() == 0
+
+    await make_due(session_factory)
+    assert await processor.run_once() == 1
+    event = await get_event(session_factory)
+    assert event.status == "failed"
+    assert event.attempts == 2
+    assert await processor.run_once() == 0
+
+
+async def test_prepare_runs_without_a_connection_held(session_factory):
+    in_use = []
+    engine = session_factory.kw["bind"].sync_engine
+    sa_event.listen(engine, "checkout", lambda *args: in_use.append(1))
+    sa_event.listen(engine, "checkin", lambda *args: in_use.pop())
+    checked_out, handled = [], []
+
+    async def prepare(payload):
+        checked_out.append(len(in_use))
+        payload["line_items"] = ["fetched"]
+
+    async def handler(payload, db):
+        handled.append(payload["line_items"])
+
+    await add_event(session_factory)
+    assert await make_processor(handler, prepare=prepare).run_once() == 1
+
+    assert checked_out == [0]
+    assert handled == [["fetched"]]
+    assert (await get_event(session_factory)).status == "processed"
+
+
+async def test_failed_prepare_backs_off(session_factory):
+    async def prepare(payload):
+        raise TimeoutError("stripe timed out")
+
+    async def handler(payload, db):
+        raise AssertionError("handler must not run")
+
+    await add_event(session_factory)
+    assert await make_processor(handler, prepare=prepare).run_once() == 1
+
+    event = await get_event(session_factory)
+    assert event.status == "pending"
+    assert event.attempts == 1
+    assert event.last_error == "stripe timed out"